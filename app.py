@@ -1,126 +1,232 @@
-import os, asyncio, tempfile, json
+import os, re, base64, hashlib, tempfile, json, time
 from pathlib import Path
-from dotenv import load_dotenv
-from flask import Flask, render_template, jsonify, request, send_file
+from flask import Flask, Blueprint, Response, current_app, render_template, jsonify, request, send_file, stream_with_context
+from werkzeug.exceptions import HTTPException, RequestEntityTooLarge, UnsupportedMediaType
 import json
 from io import BytesIO
-from docx import Document
-from docx.shared import Inches
+from config import Config
+from llm import gemini_client
+from llm.scheduler import LLMScheduler, INTERACTIVE, BACKGROUND, BATCH
+from services.batch_comparator_service import BatchComparatorService
 from services.comparator_service import ComparatorService
-from services.elsa import anonymize_text
+from services.compression import init_compression
+from services.tracing import init_tracing
+from services.memory import init_memory_tracking
+from services.profiling import init_profiling
 from services.extractor_service import ExtractorService
 from services.convertor_service import ConvertorService
-from services.generate_content import generate_copy, make_filestorage_from
+from services.docx_renderer import DocxRenderer, DOCX_MIMETYPE
+from services.example_index import ExampleIndex, DEFAULT_TOP_K, DEFAULT_TOKEN_BUDGET
+from services.generate_content import generate_copy, make_filestorage_from, build_copy_example_index
 from services.generator_service import GeneratorService
+from services.job_service import JobService, NullJobContext, FINISHED_STATES
+from services.mapping_store import MappingStore, SessionError
+from services.revalidation import RevalidationStore
+from services.registry import ServiceRegistry
+from services.render_cache import RenderCache
+from services.upload import UploadRequest, shared_buffer
 
-# Initialize Flask application
-app = Flask(__name__)
-
-comparator_service = None
-generator_service = None  
-extractor_service = None
-convertor_service = None
-# Load environment variables and initialize services
-try: 
-    load_dotenv()
-    comparator_service = ComparatorService(api_key=os.getenv('GEMINI_API_KEY'))
-    generator_service = GeneratorService(api_key=os.getenv('GEMINI_API_KEY'))
-    extractor_service = ExtractorService(api_key=os.getenv('GEMINI_API_KEY'))
-    convertor_service = ConvertorService()
-    
-except Exception as e:
-    print(f"❌ CRITICAL ERROR: {str(e)}")
-    import traceback
-    traceback.print_exc()
+# Routes of the application, registered by create_app()
+bp = Blueprint('main', __name__)
+
+registry = ServiceRegistry()  # services built on first use (see warm_up)
+job_service = None
+
+def init_services(config=Config):
+    """
+    Register the service factories: nothing heavy runs at startup, each service (and
+    the libraries it needs: Gemini SDK, python-docx, PyPDF2, Playwright) is built the
+    first time a request uses it. warm_up() builds them ahead of time instead.
+    """
+    global job_service
+
+    if job_service is not None:
+        return
+
+    gemini_client.single_flight.enabled = config.LLM_SINGLE_FLIGHT
+    gemini_client.scheduler = LLMScheduler(
+        max_concurrency=config.LLM_MAX_CONCURRENCY,
+        caps={INTERACTIVE: config.LLM_INTERACTIVE_MAX, BACKGROUND: config.LLM_BACKGROUND_MAX, BATCH: config.LLM_BATCH_MAX}
+    )
+    registry.register('comparator', lambda: ComparatorService(
+        api_key=config.GEMINI_API_KEY,
+        revalidation_store=registry.revalidation_store,
+        max_workers=config.REVALIDATION_MAX_WORKERS
+    ))
+    registry.register('revalidation_store', lambda: RevalidationStore(ttl=config.REVALIDATION_TTL,
+                                                                      db_path=config.REVALIDATION_DB_PATH))
+    registry.register('extractor', lambda: ExtractorService(api_key=config.GEMINI_API_KEY,
+                                                            reduce_raw_html=config.PROMPT_REDUCE_HTML))
+    registry.register('batch_comparator', lambda: BatchComparatorService(
+        registry.extractor, registry.comparator, max_workers=config.BATCH_MAX_WORKERS
+    ))
+
+    # Similarity indexes over the anonymized examples, built once per process
+    registry.register('design_example_index', lambda: ExampleIndex.from_files(
+        registry.extractor,
+        [make_filestorage_from(str(p)) for p in Path("model_templates/design").glob("*.html")],
+        parse_html=False
+    ))
+    registry.register('copy_example_index', lambda: build_copy_example_index(registry.extractor))
+
+    registry.register('generator', lambda: GeneratorService(
+        api_key=config.GEMINI_API_KEY, example_index=registry.design_example_index
+    ))
+    registry.register('convertor', lambda: ConvertorService(
+        max_concurrency=config.BROWSER_MAX_CONCURRENCY,
+        recycle_after=config.BROWSER_RECYCLE_AFTER,
+        render_timeout=config.BROWSER_RENDER_TIMEOUT,
+        from_memory=config.CONVERT_FROM_MEMORY,
+        allowed_hosts=config.CONVERT_ALLOWED_HOSTS
+    ))
+    registry.register('docx_renderer', lambda: DocxRenderer(max_cache_bytes=config.DOCX_CACHE_MAX_BYTES))
+    registry.register('pdf_cache', lambda: RenderCache(config.CONVERT_CACHE_DIR, max_bytes=config.CONVERT_CACHE_MAX_BYTES)
+                      if config.CONVERT_CACHE_MAX_BYTES > 0 else None)
+    registry.register('mapping_store', lambda: MappingStore(ttl=config.MAPPING_TTL, db_path=config.MAPPING_DB_PATH))
+
+    # Background jobs for the long-running endpoints (durable state in SQLite)
+    job_service = JobService(
+        db_path=config.JOBS_DB_PATH,
+        spool_dir=config.JOBS_SPOOL_DIR,
+        max_workers=config.JOBS_MAX_WORKERS,
+        max_pending=config.JOBS_MAX_PENDING,
+        lease=config.JOBS_LEASE,
+        max_attempts=config.JOBS_MAX_ATTEMPTS
+    )
+    job_service.register('generate_copy', generate_copy_task)
+    job_service.register('generate_design', generate_design_task)
+    job_service.register('compare', compare_task)
+    job_service.register('convert', convert_task)
+    job_service.register('generate_pdf', generate_pdf_task)
+    job_service.recover()
+
+HEAVY_MODULES = ('google.genai', 'docx', 'PyPDF2', 'bs4', 'playwright.async_api')
+
+def warm_up(names=None) -> dict:
+    """
+    Build the services and import the heavy libraries now instead of on first use
+    (WARM_UP=1). With a preloading server this runs in the master before the fork,
+    so the workers share the work and the first requests are not slower.
+
+    Returns:
+        dict: Build time (ms) of each service.
+    """
+    import importlib
+
+    for module in HEAVY_MODULES:
+        try:
+            importlib.import_module(module)
+        except ImportError as e:
+            print(f"⚠️ Warm-up: {module} not importable: {str(e)}")
+    return registry.warm_up(names)
+
+def create_app(config=Config) -> Flask:
+    """Application factory: configuration from the environment, services and routes."""
+    app = Flask(__name__)
+    app.config.from_object(config)
+    app.request_class = UploadRequest  # spooled uploads, validated while streaming
+
+    init_services(config)
+    if config.WARM_UP:
+        warm_up()
+    app.register_blueprint(bp)
+    init_compression(app)  # fast JSON, gzip/brotli responses, precompressed static assets
+    init_tracing(app)  # Server-Timing header and structured trace logs per request
+    init_memory_tracking(app)  # opt-in peak memory per request / stage (MEMORY_TRACKING=1)
+    init_profiling(app)  # opt-in cProfile of single requests (PROFILING=1)
+    return app
+
+@bp.app_errorhandler(RequestEntityTooLarge)
+@bp.app_errorhandler(UnsupportedMediaType)
+def upload_rejected(e):
+    """Uploads rejected while streaming (size or magic bytes) answer in JSON like the API."""
+    return jsonify({'error': e.description}), e.code
+
+def _get_int(form, key: str, default: int) -> int:
+    """Read an optional integer form field, falling back to the default."""
+    try:
+        return int(form.get(key, default))
+    except (TypeError, ValueError):
+        return default
 
 # Routes principales - pages
-@app.route('/')
-@app.route('/index')
+@bp.route('/')
+@bp.route('/index')
 def index():
     return render_template('index.html')
 
-@app.route('/copyfile')
+@bp.route('/copyfile')
 def copyfile():
     return render_template('copyfile.html')
 
-@app.route('/comparefiles')
+@bp.route('/comparefiles')
 def comparefiles():
     return render_template('comparefiles.html')
 
-@app.route('/api/generate_copy', methods=['POST'])
+def generate_copy_task(form, files, job=None):
+    """Generate a marketing copy from a brief (doc1)."""
+    job = job or NullJobContext()
+    if 'doc1' not in files:
+        return {'success': False, 'error': 'No file provided', 'status_code': 400}
+    
+    # words_to_anonymize = form.get('words_to_anonymize', '[]')
+
+    doc1 = files['doc1']
+    with job.stage('generate'):
+        decoded_output, _ = generate_copy(
+            doc1,
+            top_k=_get_int(form, 'top_k', DEFAULT_TOP_K),
+            token_budget=_get_int(form, 'token_budget', DEFAULT_TOKEN_BUDGET),
+            example_index=registry.copy_example_index
+        ) # add more_words
+    return {'success': True, 'output': decoded_output}
+
+@bp.route('/api/generate_copy', methods=['POST'])
 def generate_copy_route():
-    if 'doc1' not in request.files:
-        return jsonify({'error': 'No file provided'}), 400
+    result = generate_copy_task(request.form, request.files)
+    if not result['success']:
+        return jsonify({'error': result['error']}), result.get('status_code', 500)
+    return jsonify({'output': result['output']})
+
+def _docx_response(as_attachment: bool, download_name: str):
+    """Render the posted copy with the shared renderer, honouring If-None-Match."""
+    if not request.is_json:
+        return jsonify({'error': 'Content-Type must be application/json'}), 400
     
-    # words_to_anonymize = request.form.get('words_to_anonymize', '[]')
+    data = request.get_json()
+    copy_text = data.get('copy', '')
+    
+    if not copy_text:
+        return jsonify({'error': 'No copy content provided'}), 400
+
+    # Unchanged copy: the client already holds this exact document (weak comparison, as
+    # If-None-Match requires; "*" does not name a document the client has)
+    etag = registry.docx_renderer.etag_for(copy_text)
+    if not request.if_none_match.star_tag and request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response
 
-    doc1 = request.files['doc1']
-    decoded_output, _ = generate_copy(doc1) # add more_words
-    return jsonify({'output': decoded_output})
+    rendered = registry.docx_renderer.render(copy_text)
 
-@app.route('/api/generate_docx_preview', methods=['POST'])
+    response = send_file(
+        BytesIO(rendered.data),
+        mimetype=DOCX_MIMETYPE,
+        as_attachment=as_attachment,
+        download_name=download_name,
+        etag=False,
+        last_modified=rendered.last_modified,
+        conditional=False
+    )
+    response.set_etag(rendered.etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+@bp.route('/api/generate_docx_preview', methods=['POST'])
 def generate_docx_preview():
     try:
-        if not request.is_json:
-            return jsonify({'error': 'Content-Type must be application/json'}), 400
-        
-        data = request.get_json()
-        copy_text = data.get('copy', '')
-        
-        if not copy_text:
-            return jsonify({'error': 'No copy content provided'}), 400
-        
-        # Créer le document DOCX avec formatage
-        doc = Document()
-        
-        # Configuration des marges
-        sections = doc.sections
-        for section in sections:
-            section.top_margin = Inches(1)
-            section.bottom_margin = Inches(1)
-            section.left_margin = Inches(1.25)
-            section.right_margin = Inches(1.25)
-        
-        # Titre principal
-        title = doc.add_heading('Generated Marketing Copy', 0)
-        from docx.enum.text import WD_ALIGN_PARAGRAPH
-        title.alignment = WD_ALIGN_PARAGRAPH.CENTER
-        
-        # Espacement
-        doc.add_paragraph()
-        
-        # Contenu avec formatage intelligent
-        paragraphs = copy_text.split('\n\n')
-        for para_text in paragraphs:
-            if para_text.strip():
-                para = doc.add_paragraph()
-                
-                # Détecter les titres (courts et en majuscules)
-                if len(para_text.strip()) < 100 and para_text.strip().isupper():
-                    # Style titre
-                    run = para.add_run(para_text.strip())
-                    run.bold = True
-                    para.alignment = WD_ALIGN_PARAGRAPH.CENTER
-                elif para_text.strip().endswith(':') and len(para_text.strip()) < 50:
-                    # Style sous-titre
-                    run = para.add_run(para_text.strip())
-                    run.bold = True
-                else:
-                    # Style paragraphe normal
-                    para.add_run(para_text.strip())
-                    para.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
-        
-        # Sauvegarder en mémoire
-        doc_buffer = BytesIO()
-        doc.save(doc_buffer)
-        doc_buffer.seek(0)
-        
-        return send_file(
-            doc_buffer,
-            mimetype='application/vnd.openxmlformats-officedocument.wordprocessingml.document',
-            as_attachment=False,
-            download_name='preview.docx'
-        )
+        return _docx_response(as_attachment=False, download_name='preview.docx')
         
     except Exception as e:
         print(f"Error in generate_docx_preview: {str(e)}")
@@ -128,81 +234,45 @@ def generate_docx_preview():
         traceback.print_exc()
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/download-copy', methods=['POST'])
+@bp.route('/api/download-copy', methods=['POST'])
 def download_copy():
     try:
-        if not request.is_json:
-            return jsonify({'error': 'Content-Type must be application/json'}), 400
-        
-        data = request.get_json()
-        copy_text = data.get('copy', '')
-        
-        if not copy_text:
-            return jsonify({'error': 'No copy content provided'}), 400
-        
-        # Réutiliser la même logique que le preview
-        doc = Document()
-        
-        # Configuration des marges
-        sections = doc.sections
-        for section in sections:
-            section.top_margin = Inches(1)
-            section.bottom_margin = Inches(1)
-            section.left_margin = Inches(1.25)
-            section.right_margin = Inches(1.25)
-        
-        # Titre principal
-        title = doc.add_heading('Generated Marketing Copy', 0)
-        from docx.enum.text import WD_ALIGN_PARAGRAPH
-        title.alignment = WD_ALIGN_PARAGRAPH.CENTER
-        
-        # Espacement
-        doc.add_paragraph()
-        
-        # Contenu avec formatage intelligent
-        paragraphs = copy_text.split('\n\n')
-        for para_text in paragraphs:
-            if para_text.strip():
-                para = doc.add_paragraph()
-                
-                if len(para_text.strip()) < 100 and para_text.strip().isupper():
-                    run = para.add_run(para_text.strip())
-                    run.bold = True
-                    para.alignment = WD_ALIGN_PARAGRAPH.CENTER
-                elif para_text.strip().endswith(':') and len(para_text.strip()) < 50:
-                    run = para.add_run(para_text.strip())
-                    run.bold = True
-                else:
-                    para.add_run(para_text.strip())
-                    para.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
-        
-        # Sauvegarder en mémoire pour téléchargement
-        doc_buffer = BytesIO()
-        doc.save(doc_buffer)
-        doc_buffer.seek(0)
-        
-        return send_file(
-            doc_buffer,
-            as_attachment=True,
-            download_name='generated-copy.docx',
-            mimetype='application/vnd.openxmlformats-officedocument.wordprocessingml.document'
-        )
+        return _docx_response(as_attachment=True, download_name='generated-copy.docx')
         
     except Exception as e:
         print(f"Error in download_copy: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/generate_design', methods=['POST'])
-def generate_design():
-    if 'copy' not in request.files:
-        return jsonify({'error': 'No file provided'}), 400
+DESIGN_LANGUAGES = ('FR', 'NL')
+
+def _parse_languages(form):
+    """Languages of a multi-language generation (JSON list or "FR,NL"), None when not requested."""
+    raw = form.get('languages', '').strip()
+    if not raw:
+        return None
+    try:
+        languages = json.loads(raw) if raw.startswith('[') else raw.split(',')
+    except json.JSONDecodeError:
+        raise ValueError('languages must be a JSON list or a comma separated list')
+    languages = list(dict.fromkeys(str(language).strip().upper() for language in languages if str(language).strip()))
+    invalid = [language for language in languages if language not in DESIGN_LANGUAGES]
+    if not languages or invalid:
+        raise ValueError(f"Invalid languages {', '.join(invalid) or raw}, must be among {', '.join(DESIGN_LANGUAGES)}")
+    return languages
+
+def _prepare_design(form, files, job):
+    """Validate a design generation request and extract the anonymized copy (once for every language)."""
+    if 'copy' not in files:
+        return {'success': False, 'error': 'No file provided', 'status_code': 400}
+    try:
+        languages = _parse_languages(form)
+    except ValueError as e:
+        return {'success': False, 'error': str(e), 'status_code': 400}
 
-    copy = request.files['copy']
+    copy = files['copy']
 
     # Get additional parameters from the request body
-    words_to_anonymize = request.form.get('words_to_anonymize', '[]')  # Default to empty list if not provided
-    generation_type = request.form.get('generation_type', 'design')  # Default to design
-    language = request.form.get('language', 'FR') # Default language if not provided
+    words_to_anonymize = form.get('words_to_anonymize', '[]')  # Default to empty list if not provided
     
     try:
         if isinstance(words_to_anonymize, str):
@@ -211,37 +281,149 @@ def generate_design():
         # If parsing fails, treat as None
         words_to_anonymize = []
 
-    example_fs = [make_filestorage_from(str(p)) 
-                  for p in Path("model_templates/design").glob("*.html")]
+    # Extract anonymized content from the copy (examples come from the similarity index)
+    with job.stage('extract'):
+        result = registry.extractor.extract_anonymized(
+            copy,
+            words_to_anonymize=words_to_anonymize,
+            parse_html=False
+        )
 
-    # Extract anonymized content from the documents
-    result = extractor_service.extract_anonymized(
-        example_fs,
-        copy,
-        words_to_anonymize=words_to_anonymize,
-        parse_html=False
-    )
+    if not result['success']:
+        return result
+    return {'success': True, 'text': result['docs'][-1], 'mapping': result['mapping'], 'languages': languages}
 
-    if result['success']:
-        examples = ""
-        for idx, example in enumerate(result['docs'][:-1], start=1): 
-            examples += f"Example {idx} :\n{example}\n---\n"
+def generate_design_task(form, files, job=None):
+    """
+    Generate an HTML design from a copy file. With `languages` (e.g. FR,NL) every
+    variant is generated from the same extraction, returned in 'variants'.
+    """
+    job = job or NullJobContext()
+    prepared = _prepare_design(form, files, job)
+    if not prepared['success']:
+        return prepared
+
+    generation_type = form.get('generation_type', 'design')  # Default to design
+    language = form.get('language', 'FR') # Default language if not provided
+
+    with job.stage('generate'):
+        if prepared['languages']:
+            variants = dict(registry.generator.generate_many(
+                prepared['text'],
+                prepared['mapping'],
+                prepared['languages'],
+                top_k=_get_int(form, 'top_k', DEFAULT_TOP_K),
+                token_budget=_get_int(form, 'token_budget', DEFAULT_TOKEN_BUDGET)
+            ))
+            return {'success': True, 'variants': {language: variants[language] for language in prepared['languages']}}
 
         # generate the design using the generator service
-        generated_result = generator_service.generate(
-            result['docs'][-1], #copy
-            mapping=result['mapping'],
-            examples=examples,
+        generated_result = registry.generator.generate(
+            prepared['text'], #copy
+            mapping=prepared['mapping'],
             generation_type=generation_type,
-            language=language
+            language=language,
+            top_k=_get_int(form, 'top_k', DEFAULT_TOP_K),
+            token_budget=_get_int(form, 'token_budget', DEFAULT_TOKEN_BUDGET)
         )
 
-        return generated_result
-    else:
-        return jsonify({'error': result['error']}), result.get('status_code', 500)
+    return {'success': True, 'output': generated_result}
+
+@bp.route('/api/generate_design', methods=['POST'])
+def generate_design():
+    """
+    One language: the HTML. Several (languages=FR,NL): one NDJSON line per variant
+    {"language", "output"} streamed as soon as it is generated, or with response=json
+    all the variants at once {"variants": {"FR": ..., "NL": ...}}.
+    """
+    if not request.form.get('languages') or request.form.get('response') == 'json':
+        result = generate_design_task(request.form, request.files)
+        if not result['success']:
+            return jsonify({'error': result['error']}), result.get('status_code', 500)
+        if 'variants' in result:
+            return jsonify({'variants': result['variants']})
+        return result['output']
+
+    prepared = _prepare_design(request.form, request.files, NullJobContext())
+    if not prepared['success']:
+        return jsonify({'error': prepared['error']}), prepared.get('status_code', 500)
+
+    variants = registry.generator.generate_many(
+        prepared['text'],
+        prepared['mapping'],
+        prepared['languages'],
+        top_k=_get_int(request.form, 'top_k', DEFAULT_TOP_K),
+        token_budget=_get_int(request.form, 'token_budget', DEFAULT_TOKEN_BUDGET)
+    )
+
+    def stream():
+        for language, output in variants:
+            yield json.dumps({'language': language, 'output': output}, ensure_ascii=False) + "\n"
+
+    return Response(stream_with_context(stream()), mimetype='application/x-ndjson')
+
+def generate_pdf_task(form, files, job=None):
+    """
+    Generate an HTML design from a copy file and render it to PDF in the pooled browser,
+    without the save / zip / upload round trip through /api/convert.
+
+    With response=pdf the PDF is written to the job output file, otherwise the HTML and
+    the base64 PDF are returned together.
+    """
+    job = job or NullJobContext()
+    if form.get('languages'):
+        return {'success': False, 'error': 'generate_pdf renders one language, use language', 'status_code': 400}
+    response = form.get('response', 'json')
+    if response not in ('json', 'pdf'):
+        return {'success': False, 'error': f'Invalid response {response}, must be json or pdf', 'status_code': 400}
+    try:
+        options = _pdf_options(form)
+    except ValueError as e:
+        return {'success': False, 'error': str(e), 'status_code': 400}
+
+    result = generate_design_task(form, files, job)
+    if not result['success']:
+        return result
+    html = result['output']
+
+    if response == 'pdf':
+        path_pdf = job.output_file('design.pdf', 'application/pdf')
+        with job.stage('render'):
+            registry.convertor.html_string_to_pdf(html, path_pdf, options)
+        return {'success': True, 'download_name': 'design.pdf'}
 
+    with job.stage('render'):
+        pdf = registry.convertor.html_string_to_pdf(html, options=options)
+    return {'success': True, 'html': html, 'pdf': base64.b64encode(pdf).decode('ascii')}
 
-@app.route('/api/extract', methods=['POST'])
+@bp.route('/api/generate_pdf', methods=['POST'])
+def generate_pdf():
+    job = NullJobContext()
+    try:
+        result = generate_pdf_task(request.form, request.files, job)
+        if not result['success']:
+            return jsonify({'error': result['error']}), result.get('status_code', 500)
+        if job.result_path:
+            return send_file(
+                job.result_path,
+                as_attachment = True,
+                download_name = result['download_name'],
+                mimetype = job.result_mimetype
+            )
+        return jsonify({'html': result['html'], 'pdf': result['pdf']})
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        return jsonify({'error' : str(e)}), 500
+
+    finally:
+        if job.result_path:
+            try: os.remove(job.result_path)
+            except OSError: pass
+
+
+@bp.route('/api/extract', methods=['POST'])
 def extract():
     if 'doc1' not in request.files or 'doc2' not in request.files:
         return jsonify({'error': 'Two files required for extraction'}), 400
@@ -257,165 +439,424 @@ def extract():
     except (json.JSONDecodeError, TypeError):
         words_to_anonymize = []
     
-    if not extractor_service:
+    if not registry.extractor:
         return jsonify({'error': 'Extraction service not available'}), 503
         
-    result = extractor_service.extract_anonymized(
+    result = registry.extractor.extract_anonymized(
         doc1, doc2, 
         words_to_anonymize=words_to_anonymize
     )
     
     if result['success']:
-        return jsonify({
-            'docs': result['docs'],
-            'mapping': result['mapping']
-        })
+        # The mapping stays on the server: the client gets a session handle to send back
+        try:
+            session, mapping = registry.mapping_store.merge(request.form.get('session'), result['mapping'])
+        except SessionError as e:
+            return jsonify({'error': str(e)}), e.status_code
+        response = {'docs': result['docs'], 'session': session}
+        if request.form.get('include_mapping', '').lower() in ('1', 'true'):
+            response['mapping'] = mapping
+        return jsonify(response)
     else:
         return jsonify({'error': result['error']}), result.get('status_code', 500)
+
+@bp.route('/api/sessions/<handle>/deanonymize', methods=['POST'])
+def deanonymize_session(handle):
+    """
+    Restore the real values in anonymized content of a session (documents returned by
+    /api/extract, edited texts...): JSON {"data": string, list or object}.
+    """
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict) or 'data' not in data:
+        return jsonify({'error': 'JSON body {"data": ...} required'}), 400
+    try:
+        restored = registry.mapping_store.deanonymize(handle, data['data'])
+    except SessionError as e:
+        return jsonify({'error': str(e)}), e.status_code
+    return jsonify({'data': restored, 'session': handle})
+
+@bp.route('/api/sessions/<handle>', methods=['DELETE'])
+def delete_session(handle):
+    """Forget a session's mapping now (end of the review) instead of at its TTL."""
+    if not registry.mapping_store.delete(handle):
+        return jsonify({'error': f'Unknown session: {handle}'}), 404
+    return '', 204
   
     
-@app.route('/api/compare', methods=['POST'])
-def compare():
+def compare_task(form, files, job=None):
+    """
+    Compare two documents (texts, files or a mix of both).
+
+    With a `campaign`, the design is a revision: only the blocks changed since the
+    campaign's previous revision are compared again (copy_design comparisons only).
+    """
+    job = job or NullJobContext()
+    words_to_anonymize = form.get('words_to_anonymize', '[]')  
+    comparison_type = form.get('comparison_type', 'copy_design')  
+    campaign = (form.get('campaign') or '').strip()
+    
     try:
-        print("🔍 Compare endpoint called")
-        print(f"📋 Form keys: {list(request.form.keys())}")
-        print(f"📁 File keys: {list(request.files.keys())}")
-        
-        words_to_anonymize = request.form.get('words_to_anonymize', '[]')  
-        comparison_type = request.form.get('comparison_type', 'copy_design')  
-        
-        try:
-            if isinstance(words_to_anonymize, str):
-                words_to_anonymize = json.loads(words_to_anonymize)
-        except (json.JSONDecodeError, TypeError):
-            words_to_anonymize = []
+        if isinstance(words_to_anonymize, str):
+            words_to_anonymize = json.loads(words_to_anonymize)
+    except (json.JSONDecodeError, TypeError):
+        words_to_anonymize = []
 
-        if not extractor_service or not comparator_service:
-            return jsonify({'error': 'Comparison services not available'}), 503
-        
-        # Get text inputs
-        text1 = request.form.get('text1')
-        text2 = request.form.get('text2')
+    if not registry.extractor or not registry.comparator:
+        return {'success': False, 'error': 'Comparison services not available', 'status_code': 503}
 
+    if campaign and comparison_type != 'copy_design':
+        return {'success': False, 'error': 'campaign is only supported with comparison_type=copy_design', 'status_code': 400}
+    if campaign and registry.comparator.revalidation_store is None:
+        return {'success': False, 'error': 'Revalidation store not available', 'status_code': 503}
+    
+    # Get text inputs
+    text1 = form.get('text1')
+    text2 = form.get('text2')
+
+    with job.stage('extract'):
         # MODE 1: Si on a du texte, utiliser directement le texte
         if text1 and text2:
             
-            # Anonymiser le texte directement
-            docs = [
-                anonymize_text(text1, words_to_anonymize)[0],
-                anonymize_text(text2, words_to_anonymize)[0]
-            ]
-            mapping = {}  # Pas de mapping pour le texte direct
+            # Anonymiser les deux textes ensemble (mapping partagé)
+            result = registry.extractor.anonymize_texts([text1, text2], words_to_anonymize)
+            docs = result['docs']
+            mapping = result['mapping']
             
         # MODE 2: Si on a des fichiers, utiliser l'extractor
-        elif 'doc1' in request.files and 'doc2' in request.files:
+        elif 'doc1' in files and 'doc2' in files:
             
-            doc1 = [request.files['doc1']]
-            doc2 = [request.files['doc2']]
+            doc1 = [files['doc1']]
+            doc2 = [files['doc2']]
         
-            result = extractor_service.extract_anonymized(
+            result = registry.extractor.extract_anonymized(
                 doc1, doc2, 
                 words_to_anonymize=words_to_anonymize
             )
             
             if not result['success']:
                 print(f"❌ Extractor failed: {result['error']}")
-                return jsonify({'error': result['error']}), result.get('status_code', 500)
+                return result
             
             docs = result['docs']
             mapping = result['mapping']
             
         # MODE 3: Mode mixte - texte ET fichier
-        elif (text1 or 'doc1' in request.files) and (text2 or 'doc2' in request.files):
+        elif (text1 or 'doc1' in files) and (text2 or 'doc2' in files):
             
-            docs = []
-            
-            # Traiter doc1
-            if text1:
-                docs.append(anonymize_text(text1, words_to_anonymize)[0])
-            else:
-                doc1_result = extractor_service.extract_anonymized(
-                    [request.files['doc1']], [], 
-                    words_to_anonymize=words_to_anonymize
-                )
-                if not doc1_result['success']:
-                    return jsonify({'error': f"Doc1 extraction failed: {doc1_result['error']}"}), 500
-                docs.append(doc1_result['docs'][0])
+            texts = []
+            for side, text in (('1', text1), ('2', text2)):
+                if text:
+                    texts.append(text)
+                    continue
+                doc_result = registry.extractor.extract_text([files[f'doc{side}']])
+                if not doc_result['success']:
+                    return {'success': False, 'error': f"Doc{side} extraction failed: {doc_result['error']}", 'status_code': doc_result.get('status_code', 500)}
+                texts.append(doc_result['result'])
             
-            # Traiter doc2
-            if text2:
-                docs.append(anonymize_text(text2, words_to_anonymize)[0])
-            else:
-                doc2_result = extractor_service.extract_anonymized(
-                    [], [request.files['doc2']], 
-                    words_to_anonymize=words_to_anonymize
-                )
-                if not doc2_result['success']:
-                    return jsonify({'error': f"Doc2 extraction failed: {doc2_result['error']}"}), 500
-                docs.append(doc2_result['docs'][1])
-            
-            mapping = {}  # Mapping simplifié pour mode mixte
+            # Texte et fichier anonymisés ensemble: le mapping n'est plus perdu
+            result = registry.extractor.anonymize_texts(texts, words_to_anonymize)
+            docs = result['docs']
+            mapping = result['mapping']
             
         else:
-            return jsonify({'error': 'Please provide either text1/text2 OR doc1/doc2 files'}), 400
-        
-        comp_result = comparator_service.compare(
-            docs[0], 
-            docs[1], 
-            mapping=mapping,
-            comparison_type=comparison_type
-        )
+            return {'success': False, 'error': 'Please provide either text1/text2 OR doc1/doc2 files', 'status_code': 400}
+
+        # Session: the texts may hold placeholders of documents anonymized by earlier requests
+        session = None
+        if 'session' in form:
+            try:
+                session, mapping = registry.mapping_store.merge(form.get('session'), mapping)
+            except SessionError as e:
+                return {'success': False, 'error': str(e), 'status_code': e.status_code}
+    
+    with job.stage('compare'):
+        if campaign:
+            comp_result = registry.comparator.revalidate(docs[0], docs[1], mapping=mapping, campaign=campaign)
+        else:
+            comp_result = registry.comparator.compare(
+                docs[0], 
+                docs[1], 
+                mapping=mapping,
+                comparison_type=comparison_type
+            )
+
+    if session and comp_result['success']:
+        comp_result['session'] = session
+    return comp_result
+
+@bp.route('/api/compare', methods=['POST'])
+def compare():
+    try:
+        print("🔍 Compare endpoint called")
+        print(f"📋 Form keys: {list(request.form.keys())}")
+        print(f"📁 File keys: {list(request.files.keys())}")
+
+        comp_result = compare_task(request.form, request.files)
 
         if comp_result['success']:
-            return jsonify({'result': comp_result['result']})
+            return jsonify({key: value for key, value in comp_result.items() if key != 'success'})
         else:
             return jsonify({'error': comp_result['error']}), comp_result.get('status_code', 500)
-            
+
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"❌ Error in compare endpoint: {str(e)}")
         import traceback
         traceback.print_exc()
         return jsonify({'error': str(e)}), 500
-    
-@app.route('/api/convert', methods=['POST'])
-def convert():
-    service = ConvertorService()
+
+@bp.route('/api/compare_batch', methods=['POST'])
+def compare_batch():
+    """
+    Compare many pairs in one request. Form fields:
+    - pairs: JSON list of {"id", "doc1", "doc2"} (file names) or {"id", "text1", "text2"}
+    - files: the uploaded documents, each file uploaded once even if used by several pairs
+    - words_to_anonymize, comparison_type: shared by every pair
+    Each finished comparison is streamed as one NDJSON line.
+    """
+    if not registry.batch_comparator:
+        return jsonify({'error': 'Comparison services not available'}), 503
+
+    try:
+        pairs = json.loads(request.form.get('pairs', '[]'))
+        words_to_anonymize = json.loads(request.form.get('words_to_anonymize', '[]'))
+    except (json.JSONDecodeError, TypeError):
+        return jsonify({'error': 'pairs and words_to_anonymize must be JSON lists'}), 400
+
+    if not isinstance(pairs, list) or not pairs:
+        return jsonify({'error': 'No pairs provided'}), 400
+    invalid = [index for index, pair in enumerate(pairs) if not isinstance(pair, dict)]
+    if invalid:
+        return jsonify({'error': f'pairs must be JSON objects (invalid at index {", ".join(map(str, invalid))})'}), 400
+    if not isinstance(words_to_anonymize, list):
+        return jsonify({'error': 'pairs and words_to_anonymize must be JSON lists'}), 400
+    if len(pairs) > current_app.config['BATCH_MAX_PAIRS']:
+        return jsonify({'error': f"Too many pairs (max {current_app.config['BATCH_MAX_PAIRS']})"}), 400
+
+    files = {}
+    for file in request.files.getlist('files'):
+        if file.filename in files:
+            return jsonify({'error': f'Duplicate file name: {file.filename}'}), 400
+        files[file.filename] = file
+
+    results = registry.batch_comparator.compare(
+        pairs,
+        files,
+        words_to_anonymize=words_to_anonymize,
+        comparison_type=request.form.get('comparison_type', 'copy_design')
+    )
+
+    def stream():
+        for result in results:
+            yield json.dumps(result, ensure_ascii=False) + "\n"
+
+    return Response(stream_with_context(stream()), mimetype='application/x-ndjson')
+
+PDF_LENGTH = re.compile(r'^\d+(\.\d+)?(mm|cm|in|px)$')
+
+def _pdf_options(form) -> dict:
+    """Page size / background of the PDF from the form (width, height, background)."""
+    options = {}
+    for key in ('width', 'height'):
+        value = form.get(key, '').strip()
+        if value:
+            if not PDF_LENGTH.match(value):
+                raise ValueError(f'Invalid {key} {value}, expected e.g. 210mm')
+            options[key] = value
+    if form.get('background'):
+        options['print_background'] = form.get('background').lower() in ('1', 'true', 'yes', 'on')
+    return options
+
+def convert_task(form, files, job=None):
+    """
+    Convert a ZIP (HTML + img folder) into a PDF written to the job output file.
+
+    With output=zip or output=merged every HTML file of the ZIP is converted (campaign
+    variants): a ZIP of PDFs or one merged PDF, with the per-document timings.
+    Renders are cached on disk by ZIP content and options: a reconversion is not rendered again.
+    """
+    job = job or NullJobContext()
     # Check if the file is well uploaded
-    if 'doc' not in request.files :
-        return jsonify({'error': 'No file "doc" provided'}), 400
-    doc_zip = request.files['doc']
+    if 'doc' not in files :
+        return {'success': False, 'error': 'No file "doc" provided', 'status_code': 400}
+    doc_zip = files['doc']
 
     # Check if the file is a zip type
-    if not service._allowed_file(doc_zip):
-        return jsonify({'error' : f'invalid type file {doc_zip.content_type}, must be application/zip'}), 400
+    if not registry.convertor._allowed_file(doc_zip):
+        return {'success': False, 'error': f'invalid type file {doc_zip.content_type}, must be application/zip', 'status_code': 400}
+
+    output = form.get('output', 'pdf')
+    if output not in ('pdf', 'zip', 'merged'):
+        return {'success': False, 'error': f'Invalid output {output}, must be pdf, zip or merged', 'status_code': 400}
+    try:
+        options = _pdf_options(form)
+    except ValueError as e:
+        return {'success': False, 'error': str(e), 'status_code': 400}
+
+    if output == 'zip':
+        download_name, path_out = 'converted_files.zip', job.output_file('converted_files.zip', 'application/zip')
+    else:
+        download_name, path_out = 'converted_file.pdf', job.output_file('converted_file.pdf', 'application/pdf')
+
+    # -------- Render cache (same ZIP content + same options) -------- #
+    pdf_cache = registry.pdf_cache
+    cache_key = None
+    if pdf_cache is not None:
+        cache_key = pdf_cache.key_for(
+            hashlib.sha256(shared_buffer(doc_zip)).hexdigest(),
+            output=output, from_memory=registry.convertor.from_memory,
+            allowed_hosts=registry.convertor.allowed_hosts, **options
+        )
+        with job.stage('cache'):
+            meta = pdf_cache.fetch(cache_key, path_out)
+        if meta is not None:
+            return {'success': True, 'download_name': download_name, 'cached': True, **meta}
     
     # Temporary file to save the ZIP content
     fd_zip, path_zip = tempfile.mkstemp(suffix='.zip')
     os.close(fd_zip) # (we don't need the file descriptor)
     doc_zip.save(path_zip)
 
-    # preparation of the output PDF 
-    fd_pdf, path_pdf = tempfile.mkstemp(suffix='.pdf')
-    os.close(fd_pdf)
+    try:
+        meta = {}
+        with job.stage('render'):
+            if output == 'pdf':
+                registry.convertor.html_to_pdf(path_zip, path_out, options)
+            else:
+                meta['documents'] = registry.convertor.html_to_pdf_batch(
+                    path_zip, path_out, merge=(output == 'merged'), options=options)
+
+        if cache_key is not None:
+            pdf_cache.store(cache_key, path_out, meta)
+        return {'success': True, 'download_name': download_name, 'cached': False, **meta}
 
+    finally:
+        try: os.remove(path_zip)
+        except OSError: pass
+    
+@bp.route('/api/convert', methods=['POST'])
+def convert():
+    job = NullJobContext()
     try:
-        asyncio.run(service.html_to_pdf(path_zip, path_pdf))
-        return send_file(
-            path_pdf,
+        result = convert_task(request.form, request.files, job)
+        if not result['success']:
+            return jsonify({'error': result['error']}), result.get('status_code', 500)
+        response = send_file(
+            job.result_path,
             as_attachment = True, 
-            download_name = 'converted_file.pdf',
-            mimetype = 'application/pdf'
+            download_name = result['download_name'],
+            mimetype = job.result_mimetype
         )
-    
+        response.headers['X-Convert-Cache'] = 'hit' if result['cached'] else 'miss'
+        if 'documents' in result:
+            # Per-document wait/render times of a batch conversion (to size the browser pool)
+            response.headers['X-Convert-Documents'] = json.dumps(result['documents'], ensure_ascii=True)
+        return response
+
+    except HTTPException:
+        raise
     except Exception as e:
         return jsonify({'error' : str(e)}), 500
     
     finally:
-        for p in (path_zip, path_pdf):
-            try: os.remove(p)
+        if job.result_path:
+            try: os.remove(job.result_path)
             except OSError: pass
 
+@bp.route('/api/metrics/llm', methods=['GET'])
+def llm_metrics():
+    """Gemini calls of this worker process: coalesced identical calls, queue times by priority class."""
+    return jsonify({
+        'pid': os.getpid(),
+        'single_flight': gemini_client.single_flight.stats(),
+        'scheduler': gemini_client.scheduler.stats()
+    })
+
+#--------------------------------------------
+#------------- Background jobs --------------
+#--------------------------------------------
+
+@bp.route('/api/jobs/<kind>', methods=['POST'])
+def submit_job(kind):
+    """Queue a long-running task with the same form fields and files as its synchronous endpoint."""
+    submitted = job_service.submit(kind, request.form, request.files)
+    if not submitted['success']:
+        return jsonify({'error': submitted['error']}), submitted.get('status_code', 500)
+
+    job_id = submitted['id']
+    return jsonify({
+        'id': job_id,
+        'status': 'queued',
+        'status_url': f'/api/jobs/{job_id}',
+        'result_url': f'/api/jobs/{job_id}/result',
+        'events_url': f'/api/jobs/{job_id}/events'
+    }), 202
+
+@bp.route('/api/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    status = job_service.status(job_id)
+    if status is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(status)
+
+@bp.route('/api/jobs/<job_id>/result', methods=['GET'])
+def job_result(job_id):
+    job = job_service.result(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+
+    if job['status'] in ('queued', 'running'):
+        return jsonify({'status': job['status']}), 202
+    if job['status'] != 'succeeded':
+        return jsonify({'status': job['status'], 'error': job['error'] or 'Job cancelled'}), job['status_code'] or 409
+
+    if job['result_path']:
+        return send_file(
+            job['result_path'],
+            as_attachment = True,
+            download_name = job['result'].get('download_name', os.path.basename(job['result_path'])),
+            mimetype = job['result_mimetype']
+        )
+    return jsonify({key: value for key, value in job['result'].items() if key != 'success'})
+
+@bp.route('/api/jobs/<job_id>/cancel', methods=['POST'])
+@bp.route('/api/jobs/<job_id>', methods=['DELETE'])
+def cancel_job(job_id):
+    status = job_service.cancel(job_id)
+    if status is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(status)
+
+@bp.route('/api/jobs/<job_id>/events', methods=['GET'])
+def job_events(job_id):
+    """
+    Server-Sent Events stream of the job status, until it finishes or for at most
+    JOBS_EVENTS_WINDOW seconds: the stream then ends with a retry delay and the
+    browser reconnects, so a request thread is never held for a whole LLM run.
+    """
+    if job_service.status(job_id) is None:
+        return jsonify({'error': 'Job not found'}), 404
+    window = current_app.config['JOBS_EVENTS_WINDOW']
+
+    def stream():
+        yield "retry: 1000\n\n"
+        deadline = time.monotonic() + window
+        last = None
+        while time.monotonic() < deadline:
+            status = job_service.status(job_id)
+            if status != last:
+                yield f"data: {json.dumps(status)}\n\n"
+                last = status
+            if status is None or status['status'] in FINISHED_STATES:
+                break
+            time.sleep(0.5)
+
+    return Response(stream(), mimetype='text/event-stream', headers={'Cache-Control': 'no-cache'})
+
 if __name__ == '__main__':
-    app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024
-    app.run(debug=True, port=5000)
-    # app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
+    # Development server; use `gunicorn -c gunicorn.conf.py wsgi:app` in production
+    app = create_app()
+    if not Config.DEBUG or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        job_service.start()  # only in the process serving requests (not the reloader)
+    app.run(debug=Config.DEBUG, host=Config.HOST, port=Config.PORT)
@@ -0,0 +1,90 @@
+"""
+DOCX render time: python-docx built per render (previous implementation) vs the
+pre-built base template with batched XML (services/docx_renderer.py). The render
+cache is bypassed so every iteration pays for a full render.
+
+    python benchmarks/bench_docx.py --repeat 20
+"""
+import argparse
+import sys
+import time
+from io import BytesIO
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from docx import Document
+from docx.enum.text import WD_ALIGN_PARAGRAPH
+from docx.shared import Inches
+
+from services.docx_renderer import DocxRenderer
+
+TITLE = 'Generated Marketing Copy'
+
+
+def legacy_render(copy_text: str) -> bytes:
+    """The per-render python-docx build formerly duplicated in app.py."""
+    doc = Document()
+    for section in doc.sections:
+        section.top_margin = Inches(1)
+        section.bottom_margin = Inches(1)
+        section.left_margin = Inches(1.25)
+        section.right_margin = Inches(1.25)
+    title = doc.add_heading(TITLE, 0)
+    title.alignment = WD_ALIGN_PARAGRAPH.CENTER
+    doc.add_paragraph()
+    for para_text in copy_text.split('\n\n'):
+        if para_text.strip():
+            para = doc.add_paragraph()
+            if len(para_text.strip()) < 100 and para_text.strip().isupper():
+                run = para.add_run(para_text.strip())
+                run.bold = True
+                para.alignment = WD_ALIGN_PARAGRAPH.CENTER
+            elif para_text.strip().endswith(':') and len(para_text.strip()) < 50:
+                run = para.add_run(para_text.strip())
+                run.bold = True
+            else:
+                para.add_run(para_text.strip())
+                para.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
+    buffer = BytesIO()
+    doc.save(buffer)
+    return buffer.getvalue()
+
+
+def sample_copy(paragraphs: int) -> str:
+    blocks = []
+    for i in range(paragraphs):
+        if i % 10 == 0:
+            blocks.append(f"SECTION {i // 10 + 1}")
+        elif i % 10 == 1:
+            blocks.append("Conditions :")
+        else:
+            blocks.append(f"Paragraphe {i} : profitez de notre offre fibre et mobile à prix réduit. " * 3)
+    return "\n\n".join(blocks)
+
+
+def timed(render, copy_text: str, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        render(copy_text)
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    renderer = DocxRenderer()
+    renderer._build(sample_copy(1), TITLE)  # build the base template once
+
+    print(f"{'paragraphs':>10} {'python-docx':>14} {'base template':>14} {'speedup':>8}")
+    for paragraphs in (10, 100, 1000):
+        copy_text = sample_copy(paragraphs)
+        legacy = timed(legacy_render, copy_text, args.repeat)
+        current = timed(lambda text: renderer._build(text, TITLE), copy_text, args.repeat)
+        print(f"{paragraphs:>10} {legacy:>11.1f} ms {current:>11.1f} ms {legacy / current:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,140 @@
+"""
+Token and latency savings of the HTML reducer on raw-markup prompts (design
+examples, parse_html=False), on a sample set: synthetic campaign e-mails (table
+layout, inline styles, tracking links, Outlook conditionals) and any HTML file
+given on the command line.
+
+    python benchmarks/bench_html_reducer.py
+    python benchmarks/bench_html_reducer.py model_templates/design/*.html --output reducer.json
+
+Tokens are the prompt estimate of the example index (chars / 4). Latency is the
+local prompt preparation (reduce + anonymize); the Gemini side scales with the
+input tokens. Each sample is checked to restore exactly from its placeholders.
+"""
+import argparse
+import json
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from services.elsa import anonymize_text, deanonymize_text  # noqa: E402
+from services.example_index import estimate_tokens  # noqa: E402
+from services.html_reducer import minify_html, reduce_html  # noqa: E402
+
+CELL_STYLES = [
+    "font-family:Helvetica,Arial,sans-serif;font-size:14px;line-height:20px;color:#000000;padding:0 20px 10px 20px;",
+    "font-family:Helvetica,Arial,sans-serif;font-size:24px;line-height:28px;font-weight:bold;color:#ff7900;padding:20px;",
+    "background-color:#e5e5e5;padding:20px 20px 20px 20px;text-align:left;",
+    "background-color:#000000;color:#ffffff;font-size:11px;line-height:14px;padding:10px 20px;",
+]
+BUTTON_STYLE = ("display:inline-block;background-color:#ff7900;color:#ffffff;font-family:Helvetica,Arial,sans-serif;"
+                "font-size:16px;font-weight:bold;text-decoration:none;padding:12px 24px;border-radius:0;")
+
+
+def tracking_url(rng: random.Random, index: int) -> str:
+    return (f"https://click.news.example-telecom.be/?qs={rng.getrandbits(128):032x}"
+            f"&utm_source=newsletter&utm_medium=email&utm_campaign=promo_{index % 3}&utm_content=block{index}")
+
+
+def make_email(blocks: int, seed: int) -> str:
+    """Marketing e-mail as produced by the design team's tools."""
+    rng = random.Random(seed)
+    rows = []
+    for index in range(blocks):
+        style = CELL_STYLES[index % len(CELL_STYLES)]
+        rows.append(f"""
+        <!-- ===== Bloc {index} ===== -->
+        <tr>
+            <td class="mobile-padding content-cell" style="{style}" align="left" valign="top">
+                <img src="https://cdn.example-telecom.be/campaigns/2025/q4/promo-go-plus/img/visual-{index}@2x.png"
+                     width="560" class="fluid-image" style="display:block;width:100%;max-width:560px;height:auto;border:0;" alt="">
+                <p style="margin:0 0 10px 0;">Profitez de l'offre Go Plus à 25€/mois jusqu'au 31/12/2025,
+                    avec {rng.randint(10, 200)} Go de data et les appels illimités.</p>
+                <a href="{tracking_url(rng, index)}" class="button-link" style="{BUTTON_STYLE}">Je découvre</a>
+            </td>
+        </tr>""")
+    return f"""<!DOCTYPE html>
+<html lang="fr">
+<head>
+    <meta charset="utf-8">
+    <!--[if mso]><xml><o:OfficeDocumentSettings><o:PixelsPerInch>96</o:PixelsPerInch></o:OfficeDocumentSettings></xml><![endif]-->
+    <style>
+        body {{ margin: 0; padding: 0; }}
+        .hero {{ background-image: url('https://cdn.example-telecom.be/campaigns/2025/q4/promo-go-plus/img/hero-background.jpg'); }}
+        @media only screen and (max-width: 600px) {{ .mobile-padding {{ padding: 0 10px !important; }} }}
+    </style>
+    <script>window.dataLayer = window.dataLayer || []; dataLayer.push({{'event': 'email_open', 'campaign': 'promo'}});</script>
+</head>
+<body style="margin:0;padding:0;background-color:#ffffff;">
+    <table role="presentation" width="100%" cellpadding="0" cellspacing="0" border="0" class="wrapper">
+        {''.join(rows)}
+    </table>
+    <img src="https://pixel.news.example-telecom.be/open.gif?u={rng.getrandbits(64):016x}&c=promo" width="1" height="1" alt="">
+</body>
+</html>"""
+
+
+def measure(name: str, html: str, runs: int) -> dict:
+    def best_ms(fn) -> float:
+        times = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            fn()
+            times.append((time.perf_counter() - start) * 1000)
+        return min(times)
+
+    reduced, mapping = reduce_html(html)
+    return {
+        'sample': name,
+        'chars': len(html),
+        'reduced_chars': len(reduced),
+        'tokens': estimate_tokens(html),
+        'reduced_tokens': estimate_tokens(reduced),
+        'placeholders': len(mapping),
+        'restored_exactly': deanonymize_text(reduced, mapping) == minify_html(html),
+        'prepare_ms': round(best_ms(lambda: anonymize_text(html)), 2),
+        'reduced_prepare_ms': round(best_ms(lambda: anonymize_text(reduce_html(html)[0])), 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('files', nargs='*', help='HTML samples (synthetic e-mails when none)')
+    parser.add_argument('--runs', type=int, default=5, help='timing runs per sample (best kept)')
+    parser.add_argument('--output', help='write the JSON report to this file (default: stdout)')
+    args = parser.parse_args()
+
+    samples = [(Path(path).name, Path(path).read_text(encoding='utf-8')) for path in args.files]
+    if not samples:
+        samples = [(f"email_{blocks}_blocks", make_email(blocks, seed=blocks)) for blocks in (4, 12, 30)]
+
+    results = [measure(name, html, args.runs) for name, html in samples]
+    tokens = sum(r['tokens'] for r in results)
+    reduced_tokens = sum(r['reduced_tokens'] for r in results)
+    report = {
+        'samples': results,
+        'total': {
+            'tokens': tokens,
+            'reduced_tokens': reduced_tokens,
+            'token_savings_pct': round(100 * (1 - reduced_tokens / tokens), 1) if tokens else 0.0,
+            'median_prepare_savings_pct': round(statistics.median(
+                100 * (1 - r['reduced_prepare_ms'] / r['prepare_ms']) for r in results if r['prepare_ms']
+            ), 1),
+            'all_restored': all(r['restored_exactly'] for r in results),
+        },
+    }
+
+    output = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        Path(args.output).write_text(output + "\n", encoding='utf-8')
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""
+Startup cost of the application: `python -X importtime` of the app factory, in a
+fresh interpreter, with the slowest modules (cumulative time) and the heavy
+libraries that were imported at startup.
+
+    python benchmarks/bench_import.py --runs 5 --top 20
+    python benchmarks/bench_import.py --warm-up   # same with WARM_UP=1 (eager services)
+
+Services are built on first use, so the Gemini SDK, python-docx, PyPDF2, bs4 and
+Playwright should not appear unless --warm-up is given.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+HEAVY_PACKAGES = ('google.genai', 'docx', 'PyPDF2', 'bs4', 'playwright')
+
+STARTUP = "import wsgi"  # what gunicorn imports: create_app() included
+
+
+def run_once(env: dict) -> tuple:
+    """Wall time (ms) and `-X importtime` report of one cold start."""
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', STARTUP],
+        cwd=ROOT, env=env, capture_output=True, text=True
+    )
+    wall_ms = (time.perf_counter() - start) * 1000
+    if proc.returncode != 0:
+        raise RuntimeError(f"Startup failed:\n{proc.stderr[-2000:]}")
+    return wall_ms, parse_importtime(proc.stderr)
+
+
+def parse_importtime(stderr: str) -> dict:
+    """module -> (self_us, cumulative_us) from the `import time:` lines (nested modules keep their indent)."""
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|', 2)
+        modules[name[1:].rstrip()] = (int(self_us), int(cumulative_us))
+    return modules
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=3, help='cold starts measured (the median is reported)')
+    parser.add_argument('--top', type=int, default=15, help='slowest modules listed')
+    parser.add_argument('--warm-up', action='store_true', help='start with WARM_UP=1')
+    parser.add_argument('--output', help='write the JSON report to this file (default: stdout)')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='bench-import-')
+    env = dict(os.environ, WARM_UP='1' if args.warm_up else '0', TRACE_LOG='0',
+               JOBS_DB_PATH=os.path.join(workdir, 'jobs.db'), JOBS_SPOOL_DIR=os.path.join(workdir, 'spool'))
+    env.setdefault('GEMINI_API_KEY', 'benchmark')
+
+    runs = [run_once(env) for _ in range(args.runs)]
+    walls = [wall for wall, _ in runs]
+    modules = runs[walls.index(sorted(walls)[len(walls) // 2])][1]  # report of the median run
+
+    top_level = {name: cumulative for name, (_, cumulative) in modules.items() if not name.startswith(' ')}
+    slowest = sorted(modules.items(), key=lambda item: item[1][1], reverse=True)[:args.top]
+    report = {
+        'warm_up': args.warm_up,
+        'runs': args.runs,
+        'startup_ms': {'median': round(statistics.median(walls), 1), 'min': round(min(walls), 1)},
+        'import_ms': round(sum(top_level.values()) / 1000, 1),
+        'modules': len(modules),
+        'slowest': [{'module': name.strip(), 'self_ms': round(self_us / 1000, 1), 'cumulative_ms': round(cumulative_us / 1000, 1)}
+                    for name, (self_us, cumulative_us) in slowest],
+        # by prefix: importlib.import_module() (warm_up) does not log the top-level package line
+        'heavy_imported': sorted({package for package in HEAVY_PACKAGES for name in modules
+                                  if name.strip() == package or name.strip().startswith(package + '.')}),
+    }
+
+    output = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        Path(args.output).write_text(output + "\n", encoding='utf-8')
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
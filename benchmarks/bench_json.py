@@ -0,0 +1,84 @@
+"""
+Bytes on the wire and serialization time of the large JSON reports
+(/api/compare and /api/extract), before (Flask's default jsonify, uncompressed)
+and after (orjson + gzip / brotli, see services/compression.py).
+
+    python benchmarks/bench_json.py --repeat 50
+"""
+import argparse
+import gzip
+import json
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+from services.compression import FastJSONProvider, brotli, orjson
+
+
+def compare_report(blocks: int) -> dict:
+    """Report shaped like CommercialComparisonPrompt's schema."""
+    return {'result': {
+        'content_blocks': [{
+            'block_name': f'Bloc {i} – Offre fibre',
+            'copy_requirements': [f'Exigence {j} du copy : prix promotionnel de 25 € pendant 6 mois' for j in range(6)],
+            'design_implementation': [f'Implémentation {j} dans le design, bannière et CTA « Je commande »' for j in range(6)],
+            'validation_status': '⚠️ Problèmes mineures',
+            'validator_notes': 'Le prix affiché dans l’image ne correspond pas au copy. ' * 8,
+        } for i in range(blocks)],
+        'commercial_validation': {
+            key: {'status': '✅ Précis', 'findings': ['Constat détaillé sur la conformité. ' * 4] * 5}
+            for key in ('pricing_accuracy', 'promotional_offers', 'legal_disclaimers')
+        },
+        'similarity_score': 87,
+    }}
+
+
+def extract_payload(chars: int) -> dict:
+    text = ('Profitez de [MOTCLE_3f2a1b] Fiber à [NUMERO_9c8d7e] € par mois, appelez le [TEL_1a2b3c]. ' * (chars // 90))
+    return {
+        'docs': [text, text.replace('Fiber', 'Giga')],
+        'mapping': {f'[MOTCLE_{i:06x}]': f'Mot clé {i}' for i in range(300)},
+    }
+
+
+def timed(fn, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    default_provider = DefaultJSONProvider(app)
+    fast_provider = FastJSONProvider(app)
+    print(f"orjson: {'yes' if orjson else 'no'}   brotli: {'yes' if brotli else 'no'}\n")
+
+    samples = {
+        'compare (40 blocks)': compare_report(40),
+        'extract (2 x 200 KB)': extract_payload(200_000),
+    }
+    print(f"{'payload':<22} {'jsonify':>10} {'fast':>10} {'raw bytes':>11} {'gzip':>9} {'brotli':>9}")
+    for name, payload in samples.items():
+        before_ms = timed(lambda: default_provider.dumps(payload), args.repeat)
+        after_ms = timed(lambda: fast_provider.dumps(payload), args.repeat)
+
+        raw = default_provider.dumps(payload).encode('utf-8')  # what jsonify sent before
+        fast = fast_provider.dumps(payload).encode('utf-8')
+        gzipped = len(gzip.compress(fast, compresslevel=6))
+        brotlied = len(brotli.compress(fast, quality=5)) if brotli else 0
+
+        print(f"{name:<22} {before_ms:>7.2f} ms {after_ms:>7.2f} ms {len(raw):>11} {gzipped:>9} {brotlied:>9}")
+
+
+if __name__ == '__main__':
+    main()
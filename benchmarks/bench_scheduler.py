@@ -0,0 +1,106 @@
+"""
+LLM scheduler under synthetic load, with the fake Gemini backend: a batch flood
+(campaign QA) starts first, then interactive calls arrive while it is queued.
+The same load runs with a plain FIFO (one class, no caps) and with the priority
+scheduler, and the latencies and queue times of each class are compared.
+
+    python benchmarks/bench_scheduler.py --llm-latency 200 --batch 200 --interactive 40
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from benchmarks import fake_llm  # noqa: E402
+from llm import gemini_client  # noqa: E402
+from llm.scheduler import BATCH, BACKGROUND, INTERACTIVE, PRIORITIES, LLMScheduler, priority  # noqa: E402
+
+
+def _percentile_ms(values: list, pct: float) -> float:
+    values = sorted(values)
+    if not values:
+        return 0.0
+    return round(values[min(len(values) - 1, round(pct / 100 * (len(values) - 1)))] * 1000, 1)
+
+
+def run_load(scheduler: LLMScheduler, args, fifo: bool = False) -> dict:
+    """
+    Batch flood, then interactive calls spaced by --interval. With fifo=True every call
+    is admitted in one class (arrival order), the labels only split the report.
+    """
+    gemini_client.scheduler = scheduler
+    client = gemini_client.GeminiClient(api_key='bench')
+    latencies = {name: [] for name in PRIORITIES}
+    lock = threading.Lock()
+
+    def call(name: str, index: int):
+        with priority(BATCH if fifo else name):
+            start = time.perf_counter()
+            client.generate_content(f"{name} prompt {index}")  # distinct payloads: nothing coalesced
+            with lock:
+                latencies[name].append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.batch + args.background + args.interactive) as pool:
+        for index in range(args.batch):
+            pool.submit(call, BATCH, index)
+        for index in range(args.background):
+            pool.submit(call, BACKGROUND, index)
+        time.sleep(args.llm_latency / 1000)  # the flood is queued when the users arrive
+        for index in range(args.interactive):
+            pool.submit(call, INTERACTIVE, index)
+            time.sleep(args.interval / 1000)
+
+    return {
+        'elapsed_s': round(time.perf_counter() - start, 2),
+        'latency_ms': {name: {'p50': _percentile_ms(values, 50), 'p95': _percentile_ms(values, 95)}
+                       for name, values in latencies.items()},
+        'scheduler': scheduler.stats(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--llm-latency', type=float, default=200, help='fake LLM latency (ms)')
+    parser.add_argument('--concurrency', type=int, default=8, help='Gemini calls at once')
+    parser.add_argument('--batch', type=int, default=200, help='batch calls (queued first)')
+    parser.add_argument('--background', type=int, default=20, help='background job calls')
+    parser.add_argument('--interactive', type=int, default=40, help='interactive calls')
+    parser.add_argument('--interval', type=float, default=50, help='ms between interactive arrivals')
+    parser.add_argument('--output', help='write the JSON report to this file (default: stdout)')
+    args = parser.parse_args()
+
+    os.chdir(ROOT)
+    fake_llm.install(latency_ms=args.llm_latency)
+
+    fifo = LLMScheduler(max_concurrency=args.concurrency)
+    prioritized = LLMScheduler(max_concurrency=args.concurrency,
+                               caps={INTERACTIVE: args.concurrency, BACKGROUND: max(1, args.concurrency // 2),
+                                     BATCH: max(1, args.concurrency // 2)})
+    report = {
+        'config': vars(args),
+        'fifo': run_load(fifo, args, fifo=True),
+        'priority': run_load(prioritized, args),
+        'llm_calls': fake_llm.total_calls(),
+    }
+
+    output = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        Path(args.output).write_text(output + "\n", encoding='utf-8')
+    else:
+        print(output)
+    for mode in ('fifo', 'priority'):
+        latency = report[mode]['latency_ms']
+        print(f"{mode:9s} latency p95 (ms): " + "  ".join(f"{name} {latency[name]['p95']:8.1f}" for name in PRIORITIES)
+              + f"   total {report[mode]['elapsed_s']} s", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
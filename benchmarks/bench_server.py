@@ -0,0 +1,125 @@
+"""
+Local benchmark: requests per second of the Flask dev server vs the production
+gunicorn setup, on endpoints that do not call the LLM.
+
+    python benchmarks/bench_server.py --duration 10 --concurrency 16
+
+Both servers are started from the repository root with the current environment
+(a GEMINI_API_KEY is needed to build the clients, but no Gemini call is made).
+
+The gain depends on the cores: on a 1-CPU machine the WEB_WORKERS processes and
+the benchmark client share one core, and gunicorn measured x0.5 to x1.0 of the
+dev server (`--duration 3 --concurrency 4`, several runs: / 365-472 vs 337-443
+req/s, DOCX preview 349-480 vs 264-336 req/s). Run it on the target hardware.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from config import Config  # noqa: E402
+
+COPY_SAMPLE = "\n\n".join(
+    ["OFFRE SPÉCIALE", "Conditions :"] + [f"Paragraphe {i} du copy marketing de test." * 5 for i in range(20)]
+)
+
+ENDPOINTS = {
+    'index': ('GET', '/', None),
+    'docx_preview': ('POST', '/api/generate_docx_preview', json.dumps({'copy': COPY_SAMPLE}).encode()),
+}
+
+
+def start_server(kind: str, port: int) -> subprocess.Popen:
+    env = dict(os.environ, PORT=str(port), HOST='127.0.0.1')
+    env.setdefault('GEMINI_API_KEY', 'benchmark')
+    if kind == 'dev':
+        env['FLASK_DEBUG'] = '1'  # what `app.run(debug=True)` used to do
+        cmd = [sys.executable, 'app.py']
+    else:
+        cmd = [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'wsgi:app']
+    return subprocess.Popen(cmd, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def wait_ready(base_url: str, timeout: float = 60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            urllib.request.urlopen(base_url + '/', timeout=2).read()
+            return
+        except OSError:
+            time.sleep(0.5)
+    raise RuntimeError(f"Server at {base_url} did not start")
+
+
+def hammer(base_url: str, method: str, path: str, body, duration: float, concurrency: int) -> dict:
+    headers = {'Content-Type': 'application/json'} if body else {}
+
+    def worker(_):
+        count, errors = 0, 0
+        deadline = time.time() + duration
+        while time.time() < deadline:
+            request = urllib.request.Request(base_url + path, data=body, method=method, headers=headers)
+            try:
+                urllib.request.urlopen(request, timeout=30).read()
+                count += 1
+            except OSError:
+                errors += 1
+        return count, errors
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(worker, range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    total = sum(count for count, _ in results)
+    return {
+        'requests': total,
+        'errors': sum(errors for _, errors in results),
+        'rps': round(total / elapsed, 1)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--duration', type=float, default=10, help='seconds per endpoint')
+    parser.add_argument('--concurrency', type=int, default=16, help='concurrent clients')
+    parser.add_argument('--port', type=int, default=5055)
+    parser.add_argument('--output', help='write the JSON report to this file')
+    args = parser.parse_args()
+
+    report = {'concurrency': args.concurrency, 'duration': args.duration, 'cpu_count': os.cpu_count(),
+              'gunicorn_workers': Config.WEB_WORKERS, 'servers': {}}
+    for kind in ('dev', 'gunicorn'):
+        base_url = f"http://127.0.0.1:{args.port}"
+        server = start_server(kind, args.port)
+        try:
+            wait_ready(base_url)
+            report['servers'][kind] = {
+                name: hammer(base_url, method, path, body, args.duration, args.concurrency)
+                for name, (method, path, body) in ENDPOINTS.items()
+            }
+        finally:
+            server.terminate()
+            server.wait(timeout=150)
+
+    print(f"{os.cpu_count()} CPU, gunicorn with {Config.WEB_WORKERS} workers x {Config.WEB_THREADS} threads")
+    for name in ENDPOINTS:
+        dev = report['servers']['dev'][name]['rps']
+        prod = report['servers']['gunicorn'][name]['rps']
+        print(f"{name:<14} dev {dev:>8} req/s   gunicorn {prod:>8} req/s   x{prod / dev if dev else 0:.1f}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+"""
+Fake Gemini backend for benchmarks and local load tests: replaces `genai.Client`
+so the whole request path (prompts, tracing, JSON parsing, de-anonymization) runs
+without network calls. Each call sleeps `latency_ms` to stand in for the model.
+
+    from benchmarks import fake_llm
+    fake_llm.install(latency_ms=300)   # before the services are built (create_app)
+"""
+import json
+import threading
+import time
+
+
+class FakeResponse:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class FakeModels:
+    def __init__(self, latency_ms: float):
+        self.latency_ms = latency_ms
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def generate_content(self, model, contents, config=None):
+        with self._lock:
+            self.calls += 1
+        time.sleep(self.latency_ms / 1000)
+
+        mime_type = getattr(config, 'response_mime_type', None)
+        if isinstance(contents, list):
+            # Image extraction: a JSON string, the shape parse_image strips into text
+            return FakeResponse(json.dumps("OFFRE SPÉCIALE Go Plus 25€/mois jusqu'au 31/12/2025"))
+        if mime_type == 'application/json':
+            return FakeResponse(json.dumps({
+                'similarity_score': 87,
+                'summary': "Les documents sont globalement alignés.",
+                'differences': [{'element': 'prix', 'copy': '25€', 'design': '25€', 'status': 'ok'}],
+            }, ensure_ascii=False))
+        return FakeResponse(
+            "<!DOCTYPE html><html><head><style>h1{color:#ff7900}</style></head><body>"
+            "<h1>Offre spéciale</h1><p>" + ("Contenu généré. " * 50) + "</p></body></html>"
+        )
+
+
+class FakeClient:
+    """Stand-in for google.genai.Client (only `models.generate_content` is used)."""
+
+    latency_ms = 0.0
+    models_instances = []
+
+    def __init__(self, api_key=None, **kwargs):
+        self.models = FakeModels(FakeClient.latency_ms)
+        FakeClient.models_instances.append(self.models)
+
+
+def install(latency_ms: float = 0.0):
+    """Make every Gemini client built from now on use the fake backend."""
+    from google import genai  # imported by the Gemini clients when they are built
+
+    FakeClient.latency_ms = latency_ms
+    genai.Client = FakeClient
+
+
+def total_calls() -> int:
+    return sum(models.calls for models in FakeClient.models_instances)
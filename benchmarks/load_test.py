@@ -0,0 +1,325 @@
+"""
+End-to-end load test: the Flask app is served in-process over HTTP with a fake
+Gemini backend (benchmarks/fake_llm.py) and driven with a synthetic corpus of
+DOCX, PDF, HTML and PNG documents at several sizes.
+
+    python benchmarks/load_test.py --concurrency 8 --requests 50 --llm-latency 300 --output load.json
+
+The JSON report (throughput and p50/p95/p99 latency per endpoint) is stable across
+runs with the same options, so two commits can be compared with a plain diff.
+/api/convert needs the Playwright Chromium (`playwright install chromium`); skip it
+with --endpoints when it is not installed.
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import struct
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+import zipfile
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from itertools import cycle
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+SIZES = {'small': 5, 'medium': 50, 'large': 400}  # paragraphs per document
+
+PARAGRAPH = ("L'offre Go Plus de Orange Mobile est à 25€/mois jusqu'au 31/12/2025, "
+             "appelez le 0470 12 34 56 ou rendez-vous Avenue Louise 120. ")
+
+
+# -------- Synthetic corpus -------- #
+
+def paragraphs(count: int) -> list:
+    return [f"{'OFFRE SPÉCIALE' if i % 10 == 0 else PARAGRAPH * 3} ({i})" for i in range(count)]
+
+
+def make_docx(count: int) -> bytes:
+    from docx import Document
+    doc = Document()
+    for text in paragraphs(count):
+        doc.add_paragraph(text)
+    buffer = io.BytesIO()
+    doc.save(buffer)
+    return buffer.getvalue()
+
+
+def make_html(count: int, image: str = None) -> bytes:
+    body = "".join(f"<p>{text}</p>" for text in paragraphs(count))
+    img = f'<img src="{image}">' if image else ''
+    return (f"<!DOCTYPE html><html><head><meta charset='utf-8'><style>p{{font-family:sans-serif}}</style></head>"
+            f"<body><h1>Campagne</h1>{img}{body}</body></html>").encode('utf-8')
+
+
+def make_pdf(count: int) -> bytes:
+    """Minimal text PDF (Helvetica, one page per 40 lines) readable by PyPDF2."""
+    lines = [line.encode('latin-1', 'replace').decode('latin-1') for line in paragraphs(count)]
+    pages = [lines[i:i + 40] for i in range(0, len(lines), 40)] or [[]]
+
+    objects = []  # object bodies, numbered from 1
+    def add(body: bytes) -> int:
+        objects.append(body)
+        return len(objects)
+
+    font = add(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>")
+    pages_id = len(objects) + 2 * len(pages) + 1
+    page_ids = []
+    for page_lines in pages:
+        text = "BT /F1 8 Tf 20 800 Td 10 TL " + " ".join(
+            "(" + line[:150].replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)') + ") '"
+            for line in page_lines
+        ) + " ET"
+        stream = text.encode('latin-1')
+        content = add(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        page_ids.append(add(
+            b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 595 842] /Contents %d 0 R "
+            b"/Resources << /Font << /F1 %d 0 R >> >> >>" % (pages_id, content, font)
+        ))
+    kids = b" ".join(b"%d 0 R" % page_id for page_id in page_ids)
+    add(b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, len(page_ids)))
+    catalog = add(b"<< /Type /Catalog /Pages %d 0 R >>" % pages_id)
+
+    out = io.BytesIO()
+    out.write(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(out.tell())
+        out.write(b"%d 0 obj\n" % number + body + b"\nendobj\n")
+    xref = out.tell()
+    out.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+    for offset in offsets:
+        out.write(b"%010d 00000 n \n" % offset)
+    out.write(b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, catalog, xref))
+    return out.getvalue()
+
+
+def make_png(width: int, height: int) -> bytes:
+    """Orange gradient PNG of the given size."""
+    rows = b"".join(
+        b"\x00" + b"".join(bytes((255, (121 + x + y) % 256, 0)) for x in range(width))
+        for y in range(height)
+    )
+
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data) & 0xffffffff)
+
+    header = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    return b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header) + chunk(b"IDAT", zlib.compress(rows, 6)) + chunk(b"IEND", b"")
+
+
+def make_zip(count: int) -> bytes:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as z:
+        z.writestr('campagne/index.html', make_html(count, image='img/visuel.png'))
+        z.writestr('campagne/img/visuel.png', make_png(600, 300))
+    return buffer.getvalue()
+
+
+def build_corpus() -> dict:
+    corpus = {}
+    for size, count in SIZES.items():
+        corpus[size] = {
+            'docx': make_docx(count),
+            'pdf': make_pdf(count),
+            'html': make_html(count),
+            'png': make_png(*{'small': (200, 100), 'medium': (800, 400), 'large': (1600, 900)}[size]),
+            'zip': make_zip(count),
+            'text': "\n\n".join(paragraphs(count)),
+        }
+    return corpus
+
+
+MIMETYPES = {
+    'docx': 'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
+    'pdf': 'application/pdf',
+    'html': 'text/html',
+    'png': 'image/png',
+    'zip': 'application/zip',
+}
+
+
+# -------- Requests -------- #
+
+def multipart(fields: dict, files: dict) -> tuple:
+    """Encode form fields and files ({name: (kind, data)}) as multipart/form-data."""
+    boundary = uuid.uuid4().hex
+    parts = []
+    for name, value in fields.items():
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode('utf-8'))
+    for name, (kind, data) in files.items():
+        parts.append((f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{name}.{kind}"\r\n'
+                      f'Content-Type: {MIMETYPES[kind]}\r\n\r\n').encode('utf-8') + data + b'\r\n')
+    parts.append(f'--{boundary}--\r\n'.encode('utf-8'))
+    return b"".join(parts), f'multipart/form-data; boundary={boundary}'
+
+
+def endpoint_requests(corpus: dict) -> dict:
+    """Per endpoint, the cycle of (path, body, content type) requests sent by the clients."""
+    def extract(size, kinds):
+        return multipart({'words_to_anonymize': '["Samsung"]'},
+                         {'doc1': (kinds[0], corpus[size][kinds[0]]), 'doc2': (kinds[1], corpus[size][kinds[1]])})
+
+    requests = {
+        'extract': [('/api/extract',) + extract(size, kinds)
+                    for size in SIZES for kinds in (('docx', 'pdf'), ('html', 'png'))],
+        'compare': [('/api/compare',) + multipart({'comparison_type': 'copy_design'},
+                                                  {'doc1': ('docx', corpus[size]['docx']), 'doc2': ('html', corpus[size]['html'])})
+                    for size in SIZES],
+        'generate_design': [('/api/generate_design',) + multipart({'language': 'FR'}, {'copy': ('docx', corpus[size]['docx'])})
+                            for size in SIZES],
+        'docx_preview': [('/api/generate_docx_preview', json.dumps({'copy': corpus[size]['text']}).encode('utf-8'),
+                          'application/json') for size in SIZES],
+        'convert': [('/api/convert',) + multipart({}, {'doc': ('zip', corpus[size]['zip'])}) for size in SIZES],
+    }
+    return requests
+
+
+def percentile(sorted_values: list, p: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(p / 100 * len(sorted_values) + 0.5)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def drive(base_url: str, requests: list, total: int, concurrency: int) -> dict:
+    latencies, statuses = [], {}
+    lock = threading.Lock()
+    queue = cycle(requests)
+
+    def send(_):
+        with lock:
+            path, body, content_type = next(queue)
+        request = urllib.request.Request(base_url + path, data=body, method='POST',
+                                         headers={'Content-Type': content_type})
+        start = time.perf_counter()
+        try:
+            with urllib.request.urlopen(request, timeout=300) as response:
+                response.read()
+                status = response.status
+        except urllib.error.HTTPError as e:
+            status = e.code
+        except OSError:
+            status = 0
+        elapsed = (time.perf_counter() - start) * 1000
+        with lock:
+            latencies.append(elapsed)
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(send, range(total)))
+    wall = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        'requests': total,
+        'errors': total - statuses.get('200', 0),
+        'status': statuses,
+        'throughput_rps': round(total / wall, 2),
+        'mean_ms': round(sum(latencies) / len(latencies), 1),
+        'p50_ms': round(percentile(latencies, 50), 1),
+        'p95_ms': round(percentile(latencies, 95), 1),
+        'p99_ms': round(percentile(latencies, 99), 1),
+        'max_ms': round(latencies[-1], 1),
+    }
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def serve(port: int):
+    """Build the app with the fake LLM and serve it from a background thread."""
+    import logging
+    from werkzeug.serving import make_server
+
+    import app as app_module
+
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)  # no access log line per request
+
+    app = app_module.create_app()
+    server = make_server('127.0.0.1', port, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--concurrency', type=int, default=8, help='concurrent clients')
+    parser.add_argument('--requests', type=int, default=40, help='requests per endpoint')
+    parser.add_argument('--warmup', type=int, default=3, help='unmeasured requests per endpoint')
+    parser.add_argument('--llm-latency', type=float, default=300, help='fake LLM latency (ms)')
+    parser.add_argument('--endpoints', nargs='*', default=None,
+                        help='subset of: extract compare generate_design docx_preview convert')
+    parser.add_argument('--port', type=int, default=5056)
+    parser.add_argument('--output', help='write the JSON report to this file (default: stdout)')
+    args = parser.parse_args()
+
+    # The app reads its configuration at import: isolated state, no caches skewing the numbers
+    workdir = tempfile.mkdtemp(prefix='loadtest-')
+    os.environ.setdefault('GEMINI_API_KEY', 'load-test')
+    os.environ.update({
+        'JOBS_DB_PATH': os.path.join(workdir, 'jobs.db'),
+        'JOBS_SPOOL_DIR': os.path.join(workdir, 'spool'),
+        'CONVERT_CACHE_MAX_BYTES': '0',
+        'DOCX_CACHE_MAX_BYTES': '0',
+        'TRACE_LOG': '0',
+    })
+    os.chdir(ROOT)
+
+    from benchmarks import fake_llm
+    fake_llm.install(latency_ms=args.llm_latency)
+    server = serve(args.port)
+    base_url = f"http://127.0.0.1:{args.port}"
+
+    corpus = build_corpus()
+    requests = endpoint_requests(corpus)
+    names = args.endpoints or list(requests)
+
+    report = {
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'cpu_count': os.cpu_count(),
+        'config': {'concurrency': args.concurrency, 'requests': args.requests, 'llm_latency_ms': args.llm_latency,
+                   'sizes': SIZES},
+        'corpus_bytes': {size: {kind: len(data) for kind, data in docs.items()} for size, docs in corpus.items()},
+        'endpoints': {},
+    }
+    try:
+        for name in names:
+            drive(base_url, requests[name], args.warmup, min(args.warmup, args.concurrency) or 1)
+            calls = fake_llm.total_calls()
+            result = drive(base_url, requests[name], args.requests, args.concurrency)
+            result['llm_calls'] = fake_llm.total_calls() - calls
+            report['endpoints'][name] = result
+            print(f"{name:<16} {result['throughput_rps']:>7} req/s  p50 {result['p50_ms']:>8} ms  "
+                  f"p95 {result['p95_ms']:>8} ms  p99 {result['p99_ms']:>8} ms  errors {result['errors']}",
+                  file=sys.stderr)
+    finally:
+        server.shutdown()
+
+    output = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+def _env_int(name: str, default: int) -> int:
+    value = os.getenv(name)
+    return int(value) if value else default
+
+
+def _env_bool(name: str, default: bool = False) -> bool:
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in {'1', 'true', 'yes', 'on'}
+
+
+def _per_worker(total: int, workers: int) -> int:
+    """Share of a process-wide budget for one server worker (at least 1)."""
+    return max(1, -(-total // max(1, workers)))
+
+
+class Config:
+    """Application configuration, read from the environment (and the .env file)."""
+
+    GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
+
+    # Server (dev server and gunicorn.conf.py)
+    HOST = os.getenv('HOST', '127.0.0.1')
+    PORT = _env_int('PORT', 5000)
+    WEB_WORKERS = _env_int('WEB_WORKERS', 2 * (os.cpu_count() or 1) + 1)
+    WEB_THREADS = _env_int('WEB_THREADS', 8)
+    WEB_TIMEOUT = _env_int('WEB_TIMEOUT', 300)           # LLM and Chromium calls can be slow
+    GRACEFUL_TIMEOUT = _env_int('GRACEFUL_TIMEOUT', 120)  # time given to in-flight calls on shutdown
+
+    # Flask
+    DEBUG = _env_bool('FLASK_DEBUG')
+    MAX_CONTENT_LENGTH = _env_int('MAX_CONTENT_LENGTH', 16 * 1024 * 1024)
+
+    # Responses: textual bodies above this size are gzip/brotli compressed
+    COMPRESS_MIN_SIZE = _env_int('COMPRESS_MIN_SIZE', 1024)
+    COMPRESS_STATIC = _env_bool('COMPRESS_STATIC', True)
+
+    # Request tracing: Server-Timing header, one JSON log line per request, optional JSONL trace file
+    TRACE_LOG = _env_bool('TRACE_LOG', True)
+    TRACE_FILE = os.getenv('TRACE_FILE')
+
+    # Per-request profiling, off by default: requests with "X-Profile: 1" (or a random sample) are profiled
+    PROFILING = _env_bool('PROFILING')
+    PROFILE_SAMPLE_RATE = float(os.getenv('PROFILE_SAMPLE_RATE', '0'))
+    PROFILE_DIR = os.getenv('PROFILE_DIR', 'profiles')
+    PROFILE_KEEP = _env_int('PROFILE_KEEP', 200)
+    PROFILE_ROUTES = _env_bool('PROFILE_ROUTES')  # serve /api/profiles (always in debug mode)
+    PROFILE_TOKEN = os.getenv('PROFILE_TOKEN')  # bearer token required by /api/profiles when set
+
+    # Peak memory per request and per stage (tracemalloc), off by default: slows allocations down
+    MEMORY_TRACKING = _env_bool('MEMORY_TRACKING')
+    MEMORY_TRACE_FRAMES = _env_int('MEMORY_TRACE_FRAMES', 1)
+    MEMORY_LOG_THRESHOLD_MB = _env_int('MEMORY_LOG_THRESHOLD_MB', 50)  # log the top allocation sites above
+    MEMORY_TOP_SITES = _env_int('MEMORY_TOP_SITES', 10)
+
+    # Services are built on first use; WARM_UP=1 builds them (and imports the heavy libraries) at startup
+    WARM_UP = _env_bool('WARM_UP')
+
+    # Raw HTML in prompts (design examples, parse_html=False): comments, scripts and whitespace dropped,
+    # repeated styles / classes and long URLs replaced with placeholders restored in the output
+    PROMPT_REDUCE_HTML = _env_bool('PROMPT_REDUCE_HTML', True)
+
+    # Identical concurrent Gemini calls (same model, config and contents) share one request
+    LLM_SINGLE_FLIGHT = _env_bool('LLM_SINGLE_FLIGHT', True)
+
+    # Gemini calls, shared by priority class (interactive requests, background jobs, batch). The caps
+    # are per process: by default each gunicorn worker gets its share of LLM_TOTAL_CONCURRENCY
+    LLM_TOTAL_CONCURRENCY = _env_int('LLM_TOTAL_CONCURRENCY', 16)
+    LLM_MAX_CONCURRENCY = _env_int('LLM_MAX_CONCURRENCY', _per_worker(LLM_TOTAL_CONCURRENCY, WEB_WORKERS))
+    LLM_INTERACTIVE_MAX = _env_int('LLM_INTERACTIVE_MAX', LLM_MAX_CONCURRENCY)
+    LLM_BACKGROUND_MAX = _env_int('LLM_BACKGROUND_MAX', max(1, LLM_MAX_CONCURRENCY // 2))
+    LLM_BATCH_MAX = _env_int('LLM_BATCH_MAX', max(1, LLM_MAX_CONCURRENCY // 2))
+
+    # DOCX previews / downloads (rendered documents cached by content hash)
+    DOCX_CACHE_MAX_BYTES = _env_int('DOCX_CACHE_MAX_BYTES', 64 * 1024 * 1024)
+
+    # HTML -> PDF conversions: one long-lived Chromium per process (so up to WEB_WORKERS Chromium under
+    # gunicorn, each started on its worker's first conversion); pages per process default to a share of
+    # BROWSER_TOTAL_PAGES
+    BROWSER_TOTAL_PAGES = _env_int('BROWSER_TOTAL_PAGES', 8)
+    BROWSER_MAX_CONCURRENCY = _env_int('BROWSER_MAX_CONCURRENCY', _per_worker(BROWSER_TOTAL_PAGES, WEB_WORKERS))
+    BROWSER_RECYCLE_AFTER = _env_int('BROWSER_RECYCLE_AFTER', 200)   # renders before relaunching Chromium
+    BROWSER_RENDER_TIMEOUT = _env_int('BROWSER_RENDER_TIMEOUT', 120)
+    CONVERT_FROM_MEMORY = _env_bool('CONVERT_FROM_MEMORY', True)  # 0: extract the ZIP to disk, wait for networkidle
+    # Resources outside the ZIP are blocked, except http(s) ones from these hosts (and their subdomains),
+    # e.g. CONVERT_ALLOWED_HOSTS=cdn.example.com,fonts.gstatic.com
+    CONVERT_ALLOWED_HOSTS = tuple(h.strip().lower() for h in os.getenv('CONVERT_ALLOWED_HOSTS', '').split(',') if h.strip())
+    CONVERT_CACHE_DIR = os.getenv('CONVERT_CACHE_DIR', 'cache/pdf')
+    CONVERT_CACHE_MAX_BYTES = _env_int('CONVERT_CACHE_MAX_BYTES', 512 * 1024 * 1024)  # 0 disables the render cache
+
+    # Batch comparisons (/api/compare_batch)
+    BATCH_MAX_WORKERS = _env_int('BATCH_MAX_WORKERS', 4)
+    BATCH_MAX_PAIRS = _env_int('BATCH_MAX_PAIRS', 200)
+
+    # Anonymization mappings kept server-side by session handle, in SQLite shared by the workers
+    # (empty path: in memory, only valid with a single worker)
+    MAPPING_TTL = _env_int('MAPPING_TTL', 3600)
+    MAPPING_DB_PATH = os.getenv('MAPPING_DB_PATH', 'cache/mappings.db') or None
+
+    # Incremental revalidation of design revisions (/api/compare with a campaign): block results of the
+    # last revision of each campaign, in SQLite by default (empty path: in memory, per worker)
+    REVALIDATION_DB_PATH = os.getenv('REVALIDATION_DB_PATH', 'cache/revalidation.db') or None
+    REVALIDATION_TTL = _env_int('REVALIDATION_TTL', 30 * 24 * 3600)
+    REVALIDATION_MAX_WORKERS = _env_int('REVALIDATION_MAX_WORKERS', 4)
+
+    # Background jobs
+    JOBS_DB_PATH = os.getenv('JOBS_DB_PATH', 'jobs/jobs.db')
+    JOBS_SPOOL_DIR = os.getenv('JOBS_SPOOL_DIR', 'jobs/spool')
+    JOBS_MAX_WORKERS = _env_int('JOBS_MAX_WORKERS', 4)
+    JOBS_MAX_PENDING = _env_int('JOBS_MAX_PENDING', 100)
+    JOBS_LEASE = _env_int('JOBS_LEASE', 60)  # running jobs of a worker that stops renewing it are re-queued
+    JOBS_MAX_ATTEMPTS = _env_int('JOBS_MAX_ATTEMPTS', 3)
+    JOBS_EVENTS_WINDOW = _env_int('JOBS_EVENTS_WINDOW', 20)  # seconds an SSE job stream stays open before reconnecting
+
+    # Uploads: kept in memory up to the threshold, spooled to disk above it
+    UPLOAD_SPOOL_THRESHOLD = _env_int('UPLOAD_SPOOL_THRESHOLD', 1024 * 1024)
+    UPLOAD_MAX_FILE_SIZE = _env_int('UPLOAD_MAX_FILE_SIZE', MAX_CONTENT_LENGTH)
+    UPLOAD_SPOOL_DIR = os.getenv('UPLOAD_SPOOL_DIR') or None
@@ -0,0 +1,52 @@
+"""
+Gunicorn configuration for production (all values come from the environment, see config.py).
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+The application is preloaded in the master process and shared by the forked workers;
+its services are built on first use in each worker, or in the master with WARM_UP=1. Each worker starts
+its own background job pool after the fork and drains it on graceful shutdown.
+"""
+from config import Config
+
+bind = f"{Config.HOST}:{Config.PORT}"
+
+# Requests mostly wait on the LLM or Chromium: threaded workers, count derived from the CPUs
+worker_class = "gthread"
+workers = Config.WEB_WORKERS
+threads = Config.WEB_THREADS
+
+preload_app = True
+
+timeout = Config.WEB_TIMEOUT
+graceful_timeout = Config.GRACEFUL_TIMEOUT  # in-flight LLM calls get this long to finish
+keepalive = 5
+
+accesslog = "-"
+errorlog = "-"
+
+
+def when_ready(server):
+    """The LLM and browser caps are per worker: log what they add up to."""
+    server.log.info(
+        "%d workers: up to %d concurrent Gemini calls (LLM_MAX_CONCURRENCY %d per worker), "
+        "up to %d Chromium processes with %d pages each (BROWSER_MAX_CONCURRENCY)",
+        workers, workers * Config.LLM_MAX_CONCURRENCY, Config.LLM_MAX_CONCURRENCY,
+        workers, Config.BROWSER_MAX_CONCURRENCY
+    )
+
+
+def post_fork(server, worker):
+    """Thread pools do not survive fork(): start the job workers in each worker process."""
+    import app
+    app.job_service.start()
+
+
+def worker_exit(server, worker):
+    """Drain the running jobs (in-flight LLM / Chromium calls) before the worker exits."""
+    import app
+    if app.job_service is not None:
+        app.job_service.shutdown(wait=True)
+    convertor = app.registry.built('convertor')
+    if convertor is not None:
+        convertor.shutdown()  # Chromium of the worker, started on first conversion
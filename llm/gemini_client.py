@@ -1,8 +1,18 @@
-from google import genai
-from google.genai import types
+from __future__ import annotations
+
 import json
 from typing import Dict, List, Union, Optional
 from llm.prompt_manager import PromptManager
+from llm.scheduler import LLMScheduler, current_priority
+from llm.single_flight import SingleFlight, payload_key
+from services.tracing import span, traced
+
+# google.genai is imported when the first client is built (slow import, not needed by every worker)
+
+# Shared by every client of the process: identical calls coalesce across services,
+# and all of them go through the same priority scheduler (configured by init_services)
+single_flight = SingleFlight()
+scheduler = LLMScheduler()
 
 
 class GeminiClient:
@@ -39,11 +49,12 @@ class GeminiClient:
         }
         
         # Initialize the client and prompt manager
+        from google import genai
         self.client = genai.Client(api_key=api_key)
         self.prompt_manager = PromptManager()
 
 
-    def _create_generation_config(self, **overrides) -> types.GenerateContentConfig:
+    def _create_generation_config(self, **overrides) -> "types.GenerateContentConfig":
         """
         Create a generation config with optional overrides.
         
@@ -53,6 +64,7 @@ class GeminiClient:
         Returns:
             types.GenerateContentConfig: Configured generation settings
         """
+        from google.genai import types
         config = self.config.copy()
         config.update(overrides)
         
@@ -66,6 +78,7 @@ class GeminiClient:
             response_schema=config.get('response_schema')
         )
     
+    @traced('llm')
     def generate_content(self, 
                         contents: Union[str, List[Union[str, types.Part]]], 
                         **config_overrides) -> str:
@@ -83,16 +96,25 @@ class GeminiClient:
         """
         try:
             config = self._create_generation_config(**config_overrides)
-            
-            response = self.client.models.generate_content(
-                model=self.model_name,
-                contents=contents,
-                config=config
-            )
-            
-            return response.text if response.text else ""
-            
+            llm_priority = current_priority()
+
+            def call() -> str:
+                # A slot of the caller's priority class: batch traffic cannot starve interactive requests
+                with scheduler.slot(llm_priority):
+                    response = self.client.models.generate_content(
+                        model=self.model_name,
+                        contents=contents,
+                        config=config
+                    )
+                return response.text if response.text else ""
+
+            # Identical concurrent requests (same campaign opened by several reviewers) share one call.
+            # Keyed by priority class too: a waiter never queues behind the slot of another class.
+            key = payload_key(self.model_name, contents, {**self.config, **config_overrides})
+            return single_flight.do(f"{llm_priority}:{key}", call)
+
         except Exception as e:
+            # Outer boundary only: the error went through single_flight.do to every waiter
             print(f"Error generating content: {str(e)}")
             return ""    
     
@@ -114,17 +136,19 @@ class GeminiClient:
             Union[str, Dict]: Extracted text or structured response
         """
         try:
-            # Default prompt for text extraction
-            if prompt is None:
-                prompt = self.prompt_manager.get_image_extraction_prompt()
-            
-            # Read image data from FileStorage
-            file.seek(0)  # Ensure we're at the beginning
-            image_bytes = file.read()
-            
-            # Create image part using the file's content type
-            mime_type = file.content_type or 'image/png'
-            image_part = types.Part.from_bytes(data=image_bytes, mime_type=mime_type)
+            with span('llm_payload'):
+                # Default prompt for text extraction
+                if prompt is None:
+                    prompt = self.prompt_manager.get_image_extraction_prompt()
+                
+                # Read image data from FileStorage
+                file.seek(0)  # Ensure we're at the beginning
+                image_bytes = file.read()
+                
+                # Create image part using the file's content type
+                mime_type = file.content_type or 'image/png'
+                from google.genai import types
+                image_part = types.Part.from_bytes(data=image_bytes, mime_type=mime_type)
             
             # Configure structured response if requested
             if structured:
@@ -169,7 +193,8 @@ class GeminiClient:
         """
         try:
             # Get prompt and schema from prompt manager
-            prompt = self.prompt_manager.get_comparison_prompt(comparison_type, text1, text2)
+            with span('llm_payload'):
+                prompt = self.prompt_manager.get_comparison_prompt(comparison_type, text1, text2)
 
             # Configure structured response if requested
             if structured:
@@ -210,7 +235,8 @@ class GeminiClient:
         """
         try:
             # Get prompt for design generation
-            prompt = self.prompt_manager.get_design_generation_prompt(copy, examples=examples, language=language)
+            with span('llm_payload'):
+                prompt = self.prompt_manager.get_design_generation_prompt(copy, examples=examples, language=language)
 
             # Generate design content
             result = self.generate_content(
@@ -0,0 +1,147 @@
+import contextvars
+import statistics
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+from services.tracing import span
+
+
+INTERACTIVE, BACKGROUND, BATCH = 'interactive', 'background', 'batch'
+PRIORITIES = (INTERACTIVE, BACKGROUND, BATCH)
+
+# Share of the Gemini slots each class gets when all of them are waiting
+DEFAULT_WEIGHTS = {INTERACTIVE: 8, BACKGROUND: 2, BATCH: 1}
+
+_current_priority: contextvars.ContextVar = contextvars.ContextVar('llm_priority', default=INTERACTIVE)
+
+
+def current_priority() -> str:
+    return _current_priority.get()
+
+
+@contextmanager
+def priority(name: str):
+    """
+    Priority class of the Gemini calls made inside the block (interactive by default:
+    API requests). Contextvars do not follow thread pools: set it in the worker thread.
+    """
+    if name not in PRIORITIES:
+        raise ValueError(f"Unknown priority {name}, must be one of {', '.join(PRIORITIES)}")
+    token = _current_priority.set(name)
+    try:
+        yield
+    finally:
+        _current_priority.reset(token)
+
+
+class _Ticket:
+    __slots__ = ('priority', 'start_tag', 'finish_tag', 'enqueued', 'granted')
+
+    def __init__(self, priority: str, start_tag: float, finish_tag: float):
+        self.priority = priority
+        self.start_tag = start_tag
+        self.finish_tag = finish_tag
+        self.enqueued = time.perf_counter()
+        self.granted = threading.Event()
+
+
+class LLMScheduler:
+    """
+    Admission of the Gemini calls of the process, by priority class.
+
+    At most `max_concurrency` calls run at once and each class at most its cap. When a
+    slot frees up, waiting calls are served by weighted fair queuing: each call gets a
+    virtual finish tag advancing by 1/weight in its class, and the smallest tag among
+    the classes under their cap goes first. An interactive burst therefore overtakes a
+    queued batch, while batch still gets its weighted share instead of starving.
+    """
+
+    def __init__(self, max_concurrency: int = 8, caps: Optional[Dict[str, int]] = None,
+                 weights: Optional[Dict[str, float]] = None, window: int = 1000):
+        self.max_concurrency = max_concurrency
+        self.caps = {name: (caps or {}).get(name) or max_concurrency for name in PRIORITIES}
+        self.weights = {**DEFAULT_WEIGHTS, **(weights or {})}
+        self._lock = threading.Lock()
+        self._queues = {name: deque() for name in PRIORITIES}
+        self._running = {name: 0 for name in PRIORITIES}
+        self._last_finish = {name: 0.0 for name in PRIORITIES}
+        self._virtual_time = 0.0
+        self._granted = {name: 0 for name in PRIORITIES}
+        self._waits = {name: deque(maxlen=window) for name in PRIORITIES}  # recent queue times (s)
+        self._max_wait = {name: 0.0 for name in PRIORITIES}
+
+    @contextmanager
+    def slot(self, priority_name: Optional[str] = None):
+        """Hold one Gemini slot of the class (of the current priority by default)."""
+        name = priority_name or current_priority()
+        ticket = self._enqueue(name)
+        if not ticket.granted.is_set():
+            with span('llm_queue', priority=name):
+                ticket.granted.wait()
+        waited = time.perf_counter() - ticket.enqueued
+        with self._lock:
+            self._waits[name].append(waited)
+            self._max_wait[name] = max(self._max_wait[name], waited)
+        try:
+            yield waited
+        finally:
+            self._release(name)
+
+    def _enqueue(self, name: str) -> _Ticket:
+        with self._lock:
+            start_tag = max(self._virtual_time, self._last_finish[name])
+            ticket = _Ticket(name, start_tag, start_tag + 1.0 / self.weights[name])
+            self._last_finish[name] = ticket.finish_tag
+            self._queues[name].append(ticket)
+            self._dispatch()
+        return ticket
+
+    def _release(self, name: str):
+        with self._lock:
+            self._running[name] -= 1
+            self._dispatch()
+
+    def _dispatch(self):
+        """Grant free slots to the waiting calls with the smallest finish tags (lock held)."""
+        while sum(self._running.values()) < self.max_concurrency:
+            heads = [queue[0] for name, queue in self._queues.items()
+                     if queue and self._running[name] < self.caps[name]]
+            if not heads:
+                return
+            ticket = min(heads, key=lambda t: t.finish_tag)
+            self._queues[ticket.priority].popleft()
+            self._running[ticket.priority] += 1
+            self._granted[ticket.priority] += 1
+            self._virtual_time = max(self._virtual_time, ticket.start_tag)
+            ticket.granted.set()
+
+    def stats(self) -> dict:
+        """Queue length, running calls and queue time (ms, recent window) of each class."""
+        with self._lock:
+            classes = {}
+            for name in PRIORITIES:
+                waits = sorted(self._waits[name])
+                classes[name] = {
+                    'weight': self.weights[name],
+                    'cap': self.caps[name],
+                    'running': self._running[name],
+                    'queued': len(self._queues[name]),
+                    'granted': self._granted[name],
+                    'wait_ms': {
+                        'mean': round(statistics.fmean(waits) * 1000, 1) if waits else 0.0,
+                        'p50': _percentile_ms(waits, 50),
+                        'p95': _percentile_ms(waits, 95),
+                        'max': round(self._max_wait[name] * 1000, 1),
+                    },
+                }
+            return {'max_concurrency': self.max_concurrency, 'classes': classes}
+
+
+def _percentile_ms(sorted_values: list, pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, round(pct / 100 * (len(sorted_values) - 1)))
+    return round(sorted_values[index] * 1000, 1)
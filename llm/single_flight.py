@@ -0,0 +1,93 @@
+import hashlib
+import json
+import threading
+from typing import Callable
+
+
+class _Call:
+    """One in-flight call and the callers waiting for it."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Coalesce identical concurrent calls: the first caller of a key runs the call, the
+    callers arriving while it is in flight wait and share its result (or its error).
+    Nothing is cached, the next call after it finished runs again.
+    """
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.executed = 0  # calls actually run
+        self.coalesced = 0  # calls served by another caller's in-flight call
+        self.errors = 0  # failed calls (each one raised to its waiters too)
+
+    def do(self, key: str, fn: Callable):
+        if not self.enabled:
+            return fn()
+
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.executed += 1
+            else:
+                call.waiters += 1
+                self.coalesced += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except Exception as e:
+            call.error = e
+            with self._lock:
+                self.errors += 1
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'enabled': self.enabled,
+                'executed': self.executed,
+                'coalesced': self.coalesced,
+                'errors': self.errors,
+                'in_flight': len(self._calls),
+            }
+
+
+def payload_key(model: str, contents, config: dict) -> str:
+    """
+    SHA-256 of what is sent to the model: model name, generation config and contents
+    (text, or the mime type and bytes of the inline image parts).
+    """
+    digest = hashlib.sha256()
+    digest.update(model.encode())
+    digest.update(json.dumps(config, sort_keys=True, default=repr, ensure_ascii=False).encode())
+    for part in (contents if isinstance(contents, list) else [contents]):
+        inline = getattr(part, 'inline_data', None)
+        if isinstance(part, str):
+            digest.update(b'\x00text\x00' + part.encode())
+        elif inline is not None:
+            digest.update(b'\x00bytes\x00' + (inline.mime_type or '').encode() + b'\x00')
+            digest.update(inline.data or b'')
+        else:
+            digest.update(b'\x00repr\x00' + repr(part).encode())
+    return digest.hexdigest()
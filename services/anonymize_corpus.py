@@ -0,0 +1,175 @@
+"""
+Bulk anonymization of a corpus of past campaign documents (to build example libraries).
+
+Directories are walked for DOCX, PDF and HTML files (or JSONL files with one
+{"id", "text" | "path"} record per line are read), each document is parsed with
+FileParser and anonymized in a process pool, and one JSONL record per document
+({"id", "source", "text", "mapping", "bytes"} or {"id", "source", "error"}) is
+streamed to the output. Processed ids go to a checkpoint file, so an interrupted
+run started again with the same arguments resumes where it stopped.
+
+    python -m services.anonymize_corpus archive/ -o corpus.jsonl --keywords Samsung --workers 8
+    python -m services.anonymize_corpus briefs.jsonl -o corpus.jsonl --checkpoint corpus.ckpt
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Iterator, List, Optional
+
+from services.elsa import anonymize_text
+from services.generate_content import make_filestorage_from
+from services.parser import FileParser
+
+
+PARSED_SUFFIXES = {'.docx', '.pdf', '.html', '.htm'}
+
+_parser = None  # one FileParser per worker process (no Gemini client: images are not parsed)
+
+
+def iter_tasks(inputs: List[str]) -> Iterator[dict]:
+    """Documents to anonymize: files under the directories, records of the JSONL files."""
+    for source in inputs:
+        path = Path(source)
+        if path.is_dir():
+            for file in sorted(path.rglob('*')):
+                if file.is_file() and file.suffix.lower() in PARSED_SUFFIXES:
+                    yield {'id': str(file.resolve()), 'path': str(file)}
+        elif path.suffix.lower() == '.jsonl':
+            with open(path, 'r', encoding='utf-8') as f:
+                for line_number, line in enumerate(f, 1):
+                    if not line.strip():
+                        continue
+                    record = json.loads(line)
+                    record.setdefault('id', f"{path}:{line_number}")
+                    record['id'] = str(record['id'])
+                    yield record
+        elif path.is_file():
+            yield {'id': str(path.resolve()), 'path': str(path)}
+        else:
+            print(f"⚠️ Input not found: {source}", file=sys.stderr)
+
+
+def _parse(path: str, raw_html: bool) -> str:
+    global _parser
+    if _parser is None:
+        _parser = FileParser()
+
+    suffix = Path(path).suffix.lower()
+    file = make_filestorage_from(path)
+    try:
+        if suffix == '.docx':
+            return _parser.parse_docx(file)
+        if suffix == '.pdf':
+            return _parser.parse_pdf(file)
+        if suffix in ('.html', '.htm'):
+            return _parser.read_text(file) if raw_html else _parser.parse_html(file)
+        raise ValueError(f'Unsupported file type: {suffix}')
+    finally:
+        file.close()
+
+
+def anonymize_task(task: dict, keywords: List[str], raw_html: bool) -> dict:
+    """Parse (if needed) and anonymize one document, in a worker process."""
+    source = task.get('path', 'text')
+    try:
+        if 'text' in task:
+            text = task['text']
+            size = len(text.encode('utf-8'))
+        else:
+            size = os.path.getsize(task['path'])
+            text = _parse(task['path'], raw_html)
+        if not text:
+            return {'id': task['id'], 'source': source, 'bytes': size, 'error': 'No text extracted'}
+
+        anonymized, mapping = anonymize_text(text, keywords + task.get('keywords', []))
+        return {'id': task['id'], 'source': source, 'bytes': size, 'text': anonymized, 'mapping': mapping}
+
+    except Exception as e:
+        return {'id': task['id'], 'source': source, 'bytes': 0, 'error': str(e)}
+
+
+def load_checkpoint(path: Optional[str]) -> set:
+    if not path or not os.path.exists(path):
+        return set()
+    with open(path, 'r', encoding='utf-8') as f:
+        return {line.rstrip('\n') for line in f if line.strip()}
+
+
+def run(inputs: List[str], output: str, keywords: List[str] = [], workers: Optional[int] = None,
+        checkpoint: Optional[str] = None, raw_html: bool = False, report_every: int = 100) -> dict:
+    """
+    Anonymize the corpus and append one JSONL record per document to `output`.
+
+    Returns:
+        dict: 'documents', 'errors', 'skipped' (already in the checkpoint), 'seconds',
+            'docs_per_s' and 'mb_per_s'.
+    """
+    done = load_checkpoint(checkpoint)
+    tasks = (task for task in iter_tasks(inputs) if task['id'] not in done)
+
+    stats = {'documents': 0, 'errors': 0, 'skipped': len(done), 'bytes': 0}
+    start = time.perf_counter()
+
+    def report(final=False):
+        elapsed = max(time.perf_counter() - start, 1e-9)
+        stats['seconds'] = round(elapsed, 2)
+        stats['docs_per_s'] = round(stats['documents'] / elapsed, 1)
+        stats['mb_per_s'] = round(stats['bytes'] / elapsed / (1024 * 1024), 2)
+        print(f"{'✅ Done' if final else '⏳'} {stats['documents']} docs ({stats['errors']} errors) "
+              f"in {stats['seconds']}s: {stats['docs_per_s']} docs/s, {stats['mb_per_s']} MB/s", file=sys.stderr)
+
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers) as pool, \
+            open(output, 'a', encoding='utf-8') as out, \
+            open(checkpoint or os.devnull, 'a', encoding='utf-8') as ckpt:
+        window = workers * 4  # bounded number of documents in flight
+        pending = deque()
+
+        def drain(limit):
+            while len(pending) > limit:
+                record = pending.popleft().result()
+                out.write(json.dumps(record, ensure_ascii=False) + "\n")
+                out.flush()
+                # After the record: a crash in between only duplicates it on resume, never loses it
+                ckpt.write(record['id'] + "\n")
+                ckpt.flush()
+
+                stats['documents'] += 1
+                stats['bytes'] += record['bytes']
+                if 'error' in record:
+                    stats['errors'] += 1
+                if stats['documents'] % report_every == 0:
+                    report()
+
+        for task in tasks:
+            pending.append(pool.submit(anonymize_task, task, keywords, raw_html))
+            drain(window)
+        drain(0)
+
+    report(final=True)
+    del stats['bytes']
+    return stats
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Anonymize a corpus of documents to JSONL.")
+    parser.add_argument('inputs', nargs='+', help="Directories, files or JSONL files ({'id', 'text' | 'path'} per line)")
+    parser.add_argument('-o', '--output', required=True, help="Output JSONL file (appended to)")
+    parser.add_argument('--keywords', nargs='*', default=[], help="Extra words to anonymize")
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument('--checkpoint', default=None, help="Processed ids, to resume an interrupted run "
+                                                           "(default: <output>.checkpoint)")
+    parser.add_argument('--raw-html', action='store_true', help="Keep the HTML markup instead of its text")
+    args = parser.parse_args(argv)
+
+    run(args.inputs, args.output, keywords=args.keywords, workers=args.workers,
+        checkpoint=args.checkpoint or args.output + '.checkpoint', raw_html=args.raw_html)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+import hashlib
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, Iterator, List
+
+from llm.scheduler import BATCH, priority
+from services.comparator_service import ComparatorService
+from services.extractor_service import ExtractorService
+from services.tracing import submit_in_context
+from services.upload import shared_buffer
+
+
+class BatchComparatorService:
+    """
+    Compare many copy/design pairs at once (QA of a whole campaign).
+
+    Identical files shared by several pairs are extracted once, extraction and
+    comparisons run concurrently in a bounded pool, and each result is yielded as
+    soon as its pair is done so slow pairs do not hold back fast ones.
+    """
+
+    def __init__(self, extractor: ExtractorService, comparator: ComparatorService, max_workers: int = 4):
+        self.extractor = extractor
+        self.comparator = comparator
+        self.max_workers = max_workers
+
+    @staticmethod
+    def _content_key(file) -> str:
+        return hashlib.sha256(shared_buffer(file)).hexdigest()
+
+    def compare(self, pairs: List[dict], files: Dict[str, object], words_to_anonymize: List[str] = [],
+                comparison_type: str = "copy_design") -> Iterator[dict]:
+        """
+        Run the comparisons and yield one result per pair, in completion order.
+
+        Args:
+            pairs (List[dict]): Pairs with an optional 'id', 'doc1'/'doc2' (file names in `files`)
+                or 'text1'/'text2', and an optional 'comparison_type'.
+            files (Dict[str, FileStorage]): Uploaded files by file name.
+            words_to_anonymize (List[str], optional): Words anonymized in every pair.
+            comparison_type (str): Default comparison type of the pairs.
+
+        Returns:
+            Iterator[dict]: 'id', 'index', 'success' and the 'result' or 'error' of each pair,
+                with its 'timings'. The work starts right away, before the iterator is consumed.
+        """
+        # -------- Dedupe identical files across pairs -------- #
+        # (hashing maps the shared buffers now, so they outlive the request files)
+        keys = {name: self._content_key(file) for name, file in files.items()}
+        unique_files = {}
+        for name, key in keys.items():
+            unique_files.setdefault(key, files[name])
+
+        pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="batch")
+
+        # Extractions are queued first, so a comparison never waits on one that has not started
+        extractions = {
+            key: submit_in_context(pool, self._as_batch, self.extractor.extract_text, file)
+            for key, file in unique_files.items()
+        }
+
+        futures = [
+            submit_in_context(pool, self._as_batch, self._compare_pair, index, pair, keys, extractions,
+                              words_to_anonymize, comparison_type)
+            for index, pair in enumerate(pairs)
+        ]
+        return self._iter_completed(pool, futures)
+
+    @staticmethod
+    def _as_batch(fn, *args):
+        """Run in a pool thread (in the request's context, see submit_in_context) with the batch LLM priority."""
+        with priority(BATCH):
+            return fn(*args)
+
+    @staticmethod
+    def _iter_completed(pool: ThreadPoolExecutor, futures: list) -> Iterator[dict]:
+        try:
+            for future in as_completed(futures):
+                yield future.result()
+        finally:
+            # Client gone: drop the pairs that did not start yet
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def _side_text(self, pair: dict, side: str, keys: dict, extractions: dict) -> dict:
+        text = pair.get(f'text{side}')
+        if text:
+            return {'success': True, 'result': text}
+
+        name = pair.get(f'doc{side}')
+        if name not in keys:
+            return {'success': False, 'error': f'Unknown file for doc{side}: {name}', 'status_code': 400}
+        return extractions[keys[name]].result()
+
+    def _compare_pair(self, index: int, pair: dict, keys: dict, extractions: dict,
+                      words_to_anonymize: List[str], comparison_type: str) -> dict:
+        pair_id = index
+        timings = {}
+        try:
+            # Checked by the route too: a bad entry gets its error line, the stream goes on
+            if not isinstance(pair, dict):
+                raise ValueError(f'Pair {index} must be a JSON object')
+            pair_id = pair.get('id', index)
+            start = time.perf_counter()
+            texts = []
+            for side in ('1', '2'):
+                result = self._side_text(pair, side, keys, extractions)
+                if not result['success']:
+                    return {'id': pair_id, 'index': index, 'success': False, 'error': result['error']}
+                texts.append(result['result'])
+
+            anonymized = self.extractor.anonymize_texts(texts, words_to_anonymize + pair.get('words_to_anonymize', []))
+            timings['extract'] = round((time.perf_counter() - start) * 1000, 1)
+
+            start = time.perf_counter()
+            comp_result = self.comparator.compare(
+                anonymized['docs'][0],
+                anonymized['docs'][1],
+                mapping=anonymized['mapping'],
+                comparison_type=pair.get('comparison_type', comparison_type)
+            )
+            timings['compare'] = round((time.perf_counter() - start) * 1000, 1)
+
+            if not comp_result['success']:
+                return {'id': pair_id, 'index': index, 'success': False, 'error': comp_result['error'], 'timings': timings}
+            return {'id': pair_id, 'index': index, 'success': True, 'result': comp_result['result'], 'timings': timings}
+
+        except Exception as e:
+            print(f"❌ Batch comparison of pair {pair_id} failed: {str(e)}")
+            return {'id': pair_id, 'index': index, 'success': False, 'error': str(e)}
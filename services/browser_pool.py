@@ -0,0 +1,163 @@
+import asyncio
+import atexit
+import contextvars
+import threading
+from contextlib import asynccontextmanager
+from typing import Optional
+
+
+class BrowserPool:
+    """
+    One long-lived Chromium shared by every conversion of the process.
+
+    Playwright runs on a dedicated event loop thread, started on first use (so after
+    a gunicorn fork, never before). Each render gets its own fresh browser context,
+    at most `max_concurrency` render at once, and the browser is relaunched when it
+    crashed (health check before each render) or after `recycle_after` renders.
+    """
+
+    def __init__(self, max_concurrency: int = 4, recycle_after: int = 200, **launch_options):
+        self.max_concurrency = max_concurrency
+        self.recycle_after = recycle_after
+        self.launch_options = launch_options
+
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+
+        # Only touched from the event loop thread
+        self._playwright = None
+        self._browser = None
+        self._browser_renders = 0
+        self._active = {}       # browser -> renders in progress
+        self._retired = set()   # recycled browsers closed once their renders are done
+        self._semaphore = None
+        self._launch_lock = None
+        self.stats = {'launches': 0, 'renders': 0, 'recycled': 0, 'crashed': 0}
+
+        atexit.register(self.shutdown)
+
+    # -------- Event loop thread -------- #
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None or not self._thread.is_alive():
+                loop = asyncio.new_event_loop()
+                thread = threading.Thread(target=loop.run_forever, name="browser-pool", daemon=True)
+                thread.start()
+                self._loop, self._thread = loop, thread
+            return self._loop
+
+    def run(self, coro, timeout: Optional[float] = None):
+        """
+        Run a coroutine on the pool's event loop from any thread and wait for its result.
+
+        Args:
+            coro: Coroutine using `pool.page()`.
+            timeout (float, optional): Seconds before giving up (the render is cancelled).
+        """
+        # The task is created in a copy of the caller's context: its spans reach the request's trace
+        future = contextvars.copy_context().run(asyncio.run_coroutine_threadsafe, coro, self._ensure_loop())
+        try:
+            return future.result(timeout)
+        except TimeoutError:
+            future.cancel()
+            raise
+
+    # -------- Browser lifecycle (event loop thread) -------- #
+
+    async def _acquire_browser(self):
+        async with self._launch_lock:
+            if self._browser is not None and not self._browser.is_connected():
+                print("⚠️ Chromium disconnected, relaunching")
+                self.stats['crashed'] += 1
+                self._active.pop(self._browser, None)
+                self._browser = None
+
+            if self._browser is not None and self._browser_renders >= self.recycle_after:
+                self.stats['recycled'] += 1
+                await self._retire(self._browser)
+                self._browser = None
+
+            if self._browser is None:
+                if self._playwright is None:
+                    from playwright.async_api import async_playwright  # imported with the first browser
+                    self._playwright = await async_playwright().start()
+                self._browser = await self._playwright.chromium.launch(**self.launch_options)
+                self._browser_renders = 0
+                self.stats['launches'] += 1
+
+            browser = self._browser
+            self._browser_renders += 1
+            self._active[browser] = self._active.get(browser, 0) + 1
+            return browser
+
+    async def _release_browser(self, browser):
+        if browser not in self._active:
+            return  # crashed browser, already dropped
+        self._active[browser] -= 1
+        if browser in self._retired and self._active[browser] <= 0:
+            await self._retire(browser)
+
+    async def _retire(self, browser):
+        if self._active.get(browser, 0) > 0:
+            self._retired.add(browser)  # closed by the last render using it
+            return
+        self._retired.discard(browser)
+        self._active.pop(browser, None)
+        try:
+            await browser.close()
+        except Exception as e:
+            print(f"Error closing Chromium: {str(e)}")
+
+    @asynccontextmanager
+    async def page(self, **context_options):
+        """
+        Fresh page in an isolated browser context, closed (with the context) on exit.
+        Waits for a free slot when `max_concurrency` renders are already running.
+        """
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._launch_lock = asyncio.Lock()
+
+        async with self._semaphore:
+            browser = await self._acquire_browser()
+            try:
+                context = await browser.new_context(**context_options)
+                try:
+                    yield await context.new_page()
+                finally:
+                    try:
+                        await context.close()
+                    except Exception:
+                        pass  # browser gone: the next render relaunches it
+            finally:
+                self.stats['renders'] += 1
+                await self._release_browser(browser)
+
+    async def _close(self):
+        browsers = set(self._active) | self._retired | ({self._browser} if self._browser else set())
+        for browser in browsers:
+            try:
+                await browser.close()
+            except Exception:
+                pass
+        self._browser, self._active, self._retired = None, {}, set()
+        if self._playwright is not None:
+            await self._playwright.stop()
+            self._playwright = None
+
+    def shutdown(self, timeout: float = 30):
+        """Close Chromium and stop the event loop thread (the pool restarts on next use)."""
+        with self._lock:
+            loop, thread = self._loop, self._thread
+            self._loop = self._thread = None
+        if loop is None:
+            return
+        try:
+            asyncio.run_coroutine_threadsafe(self._close(), loop).result(timeout)
+        except Exception as e:
+            print(f"Error shutting down the browser pool: {str(e)}")
+        self._semaphore = self._launch_lock = None
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join(timeout)
@@ -1,13 +1,20 @@
-from typing import List
+import hashlib
+import json
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
 
 from llm.gemini_client import DocumentComparatorClient
 from services.elsa import deanonymize_dict
+from services.revalidation import RevalidationStore, merge_reports, pair_blocks, pair_key, split_blocks
+from services.tracing import span, submit_in_context
 
 class ComparatorService:
     """Service class to handle file upload and comparison logic"""
 
-    def __init__(self, api_key: str):
+    def __init__(self, api_key: str, revalidation_store: Optional[RevalidationStore] = None, max_workers: int = 4):
         self.comparator = DocumentComparatorClient(api_key)
+        self.revalidation_store = revalidation_store
+        self.max_workers = max_workers
 
     def compare(self, text1: str, text2: str, mapping: dict, comparison_type: str = "copy_design") -> dict:
         """
@@ -32,4 +39,87 @@ class ComparatorService:
         return {
             'success': True,
             'result': report
-        }
\ No newline at end of file
+        }
+
+    def revalidate(self, text1: str, text2: str, mapping: dict, campaign: str) -> dict:
+        """
+        "copy_design" comparison of a new design revision, reusing the block results
+        of the campaign's previous revision.
+
+        Both documents are split into blocks and each copy block is paired with the
+        design content implementing it. Only the pairs whose content changed since the
+        last revision are sent to Gemini (concurrently); the others come from the store,
+        and all of them are merged into one CommercialComparisonPrompt report.
+
+        Args:
+            text1 (str): Anonymized copy text.
+            text2 (str): Anonymized design text.
+            mapping (dict): Mapping of anonymized tokens to original values.
+            campaign (str): Campaign identifier, shared by the revisions of a design.
+
+        Returns:
+            dict: JSON with the merged report ('result') and the number of blocks
+                compared and reused ('revalidation').
+        """
+        # -------- Block pairs and their content keys -------- #
+        pairs = pair_blocks(split_blocks(text1), split_blocks(text2))
+        salt = self._prompt_fingerprint()
+        keys = [pair_key(copy_block, design_block, salt) for copy_block, design_block in pairs]
+
+        results = self.revalidation_store.get_many(campaign, list(set(keys)))
+        changed = {key: pair for key, pair in zip(keys, pairs) if key not in results}
+
+        # -------- Compare the changed blocks only -------- #
+        with span('revalidate', blocks=len(pairs), changed=len(changed)):
+            reports = {}
+            if changed:
+                # Run in the request's context: its trace and its LLM priority class
+                with ThreadPoolExecutor(max_workers=min(self.max_workers, len(changed)),
+                                        thread_name_prefix="revalidate") as pool:
+                    futures = {
+                        key: submit_in_context(pool, self.comparator.validate_documents, copy_block, design_block, "copy_design")
+                        for key, (copy_block, design_block) in changed.items()
+                    }
+                    reports = {key: future.result() for key, future in futures.items()}
+
+        failed = [key for key, report in reports.items() if not report]  # compare_texts returns {} on error
+        results.update((key, report) for key, report in reports.items() if report)
+
+        # The successful blocks are kept even on failure: a retry only compares the others
+        self.revalidation_store.replace(campaign, {key: results[key] for key in keys if key in results})
+
+        if failed:
+            return {
+                'success': False,
+                'error': f'Comparison failed for {len(failed)} of {len(pairs)} blocks',
+                'status_code': 502
+            }
+
+        # -------- Merge and deanonymize the report -------- #
+        anon_report = merge_reports([
+            (results[key], len(copy_block) + len(design_block))
+            for key, (copy_block, design_block) in zip(keys, pairs)
+        ])
+        report = deanonymize_dict(anon_report, mapping)
+
+        # Counted per block: identical blocks (a repeated disclaimer) share one comparison
+        compared = sum(1 for key in keys if key in changed)
+        return {
+            'success': True,
+            'result': report,
+            'revalidation': {
+                'campaign': campaign,
+                'blocks': len(pairs),
+                'compared': compared,
+                'reused': len(pairs) - compared,
+            }
+        }
+
+    def _prompt_fingerprint(self) -> str:
+        """Model, configuration, prompt and schema of the block comparisons: changing them invalidates the stored blocks."""
+        prompt_manager = self.comparator.prompt_manager
+        digest = hashlib.sha256(self.comparator.model_name.encode())
+        digest.update(json.dumps(self.comparator.config, sort_keys=True, default=repr).encode())
+        digest.update(prompt_manager.get_comparison_prompt("copy_design", "", "").encode())
+        digest.update(json.dumps(prompt_manager.get_comparison_schema("copy_design"), sort_keys=True).encode())
+        return digest.hexdigest()
@@ -0,0 +1,133 @@
+import gzip
+import os
+from pathlib import Path
+
+from flask import Flask, request, send_from_directory
+from flask.json.provider import DefaultJSONProvider
+
+# Optional accelerators: the app works (slower) without them
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+COMPRESSIBLE_MIMETYPES = {
+    'application/json',
+    'application/javascript',
+    'text/html',
+    'text/css',
+    'text/javascript',
+    'text/plain',
+}
+PRECOMPRESSED_SUFFIXES = ('.js', '.css')
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """JSON provider serializing with orjson when installed (same output as jsonify otherwise)."""
+
+    def dumps(self, obj, **kwargs) -> str:
+        if orjson is None or kwargs:
+            return super().dumps(obj, **kwargs)
+        return orjson.dumps(obj, default=self.default, option=orjson.OPT_NON_STR_KEYS).decode('utf-8')
+
+    def response(self, *args, **kwargs):
+        if orjson is None:
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        data = orjson.dumps(obj, default=self.default, option=orjson.OPT_NON_STR_KEYS)
+        return self._app.response_class(data, mimetype=self.mimetype)
+
+
+def _negotiate(accept_encoding) -> str:
+    """Best encoding accepted by the client: brotli (if installed), gzip or none."""
+    if brotli is not None and accept_encoding['br']:
+        return 'br'
+    if accept_encoding['gzip']:
+        return 'gzip'
+    return ''
+
+
+def _compress(data: bytes, encoding: str) -> bytes:
+    if encoding == 'br':
+        return brotli.compress(data, quality=5)
+    return gzip.compress(data, compresslevel=6)
+
+
+def precompress_static(static_folder: str):
+    """
+    Write .gz (and .br) siblings of the JS and CSS assets, once per asset version.
+    """
+    for path in Path(static_folder).rglob('*'):
+        if path.suffix not in PRECOMPRESSED_SUFFIXES or not path.is_file():
+            continue
+        mtime = path.stat().st_mtime
+        data = None
+        for encoding, suffix in (('gzip', '.gz'), ('br', '.br')):
+            if encoding == 'br' and brotli is None:
+                continue
+            target = path.with_name(path.name + suffix)
+            if target.exists() and target.stat().st_mtime >= mtime:
+                continue
+            data = data if data is not None else path.read_bytes()
+            compressed = brotli.compress(data, quality=11) if encoding == 'br' else gzip.compress(data, compresslevel=9)
+            target.write_bytes(compressed)
+
+
+def init_compression(app: Flask):
+    """
+    Register fast JSON serialization, on-the-fly compression of large textual
+    responses (COMPRESS_MIN_SIZE) and serving of the precompressed static assets.
+    """
+    app.json = FastJSONProvider(app)
+
+    if app.config.get('COMPRESS_STATIC', True) and app.static_folder:
+        try:
+            precompress_static(app.static_folder)
+        except OSError as e:
+            print(f"Static assets not precompressed: {str(e)}")
+
+    static_view = app.view_functions['static']
+
+    def static(filename):
+        encoding = _negotiate(request.accept_encodings)
+        if encoding and filename.endswith(PRECOMPRESSED_SUFFIXES):
+            suffix = '.br' if encoding == 'br' else '.gz'
+            source = os.path.join(app.static_folder, filename)
+            compressed = source + suffix
+            if os.path.isfile(compressed) and os.path.isfile(source) \
+                    and os.path.getmtime(compressed) >= os.path.getmtime(source):
+                response = send_from_directory(app.static_folder, filename + suffix,
+                                               mimetype='text/css' if filename.endswith('.css') else 'text/javascript')
+                response.headers['Content-Encoding'] = encoding
+                response.vary.add('Accept-Encoding')
+                return response
+        return static_view(filename=filename)
+
+    app.view_functions['static'] = static
+
+    @app.after_request
+    def compress_response(response):
+        if (response.direct_passthrough or response.is_streamed
+                or 'Content-Encoding' in response.headers
+                or response.mimetype not in COMPRESSIBLE_MIMETYPES
+                or not 200 <= response.status_code < 300):
+            return response
+
+        data = response.get_data()
+        if len(data) < app.config.get('COMPRESS_MIN_SIZE', 1024):
+            return response
+
+        encoding = _negotiate(request.accept_encodings)
+        response.vary.add('Accept-Encoding')
+        if not encoding:
+            return response
+
+        response.set_data(_compress(data, encoding))
+        response.headers['Content-Encoding'] = encoding
+        return response
@@ -1,36 +1,256 @@
-from playwright.async_api import async_playwright
 from pathlib import Path
+from typing import Iterable, List
+from urllib.parse import unquote, urlsplit
+import asyncio, io, math, mimetypes, time
 import zipfile, tempfile, shutil
 
+from services.browser_pool import BrowserPool
+from services.tracing import traced
+from services.upload import has_valid_signature
+
+
+# page.pdf() options, overridable per conversion (part of the render cache key)
+DEFAULT_PDF_OPTIONS = {'width': '210mm', 'height': '1000mm', 'print_background': True}
+
+# Virtual origin the ZIP content is served from (intercepted, never reaches the network)
+BUNDLE_ORIGIN = "http://bundle.local/"
+
+# Schemes of the external resources (CDN images, web fonts) an allowed host may serve
+EXTERNAL_SCHEMES = ('http', 'https')
+
+# Resolved once the page is loaded: web fonts ready and every image decoded (or failed)
+WAIT_FOR_ASSETS_JS = """
+async () => {
+    await document.fonts.ready;
+    await Promise.all(Array.from(document.images).map(img => img.decode().catch(() => null)));
+}
+"""
+
+
+class ZipAssets:
+    """Files of an uploaded ZIP, read on demand by the intercepted page requests."""
+
+    def __init__(self, zip_file: zipfile.ZipFile):
+        self.zip = zip_file
+        self.names = {n: n for n in zip_file.namelist() if not n.endswith('/')}
+        # "send to compressed folder" on Windows: links are often not case exact
+        self.lower_names = {n.lower(): n for n in self.names}
+
+    def html_files(self) -> list:
+        return [n for n in self.names if n.lower().endswith(('.html', '.htm'))]
+
+    def read(self, path: str):
+        name = self.names.get(path) or self.lower_names.get(path.lower())
+        return self.zip.read(name) if name else None
+
+
 class ConvertorService:
     """Convertion service class to handle file upload and conversion HTML -> PDF.
 
-    Using this service requires a ZIP FILE from the user containing the HTML and 
+    Using this service requires a ZIP FILE from the user containing the HTML and
     the ‘img’ folder with the images contained in the HTML.
-    To do this, the user has to select the HTML and the img folder -> right-click 
+    To do this, the user has to select the HTML and the img folder -> right-click
     -> 'send to' -> 'compressed folder'.
     """
 
-    def __init__(self):
+    def __init__(self, max_concurrency: int = 4, recycle_after: int = 200, render_timeout: float = 120,
+                 from_memory: bool = True, allowed_hosts: Iterable[str] = ()):
+        """
+        Args:
+            max_concurrency (int): Conversions rendered at the same time by the shared browser.
+            recycle_after (int): Renders after which Chromium is relaunched.
+            render_timeout (float): Seconds allowed for one conversion.
+            from_memory (bool): Serve the ZIP content to the page from memory instead of
+                extracting it to a temporary folder.
+            allowed_hosts (Iterable[str]): Hosts (and their subdomains) the page may load
+                http(s) resources from, e.g. a CDN hosting the images. Every other request
+                outside the ZIP is blocked: a slow third party cannot hold a pooled page and
+                uploaded HTML cannot make the server fetch arbitrary (internal) URLs.
+        """
         self.allowed_mime_types = {'application/zip'}
-        
+        self.browser_pool = BrowserPool(max_concurrency=max_concurrency, recycle_after=recycle_after)
+        self.render_timeout = render_timeout
+        self.from_memory = from_memory
+        self.allowed_hosts = tuple(sorted({host.lower().strip('.') for host in allowed_hosts if host}))
+
     def _allowed_file(self, file) -> bool:
-        """Check if the file type is allowed based on MIME type"""
+        """Check if the file type is allowed based on MIME type and magic bytes"""
         if not file or not file.content_type:
             return False
-        return file.content_type in self.allowed_mime_types
-        
-    async def html_to_pdf(self, zip_path : str, output_pdf : str):
-        # Dezip the folder 
+        return file.content_type in self.allowed_mime_types and has_valid_signature(file)
+
+    @traced('render_pdf')
+    def html_to_pdf(self, zip_path : str, output_pdf : str, options : dict = None):
+        """Convert the ZIP to a PDF with the shared browser (callable from any thread)."""
+        render = self._html_to_pdf_from_memory if self.from_memory else self._html_to_pdf_from_disk
+        return self.browser_pool.run(render(zip_path, output_pdf, options), timeout=self.render_timeout)
+
+    @traced('render_pdf')
+    def html_to_pdf_batch(self, zip_path : str, output_path : str, merge : bool = False,
+                          options : dict = None) -> List[dict]:
+        """
+        Convert every HTML file of the ZIP (e.g. the FR and NL variants of a campaign)
+        concurrently on pooled pages. Assets are always served from memory.
+
+        Args:
+            zip_path (str): Uploaded ZIP with the HTML files and their images.
+            output_path (str): Where to write the ZIP of PDFs, or the merged PDF.
+            merge (bool): Write one PDF with the documents in file name order.
+            options (dict, optional): page.pdf() options overriding DEFAULT_PDF_OPTIONS.
+
+        Returns:
+            List[dict]: Per document 'document', 'pdf' (name in the output ZIP), 'pages',
+                'wait_ms' (waiting for a free page) and 'render_ms'.
+        """
+        with zipfile.ZipFile(zip_path, 'r') as z:
+            count = len(ZipAssets(z).html_files())
+        if count == 0:
+            raise ValueError("Le ZIP ne contient aucun fichier HTML")
+
+        # The timeout is per render: documents beyond the pool size wait for a free page
+        timeout = self.render_timeout * math.ceil(count / self.browser_pool.max_concurrency)
+        rendered = self.browser_pool.run(self._html_to_pdf_batch(zip_path, options), timeout=timeout)
+
+        from PyPDF2 import PdfReader, PdfWriter
+
+        pdfs = [doc.pop('data') for doc in rendered]
+        for doc, pdf in zip(rendered, pdfs):
+            doc['pages'] = len(PdfReader(io.BytesIO(pdf)).pages)
+
+        if merge:
+            writer = PdfWriter()
+            for pdf in pdfs:
+                writer.append(io.BytesIO(pdf))
+            with open(output_path, 'wb') as f:
+                writer.write(f)
+        else:
+            with zipfile.ZipFile(output_path, 'w', zipfile.ZIP_DEFLATED) as out:
+                for doc, pdf in zip(rendered, pdfs):
+                    out.writestr(doc['pdf'], pdf)
+        return rendered
+
+    @traced('render_pdf')
+    def html_string_to_pdf(self, html : str, output_pdf : str = None, options : dict = None) -> bytes:
+        """
+        Render HTML markup (e.g. a generated design) straight to PDF with page.set_content,
+        without any ZIP or temporary folder. Like the ZIP conversions, the page loads
+        no external resource except the http(s) ones of `allowed_hosts`.
+
+        Returns:
+            bytes: The PDF (also written to `output_pdf` when given).
+        """
+        return self.browser_pool.run(self._render_html(html, output_pdf, options), timeout=self.render_timeout)
+
+    def shutdown(self):
+        """Close the shared browser."""
+        self.browser_pool.shutdown()
+
+    @staticmethod
+    def _single_html(html_files: list) -> str:
+        if len(html_files) != 1:
+            raise ValueError(f"Le ZIP ne doit contenir qu'un seul fichier HTML, vous en avez rentrés {len(html_files)}")
+        return html_files[0]
+
+    @staticmethod
+    async def _print_pdf(page, output_pdf: str = None, options: dict = None):
+        return await page.pdf(path= output_pdf, **{**DEFAULT_PDF_OPTIONS, **(options or {})})
+
+    async def _html_to_pdf_from_memory(self, zip_path : str, output_pdf : str, options : dict = None):
+        with zipfile.ZipFile(zip_path, 'r') as z:
+            assets = ZipAssets(z)
+            html_name = self._single_html(assets.html_files())
+            return await self._render_document(assets, html_name, output_pdf, options)
+
+    async def _html_to_pdf_batch(self, zip_path : str, options : dict = None) -> List[dict]:
+        with zipfile.ZipFile(zip_path, 'r') as z:
+            assets = ZipAssets(z)
+            return await asyncio.gather(*(
+                self._render_timed(assets, html_name, options) for html_name in sorted(assets.html_files())
+            ))
+
+    async def _render_timed(self, assets: ZipAssets, html_name: str, options: dict = None) -> dict:
+        start = time.perf_counter()
+        timings = {}
+        data = await self._render_document(assets, html_name, options=options, timings=timings)
+        return {
+            'document': html_name,
+            'pdf': Path(html_name).with_suffix('.pdf').as_posix(),
+            'wait_ms': round((timings['page_ready'] - start) * 1000, 1),
+            'render_ms': round((time.perf_counter() - timings['page_ready']) * 1000, 1),
+            'data': data
+        }
+
+    async def _render_document(self, assets: ZipAssets, html_name: str, output_pdf: str = None,
+                               options: dict = None, timings: dict = None) -> bytes:
+        """Render one HTML file of the ZIP on a pooled page, its assets served from memory."""
+        async with self.browser_pool.page() as page:
+            if timings is not None:
+                timings['page_ready'] = time.perf_counter()
+            await page.route("**/*", lambda route: self._serve_asset(route, assets))
+
+            # 'load' + image decoding instead of 'networkidle': no idle timeout to wait for
+            await page.goto(BUNDLE_ORIGIN + html_name, wait_until='load')
+            await page.evaluate(WAIT_FOR_ASSETS_JS)
+
+            return await self._print_pdf(page, output_pdf, options)
+
+    async def _render_html(self, html: str, output_pdf: str = None, options: dict = None) -> bytes:
+        async with self.browser_pool.page() as page:
+            await page.route("**/*", self._external_request)
+            await page.set_content(html, wait_until='load')
+            await page.evaluate(WAIT_FOR_ASSETS_JS)
+            return await self._print_pdf(page, output_pdf, options)
+
+    def _is_allowed(self, url: str) -> bool:
+        """Whether an external URL is an http(s) resource of an allowed host."""
+        parts = urlsplit(url)
+        host = (parts.hostname or '').lower()
+        return parts.scheme in EXTERNAL_SCHEMES and any(
+            host == allowed or host.endswith('.' + allowed) for allowed in self.allowed_hosts
+        )
+
+    async def _external_request(self, route):
+        """Request outside the ZIP: fetched from the network for an allowed host, blocked otherwise."""
+        if self._is_allowed(route.request.url):
+            await route.continue_()
+        else:
+            await route.abort('blockedbyclient')
+
+    async def _local_request(self, route):
+        """Request of a page extracted to disk: its files load, external ones go to _external_request."""
+        if urlsplit(route.request.url).scheme == 'file':
+            await route.continue_()
+        else:
+            await self._external_request(route)
+
+    async def _serve_asset(self, route, assets: ZipAssets):
+        """Answer a page request from the ZIP; other requests go to _external_request."""
+        url = route.request.url
+        if not url.startswith(BUNDLE_ORIGIN):
+            await self._external_request(route)
+            return
+
+        path = unquote(urlsplit(url).path).lstrip('/')
+        body = assets.read(path)
+        if body is None:
+            await route.fulfill(status=404, body=b'')
+            return
+
+        content_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        await route.fulfill(status=200, body=body, content_type=content_type)
+
+    async def _html_to_pdf_from_disk(self, zip_path : str, output_pdf : str, options : dict = None):
+        # Dezip the folder
         temp_directory = tempfile.mkdtemp()
         with zipfile.ZipFile(zip_path, 'r') as z:
             file_names = z.namelist()
             html_file = [n for n in file_names if n.lower().endswith('.html')]
-            if len(html_file) != 1:
+            try:
+                html_name = self._single_html(html_file)
+            except ValueError:
                 shutil.rmtree(temp_directory)
-                raise ValueError(f"Le ZIP ne doit contenir qu'un seul fichier HTML, vous en avez rentrés {len(html_file)}")
-            
-            html_name = html_file[0]
+                raise
+
             z.extractall(temp_directory)
 
         # In the dezipped folder, we search for the html file
@@ -38,28 +258,19 @@ class ConvertorService:
         if not html_path.exists():
             shutil.rmtree(temp_directory)
             raise FileNotFoundError(f"Le fichier {html_name} est introuvable")
-        
-        URL_file = html_path.resolve().as_uri()
-
-        # Launch playwright with a baseURL pointing to the folder
-        async with async_playwright() as p:
-            browser = await p.chromium.launch()
-            page = await browser.new_page()
 
-            await page.goto(
-                URL_file, 
-                wait_until='networkidle',
-                )
-
-            pdf = await page.pdf(
-                path= output_pdf,
-                width='210mm',          
-                height='1000mm',        
-                print_background=True
-            )
+        URL_file = html_path.resolve().as_uri()
 
-            await browser.close()
+        # Render in a fresh context of the pooled browser, with a baseURL pointing to the folder
+        try:
+            async with self.browser_pool.page() as page:
+                await page.route("**/*", self._local_request)
+                await page.goto(
+                    URL_file,
+                    wait_until='networkidle',
+                    )
 
-        shutil.rmtree(temp_directory) # Erasing the temporary directory
+                pdf = await self._print_pdf(page, output_pdf, options)
+        finally:
+            shutil.rmtree(temp_directory) # Erasing the temporary directory
         return pdf
-
@@ -0,0 +1,202 @@
+import hashlib
+import json
+import re
+import threading
+import time
+import zipfile
+from collections import OrderedDict
+from io import BytesIO
+from typing import Optional
+from xml.sax.saxutils import escape
+
+from services.tracing import traced
+
+
+DOCX_MIMETYPE = 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'
+DOCUMENT_PART = 'word/document.xml'
+
+# Characters python-docx refuses in text (XML 1.0 control characters)
+INVALID_XML_CHARS = re.compile(r'[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+
+class RenderedDocx:
+    """Rendered DOCX bytes with the validators used for conditional requests."""
+
+    def __init__(self, data: bytes, etag: str, last_modified: float):
+        self.data = data
+        self.etag = etag
+        self.last_modified = last_modified
+
+
+class DocxRenderer:
+    """
+    Shared renderer of marketing copies to DOCX (preview and download endpoints).
+
+    Rendered documents are cached by a hash of the copy text and the render options,
+    in a size-bounded LRU, so repeated previews of an unchanged copy are free. Cache
+    misses start from a pre-built base document (DocxBaseTemplate).
+    """
+
+    def __init__(self, max_cache_bytes: int = 64 * 1024 * 1024):
+        """
+        Args:
+            max_cache_bytes (int): Maximum total size of the cached documents.
+        """
+        self.max_cache_bytes = max_cache_bytes
+        self._cache: "OrderedDict[str, RenderedDocx]" = OrderedDict()
+        self._cache_bytes = 0
+        self._bases = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def etag_for(copy_text: str, title: str = 'Generated Marketing Copy') -> str:
+        """Strong ETag of a render: hash of the copy text and the render options."""
+        options = json.dumps({'title': title}, sort_keys=True)
+        digest = hashlib.sha256(f"{options}\0{copy_text}".encode('utf-8')).hexdigest()
+        return digest[:32]
+
+    def cached(self, etag: str) -> Optional[RenderedDocx]:
+        with self._lock:
+            rendered = self._cache.get(etag)
+            if rendered is not None:
+                self._cache.move_to_end(etag)
+            return rendered
+
+    def render(self, copy_text: str, title: str = 'Generated Marketing Copy') -> RenderedDocx:
+        """
+        Render the copy to DOCX, or return the cached render of the same copy.
+
+        Args:
+            copy_text (str): Copy text, paragraphs separated by blank lines.
+            title (str): Title heading of the document.
+
+        Returns:
+            RenderedDocx: Document bytes, ETag and render time.
+        """
+        etag = self.etag_for(copy_text, title)
+        rendered = self.cached(etag)
+        if rendered is not None:
+            return rendered
+
+        rendered = RenderedDocx(self._build(copy_text, title), etag, time.time())
+        self._store(rendered)
+        return rendered
+
+    def _store(self, rendered: RenderedDocx):
+        size = len(rendered.data)
+        if size > self.max_cache_bytes:
+            return
+        with self._lock:
+            if rendered.etag in self._cache:
+                return
+            self._cache[rendered.etag] = rendered
+            self._cache_bytes += size
+            while self._cache_bytes > self.max_cache_bytes:
+                _, evicted = self._cache.popitem(last=False)
+                self._cache_bytes -= len(evicted.data)
+
+    def _base(self, title: str) -> "DocxBaseTemplate":
+        with self._lock:
+            base = self._bases.get(title)
+            if base is None:
+                base = self._bases[title] = DocxBaseTemplate(title)
+            return base
+
+    @traced('render_docx')
+    def _build(self, copy_text: str, title: str) -> bytes:
+        # Contenu avec formatage intelligent, généré en un seul bloc XML
+        body = "".join(
+            _paragraph_xml(para_text.strip())
+            for para_text in copy_text.split('\n\n')
+            if para_text.strip()
+        )
+        return self._base(title).render(body)
+
+
+class DocxBaseTemplate:
+    """
+    Pre-built DOCX (margins, styles, title heading) cloned for each render.
+
+    The default python-docx template is unzipped and parsed once. Every part except
+    word/document.xml is kept as an already-compressed ZIP, and a render only appends
+    the new document.xml to an in-memory copy of it.
+    """
+
+    def __init__(self, title: str):
+        # python-docx only builds the base template (once per title)
+        from docx import Document
+        from docx.enum.text import WD_ALIGN_PARAGRAPH
+        from docx.shared import Inches
+
+        # Créer le document DOCX avec formatage
+        doc = Document()
+
+        # Configuration des marges
+        for section in doc.sections:
+            section.top_margin = Inches(1)
+            section.bottom_margin = Inches(1)
+            section.left_margin = Inches(1.25)
+            section.right_margin = Inches(1.25)
+
+        # Titre principal
+        heading = doc.add_heading(title, 0)
+        heading.alignment = WD_ALIGN_PARAGRAPH.CENTER
+
+        # Espacement
+        doc.add_paragraph()
+
+        doc_buffer = BytesIO()
+        doc.save(doc_buffer)
+
+        # Split document.xml around the insertion point (before the section properties)
+        static_buffer = BytesIO()
+        with zipfile.ZipFile(doc_buffer) as source, \
+                zipfile.ZipFile(static_buffer, 'w', zipfile.ZIP_DEFLATED) as static:
+            for item in source.infolist():
+                if item.filename == DOCUMENT_PART:
+                    document_xml = source.read(item).decode('utf-8')
+                else:
+                    static.writestr(item, source.read(item), compress_type=zipfile.ZIP_DEFLATED)
+
+        insert_at = document_xml.rindex('<w:sectPr')
+        self.head = document_xml[:insert_at]
+        self.tail = document_xml[insert_at:]
+        self.static_zip = static_buffer.getvalue()
+
+    def render(self, body_xml: str) -> bytes:
+        """Return the DOCX bytes with body_xml inserted after the title."""
+        buffer = BytesIO(self.static_zip)
+        buffer.seek(0, 2)
+        with zipfile.ZipFile(buffer, 'a', zipfile.ZIP_DEFLATED) as package:
+            package.writestr(DOCUMENT_PART, self.head + body_xml + self.tail)
+        return buffer.getvalue()
+
+
+def _run_xml(text: str, bold: bool) -> str:
+    """One run; line breaks and tabs become <w:br/> and <w:tab/> like python-docx does."""
+    text = INVALID_XML_CHARS.sub('', text)
+    pieces = []
+    for line_idx, line in enumerate(text.split('\n')):
+        if line_idx:
+            pieces.append('<w:br/>')
+        for tab_idx, chunk in enumerate(line.split('\t')):
+            if tab_idx:
+                pieces.append('<w:tab/>')
+            if chunk:
+                pieces.append(f'<w:t xml:space="preserve">{escape(chunk)}</w:t>')
+    properties = '<w:rPr><w:b/></w:rPr>' if bold else ''
+    return f'<w:r>{properties}{"".join(pieces)}</w:r>'
+
+
+def _paragraph_xml(para_text: str) -> str:
+    """Paragraph XML with the same formatting rules as the original renderer."""
+    # Détecter les titres (courts et en majuscules)
+    if len(para_text) < 100 and para_text.isupper():
+        # Style titre
+        return f'<w:p><w:pPr><w:jc w:val="center"/></w:pPr>{_run_xml(para_text, bold=True)}</w:p>'
+    elif para_text.endswith(':') and len(para_text) < 50:
+        # Style sous-titre
+        return f'<w:p>{_run_xml(para_text, bold=True)}</w:p>'
+    else:
+        # Style paragraphe normal
+        return f'<w:p><w:pPr><w:jc w:val="both"/></w:pPr>{_run_xml(para_text, bold=False)}</w:p>'
@@ -1,7 +1,8 @@
-from bs4 import BeautifulSoup
 import re
 import hashlib
 
+from services.tracing import traced
+
 #--------------------------------------------
 #--------------- Elsa Function --------------
 #--------------------------------------------
@@ -12,6 +13,7 @@ def make_placeholder(label, value):
     return f"[{label}_{hx}]"
 
 # ANONYMIZATION
+@traced('anonymize')
 def anonymize_text(text, keywords=[]):
     mapping = {}
     
@@ -108,6 +110,7 @@ def anonymize_text(text, keywords=[]):
     return text, mapping
 
 # De-anonymisation 
+@traced('deanonymize')
 def deanonymize_text(anon_text, mapping):
     """
     Remplace tous les tokens anonymisés dans le texte par leur valeur d'origine via le mapping.
@@ -117,6 +120,7 @@ def deanonymize_text(anon_text, mapping):
         deanonymized = deanonymized.replace(token, mapping[token])
     return deanonymized
 
+@traced('deanonymize')
 def deanonymize_dict(obj, mapping):
     """
     Recursive function to deanonymize a dictionary with strings in nested elements.
@@ -130,27 +134,3 @@ def deanonymize_dict(obj, mapping):
         return deanonymize_text(obj, mapping)
     else:
         return obj
-
-#--------------------------------------------
-#----------------- Elsa Main ----------------
-#--------------------------------------------
-
-if __name__ == "__main__":
-
-    # HTML IMPORT
-    fichier_html = "index-fr-OG-contest.html"
-    with open(fichier_html, "r", encoding="utf-8") as f:
-        soup = BeautifulSoup(f, "html.parser")
-        all_text = soup.get_text(separator=" ", strip=True)
-
-    # Anonymisation
-    anon, mapping = anonymize_text(all_text, keywords=["Samsung"])
-
-    with open("anon.txt", "w", encoding="utf-8") as f:
-        f.write(anon)
-    deano = deanonymize_text(anon, mapping)
-
-    with open("deanon.txt", "w", encoding="utf-8") as f:
-        f.write(deano)
-
-
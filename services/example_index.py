@@ -0,0 +1,141 @@
+import math
+import re
+from collections import Counter
+from typing import List, Optional
+
+
+DEFAULT_TOP_K = 3
+DEFAULT_TOKEN_BUDGET = 12000
+
+CHARS_PER_TOKEN = 4  # rough estimate of the Gemini tokenizer on FR/NL text
+
+TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token count estimate used to stay within the prompt budget."""
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def _tokenize(text: str) -> List[str]:
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+class ExampleIndex:
+    """
+    Local TF-IDF similarity index over the anonymized example corpus (model_templates).
+
+    The index is built once at startup. For each incoming brief or copy it returns the
+    top-k most similar examples that fit within a token budget, instead of stuffing
+    every template into the prompt.
+    """
+
+    def __init__(self, docs: List[str], mappings: Optional[List[dict]] = None, names: Optional[List[str]] = None):
+        """
+        Build the index.
+
+        Args:
+            docs (List[str]): Anonymized example texts.
+            mappings (List[dict], optional): Anonymization mapping of each example.
+            names (List[str], optional): Display name of each example (file name).
+        """
+        self.docs = docs
+        self.mappings = mappings or [{} for _ in docs]
+        self.names = names or [f"example_{idx}" for idx in range(len(docs))]
+        self.token_counts = [estimate_tokens(doc) for doc in docs]
+
+        term_freqs = [Counter(_tokenize(doc)) for doc in docs]
+
+        doc_freq = Counter()
+        for tf in term_freqs:
+            doc_freq.update(tf.keys())
+
+        n_docs = len(docs)
+        self.idf = {term: math.log((1 + n_docs) / (1 + df)) + 1 for term, df in doc_freq.items()}
+        self.vectors = [self._weigh(tf) for tf in term_freqs]
+
+    @classmethod
+    def from_files(cls, extractor, files: List, parse_html: bool = False) -> "ExampleIndex":
+        """
+        Build the index from example files, each one extracted and anonymized on its own.
+
+        Placeholders are derived from the anonymized value only, so examples anonymized
+        separately share the same tokens as when they were anonymized with the copy.
+
+        Args:
+            extractor (ExtractorService): Service used to extract and anonymize the files.
+            files (List): FileStorage objects of the examples.
+            parse_html (bool): Strip HTML tags (False keeps the raw markup as example).
+        """
+        docs, mappings, names = [], [], []
+        for file in files:
+            result = extractor.extract_anonymized(file, parse_html=parse_html)
+            if not result['success']:
+                print(f"Skipping example {file.filename}: {result['error']}")
+                continue
+            docs.append(result['docs'][0])
+            mappings.append(result['mapping'])
+            names.append(file.filename)
+
+        print(f"📚 Example index built with {len(docs)} documents")
+        return cls(docs, mappings, names)
+
+    def _weigh(self, tf: Counter) -> dict:
+        """Sublinear TF-IDF weights, L2 normalised."""
+        vector = {term: (1 + math.log(count)) * self.idf.get(term, 0.0) for term, count in tf.items()}
+        norm = math.sqrt(sum(w * w for w in vector.values()))
+        return {term: w / norm for term, w in vector.items()} if norm else {}
+
+    def rank(self, query: str) -> List[tuple]:
+        """
+        Rank every example by cosine similarity with the query.
+
+        Returns:
+            List[tuple]: (score, index) pairs, most similar first.
+        """
+        query_vector = self._weigh(Counter(_tokenize(query)))
+        scores = []
+        for idx, vector in enumerate(self.vectors):
+            small, large = sorted((query_vector, vector), key=len)
+            score = sum(w * large.get(term, 0.0) for term, w in small.items())
+            scores.append((score, idx))
+        scores.sort(key=lambda item: (-item[0], item[1]))
+        return scores
+
+    def select(self, query: str, top_k: int = DEFAULT_TOP_K, token_budget: int = DEFAULT_TOKEN_BUDGET) -> dict:
+        """
+        Pick the top-k most similar examples whose cumulated size fits the token budget.
+
+        Args:
+            query (str): Anonymized brief or copy text.
+            top_k (int): Maximum number of examples to return.
+            token_budget (int): Maximum estimated number of tokens for all examples.
+
+        Returns:
+            dict: 'docs' (selected texts), 'names' and the merged 'mapping' of the selection.
+        """
+        docs, names, mapping = [], [], {}
+        used = 0
+        for _, idx in self.rank(query):
+            if len(docs) >= top_k:
+                break
+            if used + self.token_counts[idx] > token_budget:
+                continue
+            used += self.token_counts[idx]
+            docs.append(self.docs[idx])
+            names.append(self.names[idx])
+            mapping.update(self.mappings[idx])
+
+        return {
+            'docs': docs,
+            'names': names,
+            'mapping': mapping
+        }
+
+    @staticmethod
+    def format_examples(docs: List[str], label: str = "Example") -> str:
+        """Format selected examples the way the prompts expect them."""
+        examples = ""
+        for idx, example in enumerate(docs, start=1):
+            examples += f"{label} {idx} :\n{example}\n---\n"
+        return examples
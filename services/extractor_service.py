@@ -3,6 +3,8 @@ from typing import List
 from llm.gemini_client import ImageExtractionClient
 from services.parser import FileParser
 from services.elsa import anonymize_text, deanonymize_dict
+from services.html_reducer import reduce_html
+from services.upload import has_valid_signature
 
 
 SPLITTER = "---|#SPLITTER#|---"  # Used to split text from different documents
@@ -10,8 +12,10 @@ SPLITTER = "---|#SPLITTER#|---"  # Used to split text from different documents
 class ExtractorService:
     """Service class to handle file upload and comparison logic"""
 
-    def __init__(self, api_key: str):
+    def __init__(self, api_key: str, reduce_raw_html: bool = True):
         self.parser = FileParser(ImageExtractionClient(api_key))
+        # Raw markup (parse_html=False) is shrunk before the prompt, placeholders restored afterwards
+        self.reduce_raw_html = reduce_raw_html
 
         self.allowed_mime_types = {
             'image/png',
@@ -24,10 +28,10 @@ class ExtractorService:
         }
         
     def _allowed_file(self, file) -> bool:
-        """Check if the file type is allowed based on MIME type"""
+        """Check if the file type is allowed based on MIME type and magic bytes"""
         if not file or not file.content_type:
             return False
-        return file.content_type in self.allowed_mime_types
+        return file.content_type in self.allowed_mime_types and has_valid_signature(file)
     
     def extract_anonymized(self, *docs: List, parse_html=True,
                            words_to_anonymize: List[str] = []) -> dict:
@@ -52,12 +56,30 @@ class ExtractorService:
         #-------- Process and parse the uploaded files --------#
 
         texts = []
+        html_mapping = {}  # placeholders of the reduced raw HTML
         for doc in docs:
             result = self._extract(doc, parse_html=parse_html)
             if not result['success']:
                 return result
             texts.append(result['result'])
+            html_mapping.update(result.get('mapping', {}))
 
+        result = self.anonymize_texts(texts, words_to_anonymize)
+        if html_mapping:
+            result['mapping'] = {**html_mapping, **result['mapping']}
+        return result
+
+    def anonymize_texts(self, texts: List[str], words_to_anonymize: List[str] = []) -> dict:
+        """
+        Anonymize already extracted texts together, so they share one mapping.
+        
+        Args:
+            texts (List[str]): Extracted document texts.
+            words_to_anonymize (List[str], optional): List of words to anonymize.
+        
+        Returns:
+            dict: Anonymized 'docs' (same order) and the shared 'mapping'.
+        """
         # -------- Assemble texts together (needs to be anonymized at once..) -------- #
         text_to_anon = SPLITTER.join(texts)
 
@@ -73,6 +95,10 @@ class ExtractorService:
             'mapping': mapping
         }
     
+    def extract_text(self, doc: List, parse_html=True) -> dict:
+        """Extract the text of one document (list of files) without anonymizing it."""
+        return self._extract(doc if isinstance(doc, list) else [doc], parse_html=parse_html)
+
     def _extract(self, doc: List, parse_html=True) -> dict:
         """
         Process the uploaded files and return extracted text
@@ -82,7 +108,8 @@ class ExtractorService:
             words_to_anonymize (List[str], optional): List of words to anonymize, or None for default anonymization.
         
         Returns:
-            dict: Dictionary with success status and extracted text or error message.
+            dict: Dictionary with success status and extracted text or error message,
+                and the 'mapping' of the placeholders of reduced raw HTML.
         """
         
         if not doc or all(file.filename == '' for file in doc):
@@ -93,6 +120,7 @@ class ExtractorService:
             }
         
         extracted_text = ""
+        mapping = {}
         
         for file in doc:
             if file and file.filename != '':
@@ -102,8 +130,13 @@ class ExtractorService:
                         extracted_text += self.parser.parse_docx(file) + "\n\n"
                     elif file.content_type in {'application/html', 'text/html'}:
                         # Process HTML: either parse tags or keep raw markup
-                        raw_html = file.stream.read().decode('utf-8')
-                        content = self.parser.parse_html(file) if parse_html else raw_html
+                        if parse_html:
+                            content = self.parser.parse_html(file)
+                        else:
+                            content = self.parser.read_text(file)
+                            if self.reduce_raw_html:
+                                content, html_mapping = reduce_html(content)
+                                mapping.update(html_mapping)
                         extracted_text += f"{content}\n\n"
                     elif file.content_type == 'application/pdf':
                         # Parse PDF file
@@ -126,5 +159,6 @@ class ExtractorService:
         
         return {
             'success': True,
-            'result': extracted_text.strip()
+            'result': extracted_text.strip(),
+            'mapping': mapping
         }
\ No newline at end of file
@@ -1,6 +1,8 @@
 from services.elsa import deanonymize_text
 from llm.gemini_client import GeminiClient
 from services.extractor_service import ExtractorService
+from services.example_index import ExampleIndex, DEFAULT_TOP_K, DEFAULT_TOKEN_BUDGET
+from services.tracing import span
 
 import io, os, mimetypes
 from werkzeug.datastructures import FileStorage
@@ -13,10 +15,9 @@ from dotenv import load_dotenv
 
 def make_filestorage_from(path):
 
+    # Contenu lu en mémoire : aucun descripteur ne reste ouvert (appelants sans close)
     with open(path, "rb") as f:
-        data = f.read()
-
-    stream = io.BytesIO(data)
+        stream = io.BytesIO(f.read())
 
     filename = os.path.basename(path)
     content_type, _ = mimetypes.guess_type(path)
@@ -30,12 +31,22 @@ def make_filestorage_from(path):
 #--------------------------------------------
 #--------------------------------------------
 
-def generate_copy(user_file_input=None):
+def build_copy_example_index(extractor):
+    """Construit l'index de similarité des exemples de copy (model_templates/copy)."""
+    example_fs = [make_filestorage_from(str(p)) 
+                  for p in Path("model_templates/copy").glob("*.docx")]
+    return ExampleIndex.from_files(extractor, example_fs, parse_html=False)
+
+def generate_copy(user_file_input=None, top_k=DEFAULT_TOP_K, token_budget=DEFAULT_TOKEN_BUDGET,
+                  example_index=None):
     """
     Génère une copy à partir d'un fichier.
     user_file_input peut être soit:
     - Un chemin de fichier (string) - ancien comportement
     - Un objet FileStorage de Flask - nouveau comportement
+
+    top_k et token_budget limitent les exemples les plus similaires ajoutés au prompt.
+    example_index est l'index construit au démarrage (construit à la volée si absent).
     """
     
     if user_file_input is None:
@@ -58,8 +69,8 @@ def generate_copy(user_file_input=None):
     model = GeminiClient(api_key, **config)
     extractor = ExtractorService(api_key)
 
-    example_fs = [make_filestorage_from(str(p)) 
-                  for p in Path("model_templates/copy").glob("*.docx")]
+    if example_index is None:
+        example_index = build_copy_example_index(extractor)
 
     # NOUVELLE LOGIQUE : Gérer FileStorage OU chemin de fichier
     if isinstance(user_file_input, FileStorage):
@@ -69,20 +80,22 @@ def generate_copy(user_file_input=None):
         # C'est un chemin de fichier (comportement original)
         user_fs = make_filestorage_from(user_file_input)
 
-    result = extractor.extract_anonymized(
-        *example_fs, user_fs, parse_html=False)
+    result = extractor.extract_anonymized(user_fs, parse_html=False)
     
     if not result['success']:
         raise RuntimeError(f"Extraction error: {result['error']}")
 
-    docs = result['docs']
-    mapping = result['mapping']
+    brief = result['docs'][0]
+
+    with span('llm_payload'):
+        # Sélection des exemples les plus proches du brief
+        selection = example_index.select(brief, top_k=top_k, token_budget=token_budget)
+        mapping = {**selection['mapping'], **result['mapping']}
 
-    prompt = "Basé sur les exemples suivants :\n"
-    for idx, example in enumerate(docs[:-1], start=1): #C'est pas start 0 ? 
-        prompt += f"Exemple {idx} :\n{example}\n---\n"
-    prompt += f"À partir du rapport de briefing suivant :\n{docs[-1]}\n"
-    prompt += "Génère un template pour l'équipe graphique équivalent aux exemples fournis, uniquement pour le public francophone."
+        prompt = "Basé sur les exemples suivants :\n"
+        prompt += ExampleIndex.format_examples(selection['docs'], label="Exemple")
+        prompt += f"À partir du rapport de briefing suivant :\n{brief}\n"
+        prompt += "Génère un template pour l'équipe graphique équivalent aux exemples fournis, uniquement pour le public francophone."
 
     generated_output = model.generate_content(prompt)
 
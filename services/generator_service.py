@@ -1,11 +1,17 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Iterator, List, Optional, Tuple
+
 from llm.gemini_client import DesignGeneratorClient
 from services.elsa import deanonymize_text
+from services.example_index import ExampleIndex, DEFAULT_TOP_K, DEFAULT_TOKEN_BUDGET
+from services.tracing import submit_in_context
 
 class GeneratorService:
     """Service class to handle file upload and comparison logic"""
 
-    def __init__(self, api_key: str):
+    def __init__(self, api_key: str, example_index: Optional[ExampleIndex] = None):
         self.design_generator = DesignGeneratorClient(api_key)
+        self.example_index = example_index
         # try:
         #     with open('generate_design_examples.txt', 'r', encoding='utf-8') as file:
         #         self.examples = file.read()
@@ -13,27 +19,75 @@ class GeneratorService:
         #     print("Warning: generate_design_examples.txt not found")
         #     self.examples = ""
 
-    def generate(self, text: str, mapping: dict, examples: str, generation_type: str = "design", language : str = "FR") -> dict:
+    def generate(self, text: str, mapping: dict, examples: Optional[str] = None, generation_type: str = "design", language : str = "FR",
+                 top_k: int = DEFAULT_TOP_K, token_budget: int = DEFAULT_TOKEN_BUDGET) -> dict:
         """
         Process the uploaded files and return comparison results
         
         Args:
             text (str): document text.
             mapping (dict): Mapping of anonymized tokens to original values.
+            examples (str, optional): Pre-formatted examples. If None, the most similar
+                examples are selected from the example index.
             generation_type (str): Type of comparison to perform (e.g., "design", "copy").
             language (str): Language response (french or flemmish)
+            top_k (int): Maximum number of examples selected from the index.
+            token_budget (int): Maximum estimated tokens spent on the selected examples.
         
         Returns:
             dict: JSON with the result of the comparison.
         """
 
-        if language == "FR":
-            language = 'FRENCH'
-        else:
-            language = "FLEMISH"
+        language = self._language_name(language)
+
+        # -------- Select the most relevant examples -------- #
+        if examples is None:
+            examples, mapping = self._select_examples(text, mapping, top_k, token_budget)
     
         # -------- Compare the copy and design content --------#
         anon_generated = self.design_generator.generate(text, examples, language)#, self.examples)
         
         # -------- Deanonymize the llm output -------- #
-        return deanonymize_text(anon_generated, mapping)
\ No newline at end of file
+        return deanonymize_text(anon_generated, mapping)
+
+    def generate_many(self, text: str, mapping: dict, languages: List[str], top_k: int = DEFAULT_TOP_K,
+                      token_budget: int = DEFAULT_TOKEN_BUDGET) -> Iterator[Tuple[str, str]]:
+        """
+        Generate the design in several languages (e.g. FR and NL for Belgian campaigns).
+
+        The examples are selected once for all the variants and the per-language calls run
+        concurrently; each variant is yielded as soon as it is done.
+
+        Args:
+            text (str): Anonymized copy text (extracted once by the caller).
+            mapping (dict): Mapping of anonymized tokens to original values.
+            languages (List[str]): Language codes ("FR", "NL").
+            top_k (int): Maximum number of examples selected from the index.
+            token_budget (int): Maximum estimated tokens spent on the selected examples.
+
+        Returns:
+            Iterator[Tuple[str, str]]: (language code, de-anonymized HTML) in completion order.
+                The calls start right away, before the iterator is consumed.
+        """
+        examples, mapping = self._select_examples(text, mapping, top_k, token_budget)
+
+        def generate_one(language: str) -> Tuple[str, str]:
+            anon_generated = self.design_generator.generate(text, examples, self._language_name(language))
+            return language, deanonymize_text(anon_generated, mapping)
+
+        # Run in the request's context: its trace and its LLM priority class
+        pool = ThreadPoolExecutor(max_workers=len(languages), thread_name_prefix="design")
+        futures = [submit_in_context(pool, generate_one, language) for language in languages]
+        pool.shutdown(wait=False)
+        return (future.result() for future in as_completed(futures))
+
+    @staticmethod
+    def _language_name(language: str) -> str:
+        return 'FRENCH' if language == "FR" else "FLEMISH"
+
+    def _select_examples(self, text: str, mapping: dict, top_k: int, token_budget: int) -> Tuple[str, dict]:
+        """Most similar examples from the index, formatted, with the mapping extended by theirs."""
+        if self.example_index is None:
+            return "", mapping
+        selection = self.example_index.select(text, top_k=top_k, token_budget=token_budget)
+        return ExampleIndex.format_examples(selection['docs']), {**selection['mapping'], **mapping}
@@ -0,0 +1,105 @@
+import hashlib
+import re
+from collections import Counter
+from typing import Tuple
+
+from services.tracing import traced
+
+
+# Blocks whose whitespace is meaningful, set aside while the rest is collapsed
+PRESERVED_PATTERN = re.compile(r'<(pre|textarea)\b[^>]*>.*?</\1\s*>', re.IGNORECASE | re.DOTALL)
+
+# Comments, except the Outlook conditional ones (<!--[if mso]> ... <![endif]-->, <!-->)
+COMMENT_PATTERN = re.compile(r'<!--(?!\s*\[if)(?!<!\[endif)(?!>).*?-->', re.DOTALL)
+SCRIPT_PATTERN = re.compile(r'<script\b[^>]*>.*?</script\s*>', re.IGNORECASE | re.DOTALL)
+WHITESPACE_PATTERN = re.compile(r'\s+')
+
+STYLE_CLASS_PATTERN = re.compile(r'''\b(style|class)(\s*=\s*)(["'])(.*?)\3''', re.IGNORECASE | re.DOTALL)
+URL_ATTR_PATTERN = re.compile(r'''\b(href|src|background|action)(\s*=\s*)(["'])(.*?)\3''', re.IGNORECASE | re.DOTALL)
+CSS_URL_PATTERN = re.compile(r'''url\(\s*(["']?)([^"')]+)\1\s*\)''', re.IGNORECASE)
+
+MIN_REPEAT = 2  # style / class values interned when used at least this many times
+MIN_URL_LENGTH = 40  # URLs interned from this length (tracking links, CDN paths)
+
+
+def make_placeholder(label: str, value: str) -> str:
+    """
+    Deterministic placeholder, the same for a value in every document (like the
+    anonymization ones). Letters only: the anonymizer's number patterns leave it alone.
+    """
+    digest = hashlib.sha256(value.encode('utf-8')).digest()
+    return f"[{label}_{''.join(chr(ord('a') + byte % 26) for byte in digest[:8])}]"
+
+
+def minify_html(html: str) -> str:
+    """Drop comments and scripts and collapse whitespace (<pre> and <textarea> kept as is)."""
+    preserved = []
+
+    def set_aside(match):
+        preserved.append(match.group(0))
+        return f"\x00{len(preserved) - 1}\x00"
+
+    html = PRESERVED_PATTERN.sub(set_aside, html)
+    html = COMMENT_PATTERN.sub('', html)
+    html = SCRIPT_PATTERN.sub('', html)
+    html = WHITESPACE_PATTERN.sub(' ', html).strip()
+    return re.sub(r'\x00(\d+)\x00', lambda match: preserved[int(match.group(1))], html)
+
+
+@traced('reduce_html')
+def reduce_html(html: str, min_repeat: int = MIN_REPEAT, min_url_length: int = MIN_URL_LENGTH) -> Tuple[str, dict]:
+    """
+    Shrink raw HTML before it goes into a prompt.
+
+    Comments, scripts and whitespace runs are removed (not restored: they do not
+    change the design). Style and class values used several times and long URLs are
+    replaced with short placeholders, restored in the LLM output with the returned
+    mapping (merged into the anonymization mapping, see deanonymize_text).
+
+    Args:
+        html (str): Raw HTML document.
+        min_repeat (int): Minimum number of uses of a style / class value to intern it.
+        min_url_length (int): Minimum length of an interned URL.
+
+    Returns:
+        tuple: (reduced HTML, mapping placeholder -> original value)
+    """
+    mapping = {}
+    html = minify_html(html)
+
+    def intern(label: str, value: str) -> str:
+        token = make_placeholder(label, value)
+        if len(token) >= len(value):
+            return value
+        mapping[token] = value
+        return token
+
+    # -------- Repeated style / class strings -------- #
+    counts = Counter(match.group(4) for match in STYLE_CLASS_PATTERN.finditer(html))
+
+    def repl_style_class(match):
+        attr, eq, quote, value = match.groups()
+        if counts[value] < min_repeat:
+            return match.group(0)
+        label = 'STYLE' if attr.lower() == 'style' else 'CLASS'
+        return f"{attr}{eq}{quote}{intern(label, value)}{quote}"
+
+    html = STYLE_CLASS_PATTERN.sub(repl_style_class, html)
+
+    # -------- Long URLs (links, images, CSS backgrounds) -------- #
+    def repl_url_attr(match):
+        attr, eq, quote, value = match.groups()
+        if len(value) < min_url_length:
+            return match.group(0)
+        return f"{attr}{eq}{quote}{intern('URL', value)}{quote}"
+
+    def repl_css_url(match):
+        quote, value = match.groups()
+        if len(value) < min_url_length:
+            return match.group(0)
+        return f"url({quote}{intern('URL', value)}{quote})"
+
+    html = URL_ATTR_PATTERN.sub(repl_url_attr, html)
+    html = CSS_URL_PATTERN.sub(repl_css_url, html)
+
+    return html, mapping
@@ -0,0 +1,549 @@
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Callable, Dict, Optional
+
+from werkzeug.datastructures import FileStorage, MultiDict
+
+from llm.scheduler import BACKGROUND, priority
+
+
+QUEUED, RUNNING, SUCCEEDED, FAILED, CANCELLED = 'queued', 'running', 'succeeded', 'failed', 'cancelled'
+FINISHED_STATES = {SUCCEEDED, FAILED, CANCELLED}
+
+
+class JobCancelled(Exception):
+    """Raised inside a job when it has been cancelled between two stages."""
+
+
+class JobStore:
+    """
+    Durable job state in a local SQLite database (one connection per call, closed after
+    it, thread safe).
+
+    A running job is leased by the process running it (`owner`, `lease_expires_at`):
+    the owner renews the lease while the job runs, and a job whose lease expired (its
+    worker was recycled, timed out or crashed) is re-queued by another process.
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL,
+                    payload TEXT NOT NULL,
+                    result TEXT,
+                    result_path TEXT,
+                    result_mimetype TEXT,
+                    error TEXT,
+                    status_code INTEGER,
+                    timings TEXT NOT NULL DEFAULT '{}',
+                    cancel_requested INTEGER NOT NULL DEFAULT 0,
+                    owner TEXT,
+                    lease_expires_at REAL,
+                    attempts INTEGER NOT NULL DEFAULT 0
+                )
+            """)
+            columns = {row['name'] for row in conn.execute("PRAGMA table_info(jobs)")}
+            for column, definition in (('cancel_requested', 'INTEGER NOT NULL DEFAULT 0'), ('owner', 'TEXT'),
+                                       ('lease_expires_at', 'REAL'), ('attempts', 'INTEGER NOT NULL DEFAULT 0')):
+                if column not in columns:
+                    conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} {definition}")
+
+    @contextmanager
+    def _connect(self):
+        """Connection committed (or rolled back) and closed at the end of the block."""
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def insert(self, job_id: str, kind: str, payload: dict):
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, kind, status, created_at, updated_at, payload) VALUES (?, ?, ?, ?, ?, ?)",
+                (job_id, kind, QUEUED, now, now, json.dumps(payload))
+            )
+
+    def update(self, job_id: str, **fields):
+        if 'result' in fields and fields['result'] is not None:
+            fields['result'] = json.dumps(fields['result'])
+        if 'timings' in fields:
+            fields['timings'] = json.dumps(fields['timings'])
+        fields['updated_at'] = time.time()
+
+        columns = ", ".join(f"{key} = ?" for key in fields)
+        with self._lock, self._connect() as conn:
+            conn.execute(f"UPDATE jobs SET {columns} WHERE id = ?", (*fields.values(), job_id))
+
+    def transition(self, job_id: str, from_status: str, to_status: str) -> bool:
+        """Atomically move a job between two states; False if another process got there first."""
+        with self._lock, self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = ?, updated_at = ? WHERE id = ? AND status = ?",
+                (to_status, time.time(), job_id, from_status)
+            )
+        return cursor.rowcount == 1
+
+    def claim(self, job_id: str, owner: str, lease: float) -> bool:
+        """Atomically move a queued job to running under a lease; False if another process got there first."""
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = ?, owner = ?, lease_expires_at = ?, attempts = attempts + 1, updated_at = ? "
+                "WHERE id = ? AND status = ?",
+                (RUNNING, owner, now + lease, now, job_id, QUEUED)
+            )
+        return cursor.rowcount == 1
+
+    def finish(self, job_id: str, owner: str, **fields) -> bool:
+        """
+        Record the final state of a job run by `owner`; False (nothing written) if the job
+        was re-queued meanwhile because the lease expired.
+        """
+        if 'result' in fields and fields['result'] is not None:
+            fields['result'] = json.dumps(fields['result'])
+        fields.update(updated_at=time.time(), lease_expires_at=None)
+
+        columns = ", ".join(f"{key} = ?" for key in fields)
+        with self._lock, self._connect() as conn:
+            cursor = conn.execute(
+                f"UPDATE jobs SET {columns} WHERE id = ? AND owner = ? AND status = ?",
+                (*fields.values(), job_id, owner, RUNNING)
+            )
+        return cursor.rowcount == 1
+
+    def renew_leases(self, job_ids: list, owner: str, lease: float):
+        if not job_ids:
+            return
+        placeholders = ", ".join("?" for _ in job_ids)
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                f"UPDATE jobs SET lease_expires_at = ? WHERE owner = ? AND status = ? AND id IN ({placeholders})",
+                (time.time() + lease, owner, RUNNING, *job_ids)
+            )
+
+    def requeue_stale(self, max_attempts: int) -> tuple:
+        """
+        Re-queue the running jobs whose lease expired (jobs without a lease come from a
+        version without leases); the ones interrupted `max_attempts` times fail instead.
+
+        Returns:
+            tuple: (re-queued ids, failed ids)
+        """
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            rows = conn.execute(
+                "SELECT id, attempts FROM jobs WHERE status = ? AND (lease_expires_at IS NULL OR lease_expires_at < ?)",
+                (RUNNING, now)
+            ).fetchall()
+            requeued, failed = [], []
+            for row in rows:
+                if row['attempts'] >= max_attempts:
+                    conn.execute(
+                        "UPDATE jobs SET status = ?, error = ?, status_code = 500, owner = NULL, lease_expires_at = NULL, "
+                        "updated_at = ? WHERE id = ? AND status = ?",
+                        (FAILED, f"Job interrupted {row['attempts']} times", now, row['id'], RUNNING)
+                    )
+                    failed.append(row['id'])
+                else:
+                    conn.execute(
+                        "UPDATE jobs SET status = ?, owner = NULL, lease_expires_at = NULL, updated_at = ? "
+                        "WHERE id = ? AND status = ?",
+                        (QUEUED, now, row['id'], RUNNING)
+                    )
+                    requeued.append(row['id'])
+        return requeued, failed
+
+    def queued_ids(self, older_than: float) -> list:
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT id FROM jobs WHERE status = ? AND updated_at < ? ORDER BY created_at", (QUEUED, older_than)
+            ).fetchall()
+        return [row['id'] for row in rows]
+
+    def get(self, job_id: str) -> Optional[dict]:
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job['payload'] = json.loads(job['payload'])
+        job['result'] = json.loads(job['result']) if job['result'] else None
+        job['timings'] = json.loads(job['timings'])
+        return job
+
+    def ids_with_status(self, *statuses: str) -> list:
+        placeholders = ", ".join("?" for _ in statuses)
+        with self._connect() as conn:
+            rows = conn.execute(
+                f"SELECT id FROM jobs WHERE status IN ({placeholders}) ORDER BY created_at", statuses
+            ).fetchall()
+        return [row['id'] for row in rows]
+
+    def expired_ids(self, older_than: float) -> list:
+        placeholders = ", ".join("?" for _ in FINISHED_STATES)
+        with self._connect() as conn:
+            rows = conn.execute(
+                f"SELECT id FROM jobs WHERE status IN ({placeholders}) AND updated_at < ?",
+                (*FINISHED_STATES, older_than)
+            ).fetchall()
+        return [row['id'] for row in rows]
+
+    def delete(self, job_id: str):
+        with self._lock, self._connect() as conn:
+            conn.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+
+
+class JobContext:
+    """Handle given to a running job to record stage timings and output files."""
+
+    def __init__(self, service: "JobService", job_id: str):
+        self.service = service
+        self.job_id = job_id
+        self.timings: Dict[str, float] = {}
+        self.result_path = None
+        self.result_mimetype = None
+
+    @property
+    def cancelled(self) -> bool:
+        job = self.service.store.get(self.job_id)
+        return job is None or bool(job['cancel_requested'])
+
+    @contextmanager
+    def stage(self, name: str):
+        """Time a stage of the job; raise JobCancelled if the job was cancelled before it starts."""
+        if self.cancelled:
+            raise JobCancelled()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] = round((time.perf_counter() - start) * 1000, 1)
+            self.service.store.update(self.job_id, timings=self.timings)
+
+    def output_file(self, filename: str, mimetype: str) -> str:
+        """Reserve a path in the job directory for a binary result (e.g. the converted PDF)."""
+        self.result_path = os.path.join(self.service._job_dir(self.job_id), filename)
+        self.result_mimetype = mimetype
+        return self.result_path
+
+
+class NullJobContext:
+    """No-op job context used when a task runs synchronously inside a request."""
+
+    cancelled = False
+
+    def __init__(self):
+        self.result_path = None
+        self.result_mimetype = None
+
+    @contextmanager
+    def stage(self, name: str):
+        yield
+
+    def output_file(self, filename: str, mimetype: str) -> str:
+        """Temporary output file; the caller removes it once sent."""
+        fd, self.result_path = tempfile.mkstemp(suffix=os.path.splitext(filename)[1])
+        os.close(fd)
+        self.result_mimetype = mimetype
+        return self.result_path
+
+
+class JobService:
+    """
+    Background job queue for the long-running endpoints (LLM calls, Chromium rendering).
+
+    Uploaded files and form fields are spooled to disk and the job state lives in SQLite,
+    so queued and interrupted jobs are resumed after a restart. Jobs run in a bounded
+    thread pool; submissions are rejected once `max_pending` jobs are waiting.
+
+    Several processes (server workers) can share the same store: a job is claimed
+    atomically by the process that runs it, under a lease renewed while it runs, and
+    cancellation goes through the store. Each process sweeps the store periodically:
+    running jobs whose lease expired (worker recycled, timed out or crashed) and queued
+    jobs left by a worker that exited are picked up again, expired jobs are purged.
+    """
+
+    def __init__(self, db_path: str, spool_dir: str, max_workers: int = 4, max_pending: int = 100,
+                 ttl: float = 24 * 3600, lease: float = 60, max_attempts: int = 3):
+        """
+        Args:
+            db_path (str): SQLite database file holding the job states.
+            spool_dir (str): Directory where job inputs and binary outputs are stored.
+            max_workers (int): Number of jobs running concurrently.
+            max_pending (int): Maximum number of queued or running jobs.
+            ttl (float): Seconds a finished job (and its files) is kept.
+            lease (float): Seconds a running job stays claimed without a renewal (renewed
+                every lease / 3 seconds by the sweep of its process).
+            max_attempts (int): Runs of an interrupted job before it is marked failed.
+        """
+        os.makedirs(spool_dir, exist_ok=True)
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self.store = JobStore(db_path)
+        self.spool_dir = spool_dir
+        self.max_pending = max_pending
+        self.ttl = ttl
+        self.max_workers = max_workers
+        self.lease = lease
+        self.max_attempts = max_attempts
+        self.handlers: Dict[str, Callable] = {}
+
+        self._executor = None
+        self._futures = {}
+        self._running = set()
+        self._lock = threading.Lock()
+        self._owner = None
+        self._sweeper = None
+        self._stop = threading.Event()
+
+    def register(self, kind: str, handler: Callable):
+        """
+        Register a task. The handler is called as handler(form, files, job) and returns
+        a result dict following the services convention ('success', 'error', 'status_code').
+        """
+        self.handlers[kind] = handler
+
+    def recover(self):
+        """
+        Purge expired jobs and re-queue the jobs left running by a previous process.
+        Must run once, before the server workers are started (no job is running yet,
+        leases are not waited for); the workers' sweeps take over afterwards.
+        """
+        self._purge_expired()
+
+        for job_id in self.store.ids_with_status(RUNNING):
+            print(f"🔁 Re-queuing interrupted job {job_id}")
+            self.store.update(job_id, status=QUEUED, owner=None, lease_expires_at=None)
+
+    def start(self):
+        """Start the worker pool and the sweep of this process and pick up the queued jobs."""
+        with self._lock:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="job")
+            self._futures = {}
+            self._running = set()
+            self._owner = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"  # new after each fork
+            self._stop = threading.Event()
+            self._sweeper = threading.Thread(target=self._sweep_loop, name="job-sweep", daemon=True)
+            self._sweeper.start()
+
+        for job_id in self.store.ids_with_status(QUEUED):
+            self._schedule(job_id)
+
+    def _sweep_loop(self):
+        stop = self._stop
+        while not stop.wait(self.lease / 3):
+            try:
+                self.sweep()
+            except Exception as e:  # a locked or unavailable store must not stop the sweeps
+                print(f"❌ Job sweep failed: {str(e)}")
+
+    def sweep(self):
+        """
+        Renew the leases of the jobs running here, re-queue the stale ones of other
+        processes, pick up the queued jobs nobody runs and purge the expired jobs.
+        """
+        with self._lock:
+            running = list(self._running)
+            scheduled = set(self._futures)
+        self.store.renew_leases(running, self._owner, self.lease)
+
+        requeued, failed = self.store.requeue_stale(self.max_attempts)
+        for job_id in requeued:
+            print(f"🔁 Re-queuing job {job_id}: its worker stopped renewing the lease")
+            if job_id not in scheduled:
+                self._schedule(job_id)
+                scheduled.add(job_id)
+        for job_id in failed:
+            print(f"❌ Job {job_id} failed: interrupted {self.max_attempts} times")
+
+        # Queued jobs of a worker that exited before running them (claims prevent double runs)
+        for job_id in self.store.queued_ids(older_than=time.time() - self.lease):
+            if job_id not in scheduled:
+                self._schedule(job_id)
+
+        self._purge_expired()
+
+    def _purge_expired(self):
+        for job_id in self.store.expired_ids(time.time() - self.ttl):
+            self._remove(job_id)
+
+    def _job_dir(self, job_id: str) -> str:
+        return os.path.join(self.spool_dir, job_id)
+
+    def _remove(self, job_id: str):
+        shutil.rmtree(self._job_dir(job_id), ignore_errors=True)
+        self.store.delete(job_id)
+
+    def _schedule(self, job_id: str):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="job")
+                self._owner = self._owner or f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+            self._futures[job_id] = self._executor.submit(self._run, job_id)
+
+    def pending_count(self) -> int:
+        with self._lock:
+            return sum(1 for future in self._futures.values() if not future.done())
+
+    def submit(self, kind: str, form, files) -> dict:
+        """
+        Spool the request inputs and queue a job.
+
+        Args:
+            kind (str): Registered task name.
+            form: Form fields of the request (MultiDict or dict).
+            files: Uploaded files of the request (MultiDict of FileStorage).
+
+        Returns:
+            dict: 'success' with the job 'id', or an error with its status code.
+        """
+        if kind not in self.handlers:
+            return {'success': False, 'error': f'Unknown job type: {kind}', 'status_code': 404}
+        if self.pending_count() >= self.max_pending:
+            return {'success': False, 'error': 'Too many pending jobs, retry later', 'status_code': 503}
+
+        job_id = uuid.uuid4().hex
+        job_dir = self._job_dir(job_id)
+        os.makedirs(job_dir)
+
+        spooled_files = []
+        for idx, (field, file) in enumerate(files.items(multi=True)):
+            if not file or file.filename == '':
+                continue
+            path = os.path.join(job_dir, f"input_{idx}")
+            file.save(path)
+            spooled_files.append({
+                'field': field,
+                'path': path,
+                'filename': file.filename,
+                'content_type': file.content_type
+            })
+
+        form_items = form.items(multi=True) if hasattr(form, 'getlist') else form.items()
+        payload = {'form': list(form_items), 'files': spooled_files}
+
+        self.store.insert(job_id, kind, payload)
+        self._schedule(job_id)
+        return {'success': True, 'id': job_id}
+
+    def _run(self, job_id: str):
+        # Claim the job: it may already be cancelled or run by another process
+        owner = self._owner
+        if not self.store.claim(job_id, owner, self.lease):
+            with self._lock:
+                self._futures.pop(job_id, None)
+            return
+        with self._lock:
+            self._running.add(job_id)
+
+        job = self.store.get(job_id)
+        context = JobContext(self, job_id)
+
+        form = MultiDict(job['payload']['form'])
+        files = MultiDict()
+        streams = []
+        for spooled in job['payload']['files']:
+            stream = open(spooled['path'], 'rb')
+            streams.append(stream)
+            files.add(spooled['field'], FileStorage(
+                stream=stream,
+                filename=spooled['filename'],
+                content_type=spooled['content_type']
+            ))
+
+        try:
+            with priority(BACKGROUND):  # queued jobs yield the Gemini slots to interactive requests
+                result = self.handlers[job['kind']](form, files, context)
+            if context.cancelled:
+                raise JobCancelled()
+
+            if result.get('success'):
+                finished = self.store.finish(job_id, owner, status=SUCCEEDED, result=result,
+                                             result_path=context.result_path,
+                                             result_mimetype=context.result_mimetype)
+            else:
+                finished = self.store.finish(job_id, owner, status=FAILED, error=result.get('error'),
+                                             status_code=result.get('status_code', 500))
+            if not finished:
+                print(f"⚠️ Job {job_id} finished after its lease expired, result discarded")
+
+        except JobCancelled:
+            self.store.finish(job_id, owner, status=CANCELLED)
+        except Exception as e:
+            print(f"❌ Job {job_id} failed: {str(e)}")
+            import traceback
+            traceback.print_exc()
+            self.store.finish(job_id, owner, status=FAILED, error=str(e), status_code=500)
+        finally:
+            for stream in streams:
+                stream.close()
+            with self._lock:
+                self._futures.pop(job_id, None)
+                self._running.discard(job_id)
+
+    def status(self, job_id: str) -> Optional[dict]:
+        """Public view of a job: state, error and stage timings (no inputs)."""
+        job = self.store.get(job_id)
+        if job is None:
+            return None
+        return {
+            'id': job['id'],
+            'kind': job['kind'],
+            'status': job['status'],
+            'created_at': job['created_at'],
+            'updated_at': job['updated_at'],
+            'error': job['error'],
+            'timings': job['timings'],
+            'has_file': job['result_path'] is not None
+        }
+
+    def result(self, job_id: str) -> Optional[dict]:
+        return self.store.get(job_id)
+
+    def cancel(self, job_id: str) -> Optional[dict]:
+        """
+        Cancel a job. Queued jobs never start; running jobs stop before their next
+        stage and their result is discarded.
+        """
+        job = self.store.get(job_id)
+        if job is None:
+            return None
+        if job['status'] in FINISHED_STATES:
+            return self.status(job_id)
+
+        self.store.update(job_id, cancel_requested=1)
+        if self.store.transition(job_id, QUEUED, CANCELLED):
+            with self._lock:
+                future = self._futures.pop(job_id, None)
+            if future is not None:
+                future.cancel()
+        return self.status(job_id)
+
+    def shutdown(self, wait: bool = True):
+        """
+        Stop the worker pool. With wait=True the running jobs (in-flight LLM or Chromium
+        calls) are drained; jobs that did not start stay queued for the next process.
+        """
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait, cancel_futures=True)
+        self._stop.set()  # after the drain: the running jobs keep their leases until they finish
@@ -0,0 +1,175 @@
+import json
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from contextlib import closing
+from typing import Dict, Optional
+
+from services.elsa import deanonymize_dict
+
+
+class SessionError(Exception):
+    """A session handle that cannot be used (the routes answer with its status code)."""
+
+    status_code = 400
+
+
+class SessionNotFound(SessionError):
+    status_code = 404
+
+    def __init__(self, handle: str):
+        super().__init__(f"Unknown session: {handle}")
+
+
+class SessionExpired(SessionError):
+    status_code = 410
+
+    def __init__(self, handle: str):
+        super().__init__(f"Session expired: {handle}, extract the documents again")
+
+
+class MappingStore:
+    """
+    Server-side anonymization mappings, referenced by a short session handle.
+
+    The browser only keeps the handle: documents added to a session later merge their
+    placeholders into the same mapping (placeholders are deterministic, so documents
+    anonymized earlier never need to be anonymized again), and de-anonymization looks
+    the mapping up by handle. Sessions expire `ttl` seconds after their last use; a
+    handle that is unknown or expired is rejected (SessionNotFound / SessionExpired)
+    rather than silently replaced by a new, empty session. Expired sessions are kept
+    another `ttl` seconds so they are reported as expired, then dropped.
+
+    With `db_path` the mappings live in SQLite, shared by every worker process;
+    without it they are kept in memory, which only works with a single worker.
+    """
+
+    def __init__(self, ttl: int = 3600, db_path: Optional[str] = None):
+        self.ttl = ttl
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._memory: Dict[str, tuple] = {}  # handle -> (expires_at, mapping)
+        self._last_sweep = time.time()
+
+        if db_path:
+            os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+            with closing(self._connect()) as conn:
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS mappings (
+                        handle TEXT PRIMARY KEY,
+                        mapping TEXT NOT NULL,
+                        expires_at REAL NOT NULL
+                    )
+                """)
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+
+    @staticmethod
+    def new_handle() -> str:
+        return secrets.token_urlsafe(9)
+
+    @staticmethod
+    def _check(handle: str, row: Optional[tuple], now: float) -> dict:
+        """Mapping of a (expires_at, mapping) entry, or the error of the handle."""
+        if row is None:
+            raise SessionNotFound(handle)
+        if row[0] < now:
+            raise SessionExpired(handle)
+        return row[1]
+
+    def get(self, handle: str) -> dict:
+        """
+        Mapping of a session (its TTL is refreshed).
+
+        Raises:
+            SessionNotFound: Unknown handle.
+            SessionExpired: Handle past its TTL.
+        """
+        now = time.time()
+
+        if not self.db_path:
+            with self._lock:
+                mapping = self._check(handle, self._memory.get(handle), now)
+                self._memory[handle] = (now + self.ttl, mapping)
+                return dict(mapping)
+
+        with closing(self._connect()) as conn:
+            row = conn.execute("SELECT expires_at, mapping FROM mappings WHERE handle = ?", (handle,)).fetchone()
+            mapping = self._check(handle, row, now)
+            conn.execute("UPDATE mappings SET expires_at = ? WHERE handle = ?", (now + self.ttl, handle))
+        return json.loads(mapping)
+
+    def merge(self, handle: Optional[str], mapping: dict) -> tuple:
+        """
+        Add placeholders to a session, or create one when no handle is given.
+
+        Returns:
+            tuple: (handle, merged mapping of the session).
+
+        Raises:
+            SessionNotFound: Unknown handle.
+            SessionExpired: Handle past its TTL.
+        """
+        now = time.time()
+        self._sweep(now)
+
+        if not self.db_path:
+            with self._lock:
+                if handle:
+                    merged = {**self._check(handle, self._memory.get(handle), now), **mapping}
+                else:
+                    handle, merged = self.new_handle(), dict(mapping)
+                self._memory[handle] = (now + self.ttl, merged)
+                return handle, dict(merged)
+
+        with closing(self._connect()) as conn:
+            conn.execute("BEGIN IMMEDIATE")  # read-modify-write, other workers wait
+            try:
+                if handle:
+                    row = conn.execute("SELECT expires_at, mapping FROM mappings WHERE handle = ?", (handle,)).fetchone()
+                    merged = {**json.loads(self._check(handle, row, now)), **mapping}
+                else:
+                    handle, merged = self.new_handle(), dict(mapping)
+                conn.execute(
+                    "INSERT OR REPLACE INTO mappings (handle, mapping, expires_at) VALUES (?, ?, ?)",
+                    (handle, json.dumps(merged, ensure_ascii=False), now + self.ttl)
+                )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        return handle, merged
+
+    def deanonymize(self, handle: str, obj):
+        """De-anonymize a string, list or dict with the mapping of a session (raises like get)."""
+        return deanonymize_dict(obj, self.get(handle))
+
+    def delete(self, handle: str) -> bool:
+        """
+        Drop a session now (expired or not) instead of waiting for its TTL.
+
+        Returns:
+            bool: Whether the session existed.
+        """
+        if not self.db_path:
+            with self._lock:
+                return self._memory.pop(handle, None) is not None
+        with closing(self._connect()) as conn:
+            return conn.execute("DELETE FROM mappings WHERE handle = ?", (handle,)).rowcount > 0
+
+    def _sweep(self, now: float):
+        """Drop the sessions expired for more than a TTL (at most once a minute)."""
+        if now - self._last_sweep < 60:
+            return
+        self._last_sweep = now
+        cutoff = now - self.ttl
+        if not self.db_path:
+            with self._lock:
+                for handle in [h for h, (expires_at, _) in self._memory.items() if expires_at < cutoff]:
+                    del self._memory[handle]
+            return
+        with closing(self._connect()) as conn:
+            conn.execute("DELETE FROM mappings WHERE expires_at < ?", (cutoff,))
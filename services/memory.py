@@ -0,0 +1,236 @@
+import bisect
+import json
+import os
+import threading
+import tracemalloc
+from typing import Optional
+
+from flask import Flask, Response, g, jsonify, request
+
+from services.tracing import current_trace
+
+
+# Upper bounds (MB) of the peak memory histogram buckets
+PEAK_BUCKETS_MB = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+
+# Allocation sites of the interpreter machinery, not of our stages
+_IGNORED_SITES = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+)
+
+
+class RequestMemory:
+    """
+    Peak traced allocation of one request and of each of its stages (tracing spans).
+
+    tracemalloc only keeps one process-wide peak: it is folded into every open stage
+    and reset when a stage starts or ends, so nested stages each get their own peak.
+    Peaks are in bytes above the memory in use when the request / stage started.
+    """
+
+    def __init__(self, log_threshold: int, top_sites: int):
+        self.log_threshold = log_threshold
+        self.top_sites = top_sites
+        self.stages = {}  # stage name -> highest peak of its calls
+        self.peak = None  # set by finish()
+        self.overlapped = False  # other requests allocated meanwhile (peaks include theirs)
+        self._lock = threading.Lock()
+        current = self._fold([])
+        self._frames = [[current, current]]  # [start, peak] of the request, then of the open stages
+
+    @staticmethod
+    def _fold(frames: list) -> int:
+        current, peak = tracemalloc.get_traced_memory()
+        for frame in frames:
+            frame[1] = max(frame[1], peak)
+        tracemalloc.reset_peak()
+        return current
+
+    def enter(self) -> list:
+        """Start a stage, returns its frame (given back to exit)."""
+        with self._lock:
+            current = self._fold(self._frames)
+            frame = [current, current]
+            self._frames.append(frame)
+        return frame
+
+    def exit(self, name: str, frame: list) -> int:
+        """End a stage (not always the innermost one: stages of pool threads overlap), returns its peak."""
+        with self._lock:
+            self._fold(self._frames)
+            index = next(i for i, open_frame in enumerate(self._frames) if open_frame is frame)
+            start, peak = self._frames.pop(index)
+            for open_frame in self._frames:
+                open_frame[1] = max(open_frame[1], peak)
+        delta = peak - start
+        self.stages[name] = max(self.stages.get(name, 0), delta)
+        if delta >= self.log_threshold:
+            log_top_sites(f"stage {name}", delta, self.top_sites)
+        return delta
+
+    def finish(self) -> int:
+        with self._lock:
+            self._fold(self._frames)
+            start, peak = self._frames[0]
+        self.peak = peak - start
+        return self.peak
+
+
+def log_top_sites(label: str, peak: int, limit: int):
+    """
+    Print the allocation sites holding the most memory right now. Taken when a stage
+    over the threshold ends: what it still references (parsed pages, payloads, results).
+    """
+    snapshot = tracemalloc.take_snapshot().filter_traces(_IGNORED_SITES)
+    sites = [
+        {'site': f"{_short_path(stat.traceback[0].filename)}:{stat.traceback[0].lineno}",
+         'size_kb': round(stat.size / 1024, 1), 'count': stat.count}
+        for stat in snapshot.statistics('lineno')[:limit]
+    ]
+    print(json.dumps({'event': 'memory_peak', 'scope': label, 'peak_kb': round(peak / 1024, 1),
+                      'top_sites': sites}, ensure_ascii=False), flush=True)
+
+
+def _short_path(filename: str) -> str:
+    """Path relative to the application directory, absolute for the libraries."""
+    relative = os.path.relpath(filename)
+    return filename if relative.startswith('..') else relative
+
+
+class Histogram:
+    """Peak memory distribution (bytes) with the PEAK_BUCKETS_MB bounds."""
+
+    def __init__(self):
+        self.buckets = [0] * (len(PEAK_BUCKETS_MB) + 1)  # last one: above the largest bound
+        self.count = 0
+        self.sum = 0
+        self.max = 0
+
+    def observe(self, value: int):
+        self.buckets[bisect.bisect_left(PEAK_BUCKETS_MB, value / (1024 * 1024))] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def to_dict(self) -> dict:
+        bounds = [str(bound) for bound in PEAK_BUCKETS_MB] + ['+Inf']
+        return {
+            'count': self.count,
+            'mean_mb': round(self.sum / self.count / (1024 * 1024), 2) if self.count else 0,
+            'max_mb': round(self.max / (1024 * 1024), 2),
+            'buckets_mb': dict(zip(bounds, self.buckets)),
+        }
+
+
+class MemoryMetrics:
+    """Per-endpoint (and per-stage) peak memory histograms of this worker process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = {}  # endpoint -> Histogram
+        self.stages = {}  # endpoint -> stage -> Histogram
+        self.overlapped = {}  # endpoint -> requests measured while others were running
+
+    def observe(self, endpoint: str, memory: RequestMemory):
+        with self._lock:
+            self.requests.setdefault(endpoint, Histogram()).observe(memory.peak)
+            for name, peak in memory.stages.items():
+                self.stages.setdefault(endpoint, {}).setdefault(name, Histogram()).observe(peak)
+            if memory.overlapped:
+                self.overlapped[endpoint] = self.overlapped.get(endpoint, 0) + 1
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            return {
+                'pid': os.getpid(),
+                'endpoints': {
+                    endpoint: {
+                        **histogram.to_dict(),
+                        'overlapped': self.overlapped.get(endpoint, 0),
+                        'stages': {name: h.to_dict() for name, h in self.stages.get(endpoint, {}).items()},
+                    }
+                    for endpoint, histogram in self.requests.items()
+                },
+            }
+
+    def to_prometheus(self) -> str:
+        """Prometheus text exposition (cumulative buckets, in bytes)."""
+        lines = ['# TYPE request_peak_memory_bytes histogram', '# TYPE stage_peak_memory_bytes histogram']
+        with self._lock:
+            series = [('request_peak_memory_bytes', {'endpoint': endpoint}, h) for endpoint, h in self.requests.items()]
+            series += [('stage_peak_memory_bytes', {'endpoint': endpoint, 'stage': name}, h)
+                       for endpoint, stages in self.stages.items() for name, h in stages.items()]
+            for metric, labels, h in series:
+                label_text = ",".join(f'{key}="{value}"' for key, value in labels.items())
+                cumulative = 0
+                for bound, count in zip(list(PEAK_BUCKETS_MB) + [None], h.buckets):
+                    cumulative += count
+                    le = '+Inf' if bound is None else str(bound * 1024 * 1024)
+                    lines.append(f'{metric}_bucket{{{label_text},le="{le}"}} {cumulative}')
+                lines.append(f'{metric}_sum{{{label_text}}} {h.sum}')
+                lines.append(f'{metric}_count{{{label_text}}} {h.count}')
+        return "\n".join(lines) + "\n"
+
+
+def init_memory_tracking(app: Flask) -> Optional[MemoryMetrics]:
+    """
+    Opt-in memory accounting (MEMORY_TRACKING=1), to be called after init_tracing().
+
+    tracemalloc records the peak allocation of every request and of each traced stage
+    (parse_*, anonymize, llm_payload, llm, render_docx, render_pdf...). The peaks are
+    added to the trace log line, requests or stages above MEMORY_LOG_THRESHOLD_MB log
+    their top allocation sites, and GET /api/metrics/memory serves the per-endpoint
+    histograms (?format=prometheus for the text exposition).
+
+    tracemalloc slows allocations down and its peak is process-wide: run a worker with
+    WEB_THREADS=1 for exact figures (requests that overlapped others are counted).
+    """
+    if not app.config.get('MEMORY_TRACKING'):
+        return None
+
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(app.config.get('MEMORY_TRACE_FRAMES', 1))
+    log_threshold = app.config.get('MEMORY_LOG_THRESHOLD_MB', 50) * 1024 * 1024
+    top_sites = app.config.get('MEMORY_TOP_SITES', 10)
+    metrics = MemoryMetrics()
+    app.extensions['memory_metrics'] = metrics
+
+    active = set()
+    active_lock = threading.Lock()
+
+    @app.before_request
+    def start_memory():
+        trace = current_trace()
+        if trace is None or request.endpoint == 'memory_metrics':
+            return
+        trace.memory = g.request_memory = RequestMemory(log_threshold, top_sites)
+        with active_lock:
+            for memory in active:
+                memory.overlapped = True
+            trace.memory.overlapped = bool(active)
+            active.add(trace.memory)
+
+    @app.after_request
+    def finish_memory(response):
+        memory = g.pop('request_memory', None)
+        if memory is None:
+            return response
+        with active_lock:
+            active.discard(memory)
+        peak = memory.finish()
+        metrics.observe(request.endpoint or request.path, memory)
+        if peak >= log_threshold:
+            log_top_sites(f"request {request.endpoint}", peak, top_sites)
+        response.headers['X-Memory-Peak'] = str(peak)
+        return response
+
+    def memory_metrics():
+        if request.args.get('format') == 'prometheus':
+            return Response(metrics.to_prometheus(), mimetype='text/plain; version=0.0.4')
+        return jsonify(metrics.to_dict())
+
+    app.add_url_rule('/api/metrics/memory', 'memory_metrics', memory_metrics, methods=['GET'])
+    return metrics
@@ -1,10 +1,11 @@
-from docx import Document
-from bs4 import BeautifulSoup
-from PyPDF2 import PdfReader
 import io
 from werkzeug.datastructures import FileStorage
 
 from llm.gemini_client import ImageExtractionClient
+from services.tracing import traced
+from services.upload import open_buffer, shared_buffer
+
+# python-docx, PyPDF2 and BeautifulSoup are imported by the parse methods that need them
 
 
 class FileParser:
@@ -21,6 +22,7 @@ class FileParser:
 		self.gemini_client = gemini_client
 		
 
+	@traced('parse_docx')
 	def parse_docx(self, file_input):
 		"""
 		Parse a DOCX file and return cleaned text content.
@@ -31,11 +33,12 @@ class FileParser:
 		Returns:
 			str: Cleaned text content from the DOCX file
 		"""
+		from docx import Document
+
 		try:
-			# Handle FileStorage object - read content into memory
+			# Handle FileStorage object - read from the shared upload buffer
 			if isinstance(file_input, FileStorage):
-				file_input.stream.seek(0)
-				doc = Document(file_input.stream)
+				doc = Document(open_buffer(file_input))
 
 			else: # local docx file
 				doc = Document(file_input)
@@ -68,6 +71,7 @@ class FileParser:
 			print(f"Error parsing DOCX file {name}: {str(e)}")
 			return ""
 		
+	@traced('parse_pdf')
 	def parse_pdf(self, file_input):
 		"""
 		Parse a PDF file and return cleaned text content.
@@ -78,9 +82,10 @@ class FileParser:
 		Returns:
 			str: Cleaned text content from the PDF file
 		"""
+		from PyPDF2 import PdfReader
+
 		try:
-			file_input.seek(0)  # Ensure we're at the beginning
-			reader = PdfReader(file_input)
+			reader = PdfReader(open_buffer(file_input))
 			
 			text_content = []
 			
@@ -95,6 +100,7 @@ class FileParser:
 			print(f"Error parsing PDF file {file_input.filename}: {str(e)}")
 			return ""
 	
+	@traced('parse_html')
 	def parse_html(self, file_input):
 		"""
 		Parse an HTML file and return cleaned text content.
@@ -105,9 +111,10 @@ class FileParser:
 		Returns:
 			str: Cleaned text content from the HTML file
 		"""
+		from bs4 import BeautifulSoup
+
 		try:
-			file_input.seek(0)  # Ensure we're at the beginning
-			html_content = file_input.read().decode('utf-8')
+			html_content = self.read_text(file_input)
 
 			soup = BeautifulSoup(html_content, "html.parser")
 			raw_text = soup.get_text(separator=" ", strip=True)
@@ -117,6 +124,20 @@ class FileParser:
 			print(f"Error parsing HTML file {file_input.filename}: {str(e)}")
 			return ""
 	
+	@traced('read_text')
+	def read_text(self, file_input):
+		"""
+		Decode a text file (raw HTML) from the shared upload buffer, without re-reading the stream.
+		
+		Args:
+			file_input (FileStorage): FileStorage object
+			
+		Returns:
+			str: UTF-8 decoded content
+		"""
+		return str(shared_buffer(file_input), 'utf-8')
+	
+	@traced('parse_image')
 	def parse_image(self, file_input):
 		"""
 		Extract text from an image using Google Gemini Vision API and return cleaned text.
@@ -133,6 +154,11 @@ class FileParser:
 				print("Please provide a gemini_client when initializing FileParser")
 				return ""
 			
+			# Hand the client a reader over the shared buffer rather than the upload stream
+			if isinstance(file_input, FileStorage):
+				file_input = FileStorage(stream=open_buffer(file_input),
+										 filename=file_input.filename,
+										 content_type=file_input.content_type)
 			raw_text = self.gemini_client.extract(file_input)
 			
 			return raw_text.strip()
@@ -0,0 +1,175 @@
+import cProfile
+import hmac
+import io
+import json
+import os
+import pstats
+import random
+import threading
+import time
+import uuid
+
+from flask import Flask, abort, g, jsonify, request, send_file
+
+from services.tracing import current_trace
+
+
+PROFILE_HEADER = 'X-Profile'
+
+# One cProfile at a time per process (Python 3.12+ refuses a second active profiler):
+# a request arriving while another one is profiled runs unprofiled
+_profiler_lock = threading.Lock()
+
+
+def _top_functions(profiler: cProfile.Profile, limit: int = 15) -> list:
+    """Functions with the highest cumulative time, for the profile index."""
+    stats = pstats.Stats(profiler, stream=io.StringIO())
+    rows = []
+    for (filename, line, name), (_, calls, _, cumulative, _) in stats.stats.items():
+        rows.append({'function': f"{os.path.basename(filename)}:{line}({name})",
+                     'calls': calls, 'cumulative_ms': round(cumulative * 1000, 2)})
+    rows.sort(key=lambda row: row['cumulative_ms'], reverse=True)
+    return rows[:limit]
+
+
+def init_profiling(app: Flask):
+    """
+    Opt-in per-request profiling (PROFILING=1). A request is profiled with cProfile
+    when it sends the X-Profile: 1 header, or at random with PROFILE_SAMPLE_RATE.
+    Each profile is written to PROFILE_DIR as <id>.prof (pstats / snakeviz) with a
+    <id>.json summary (endpoint, status, stage timings, top functions).
+
+    Only one request per process is profiled at a time; the others run normally
+    (X-Profile-Skipped: busy). Streaming responses (NDJSON, SSE) are profiled up to
+    the moment the response is returned, not while the body is generated: their
+    summary is marked 'streamed'.
+
+    The profiles are listed by GET /api/profiles and downloaded from
+    /api/profiles/<id>, registered only in debug mode or with PROFILE_ROUTES=1, and
+    then protected by PROFILE_TOKEN when set (Authorization: Bearer <token>).
+
+    Nothing is registered when profiling is disabled: no per-request cost at all.
+    """
+    if not app.config.get('PROFILING'):
+        return
+
+    directory = app.config.get('PROFILE_DIR', 'profiles')
+    sample_rate = app.config.get('PROFILE_SAMPLE_RATE', 0.0)
+    keep = app.config.get('PROFILE_KEEP', 200)
+    token = app.config.get('PROFILE_TOKEN')
+    os.makedirs(directory, exist_ok=True)
+
+    @app.before_request
+    def start_profile():
+        if request.endpoint in ('static', 'list_profiles', 'get_profile'):
+            return
+        if request.headers.get(PROFILE_HEADER) != '1' and not (sample_rate and random.random() < sample_rate):
+            return
+        if not _profiler_lock.acquire(blocking=False):
+            g.profile_skipped = True
+            return
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:  # another profiling tool (debugger, coverage) is active
+            _profiler_lock.release()
+            g.profile_skipped = True
+            return
+        g.profiler = profiler
+        g.profile_start = time.perf_counter()
+
+    def release_profiler():
+        profiler = g.pop('profiler', None)
+        if profiler is not None:
+            profiler.disable()
+            _profiler_lock.release()
+        return profiler
+
+    @app.teardown_request
+    def abort_profile(exc):
+        release_profiler()  # unhandled error: after_request did not run
+
+    @app.after_request
+    def stop_profile(response):
+        if g.pop('profile_skipped', False):
+            response.headers['X-Profile-Skipped'] = 'busy'
+            return response
+        profiler = release_profiler()
+        if profiler is None:
+            return response
+
+        profile_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        trace = current_trace()
+        summary = {
+            'id': profile_id,
+            'endpoint': request.endpoint,
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'timestamp': time.time(),
+            'total_ms': round((time.perf_counter() - g.pop('profile_start')) * 1000, 2),
+            'stages': {name: round(total['dur_ms'], 2) for name, total in trace.totals().items()} if trace else {},
+            'trigger': 'header' if request.headers.get(PROFILE_HEADER) == '1' else 'sample',
+            'streamed': response.is_streamed,  # body generated after the profile stopped
+            'top_functions': _top_functions(profiler),
+        }
+        try:
+            profiler.dump_stats(os.path.join(directory, profile_id + '.prof'))
+            with open(os.path.join(directory, profile_id + '.json'), 'w', encoding='utf-8') as f:
+                json.dump(summary, f, ensure_ascii=False)
+            _prune(directory, keep)
+        except OSError as e:
+            print(f"Profile not written: {str(e)}")
+            return response
+
+        response.headers['X-Profile-Id'] = profile_id
+        return response
+
+    def check_token():
+        if token and not hmac.compare_digest(request.headers.get('Authorization', ''), f"Bearer {token}"):
+            abort(401)
+
+    def list_profiles():
+        """Most recent profiles first (all workers write to the same directory)."""
+        check_token()
+        limit = request.args.get('limit', 50, type=int)
+        summaries = []
+        for name in sorted((n for n in os.listdir(directory) if n.endswith('.json')), reverse=True)[:limit]:
+            try:
+                with open(os.path.join(directory, name), 'r', encoding='utf-8') as f:
+                    summary = json.load(f)
+            except (OSError, ValueError):
+                continue
+            summary.pop('top_functions', None)
+            summary['download_url'] = f"/api/profiles/{summary['id']}"
+            summaries.append(summary)
+        return jsonify({'profiles': summaries})
+
+    def get_profile(profile_id):
+        """The .prof file (?format=json: the summary with the top functions)."""
+        check_token()
+        if not all(c.isalnum() or c == '-' for c in profile_id):
+            abort(404)
+        extension = '.json' if request.args.get('format') == 'json' else '.prof'
+        path = os.path.abspath(os.path.join(directory, profile_id + extension))
+        if not os.path.isfile(path):
+            abort(404)
+        if extension == '.json':
+            return send_file(path, mimetype='application/json')
+        return send_file(path, as_attachment=True, download_name=profile_id + '.prof',
+                         mimetype='application/octet-stream')
+
+    if not (app.debug or app.config.get('PROFILE_ROUTES')):
+        return  # profiles only on disk (PROFILE_DIR)
+
+    app.add_url_rule('/api/profiles', 'list_profiles', list_profiles, methods=['GET'])
+    app.add_url_rule('/api/profiles/<profile_id>', 'get_profile', get_profile, methods=['GET'])
+
+
+def _prune(directory: str, keep: int):
+    """Keep only the `keep` most recent profiles."""
+    summaries = sorted((n for n in os.listdir(directory) if n.endswith('.json')), reverse=True)
+    for name in summaries[keep:]:
+        for path in (name, name[:-len('.json')] + '.prof'):
+            try: os.remove(os.path.join(directory, path))
+            except OSError: pass
@@ -0,0 +1,79 @@
+import threading
+import time
+import traceback
+from typing import Callable, Dict, Iterable, Optional
+
+
+class ServiceRegistry:
+    """
+    Services built on first use instead of at import / startup.
+
+    Factories are registered by name (cheap) and each service is built once, the
+    first time it is accessed (`registry.extractor` or `registry.get('extractor')`),
+    so a worker only pays for the subsystems its requests actually use. Deployments
+    preferring eager loading call `warm_up()` (e.g. before a gunicorn fork).
+    """
+
+    def __init__(self):
+        self._factories: Dict[str, Callable[[], object]] = {}
+        self._instances: Dict[str, object] = {}
+        self._lock = threading.RLock()  # factories may use other services
+        self.build_times: Dict[str, float] = {}
+
+    def register(self, name: str, factory: Callable[[], object]):
+        self._factories[name] = factory
+
+    def get(self, name: str):
+        """
+        The service, built on first access.
+
+        A factory that fails is logged and the service is reported unavailable (None),
+        like a failed startup used to; the build is attempted again on the next access.
+        """
+        try:
+            return self._instances[name]
+        except KeyError:
+            pass
+        with self._lock:
+            if name not in self._instances:
+                if name not in self._factories:
+                    raise KeyError(f"Unknown service: {name}")
+                start = time.perf_counter()
+                try:
+                    self._instances[name] = self._factories[name]()
+                except Exception as e:
+                    print(f"❌ CRITICAL ERROR: service {name} unavailable: {str(e)}")
+                    traceback.print_exc()
+                    return None
+                self.build_times[name] = round((time.perf_counter() - start) * 1000, 1)
+                print(f"⚙️ Service {name} built in {self.build_times[name]} ms")
+            return self._instances[name]
+
+    def __getattr__(self, name: str):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        try:
+            return self.get(name)
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def is_built(self, name: str) -> bool:
+        return name in self._instances
+
+    def built(self, name: str) -> Optional[object]:
+        """The service if it was already built, None otherwise (never builds it)."""
+        return self._instances.get(name)
+
+    def warm_up(self, names: Optional[Iterable[str]] = None) -> Dict[str, float]:
+        """
+        Build services now rather than on first use.
+
+        Args:
+            names (Iterable[str], optional): Services to build (all registered ones by default).
+
+        Returns:
+            Dict[str, float]: Build time (ms) of each service.
+        """
+        for name in (names or list(self._factories)):
+            self.get(name)
+        return dict(self.build_times)
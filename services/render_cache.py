@@ -0,0 +1,95 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+from typing import Optional
+
+
+class RenderCache:
+    """
+    On-disk store of rendered files (converted PDFs, ZIPs of PDFs) keyed by a hash of
+    their input and render options.
+
+    Entries are shared by every worker process using the same directory. Hits refresh
+    the entry's mtime, which is the LRU order used to evict entries once the store
+    grows over `max_bytes`. Writes are atomic (temporary file + rename).
+    """
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def key_for(content_hash: str, **options) -> str:
+        """Cache key of an input (hash of its content) rendered with the given options."""
+        payload = json.dumps(options, sort_keys=True)
+        return hashlib.sha256(f"{content_hash}\n{payload}".encode('utf-8')).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key)
+
+    def fetch(self, key: str, destination: str) -> Optional[dict]:
+        """
+        Put the cached file at `destination` (hard link, copy across file systems).
+
+        Returns:
+            Optional[dict]: Metadata stored with the entry, or None on a miss.
+        """
+        path = self._path(key)
+        try:
+            with open(path + '.json', 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            tmp = destination + '.link'
+            try:
+                os.link(path, tmp)
+            except OSError:
+                shutil.copyfile(path, tmp)
+            os.replace(tmp, destination)
+            os.utime(path)
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return meta
+
+    def store(self, key: str, source: str, meta: Optional[dict] = None):
+        """Copy a freshly rendered file into the cache, then evict the least recently used entries."""
+        if os.path.getsize(source) > self.max_bytes:
+            return
+        try:
+            fd, tmp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            os.close(fd)
+            shutil.copyfile(source, tmp)
+            with open(tmp + '.json', 'w', encoding='utf-8') as f:
+                json.dump(meta or {}, f, ensure_ascii=False)
+            # Metadata first: an entry is only visible once its file is in place
+            os.replace(tmp + '.json', self._path(key) + '.json')
+            os.replace(tmp, self._path(key))
+        except OSError as e:
+            print(f"PDF not cached: {str(e)}")
+            return
+        self._evict()
+
+    def _evict(self):
+        with self._lock:
+            entries = []
+            for entry in os.scandir(self.directory):
+                if entry.name.endswith(('.json', '.tmp')) or not entry.is_file():
+                    continue
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                for stale in (path, path + '.json'):
+                    try: os.remove(stale)
+                    except OSError: pass
+                total -= size
@@ -0,0 +1,276 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from contextlib import closing
+from typing import Dict, List, Optional, Tuple
+
+from llm.prompt_manager import CommercialComparisonPrompt
+
+
+BLANK_LINE_PATTERN = re.compile(r'\n\s*\n')
+WORD_PATTERN = re.compile(r'\w+')
+
+MIN_BLOCK_CHARS = 300  # paragraphs are grouped up to this size (one Gemini call per block pair)
+MIN_SIMILARITY = 0.1  # word overlap below which a copy block and a design block are not paired
+
+COMMERCIAL_CHECKS = ('pricing_accuracy', 'promotional_offers', 'legal_disclaimers')
+
+
+def split_blocks(text: str, min_chars: int = MIN_BLOCK_CHARS) -> List[str]:
+    """
+    Blocks of a document: paragraphs (separated by blank lines, or lines when the
+    extracted text has none), consecutive short ones grouped up to `min_chars` so a
+    title stays with its paragraph.
+    """
+    paragraphs = [p.strip() for p in BLANK_LINE_PATTERN.split(text.strip())]
+    if len(paragraphs) == 1:
+        paragraphs = [line.strip() for line in text.splitlines()]
+
+    blocks, current = [], []
+    for paragraph in filter(None, paragraphs):
+        current.append(paragraph)
+        if sum(len(p) for p in current) >= min_chars:
+            blocks.append("\n\n".join(current))
+            current = []
+    if current:
+        blocks.append("\n\n".join(current))
+    return blocks
+
+
+def _similarity(words1: set, words2: set) -> float:
+    if not words1 or not words2:
+        return 0.0
+    return len(words1 & words2) / len(words1 | words2)
+
+
+def pair_blocks(copy_blocks: List[str], design_blocks: List[str],
+                min_similarity: float = MIN_SIMILARITY) -> List[Tuple[str, str]]:
+    """
+    Pair each copy block with the design content implementing it.
+
+    Blocks are aligned in order, maximizing the word overlap of the pairs (like a diff,
+    so inserting or editing one block does not shift the others). Blocks left unpaired
+    on either side join the preceding pair (the next one at the start of the document):
+    a copy section split in several design blocks, or several copy blocks (a headline
+    and its body) in one design block, are compared together. Content missing from the
+    design is thus reported against the design content around it, like the whole
+    document comparison does, rather than against an empty design.
+
+    Returns:
+        List[Tuple[str, str]]: (copy blocks, design blocks) pairs in document order.
+    """
+    copy_words = [set(WORD_PATTERN.findall(block.lower())) for block in copy_blocks]
+    design_words = [set(WORD_PATTERN.findall(block.lower())) for block in design_blocks]
+    n, m = len(copy_blocks), len(design_blocks)
+
+    # score[i][j]: best alignment of copy_blocks[:i] and design_blocks[:j]
+    score = [[0.0] * (m + 1) for _ in range(n + 1)]
+    for i in range(1, n + 1):
+        for j in range(1, m + 1):
+            best = max(score[i - 1][j], score[i][j - 1])
+            similarity = _similarity(copy_words[i - 1], design_words[j - 1])
+            if similarity >= min_similarity:
+                best = max(best, score[i - 1][j - 1] + similarity)
+            score[i][j] = best
+
+    matches = {}  # copy index -> design index
+    i, j = n, m
+    while i and j:
+        similarity = _similarity(copy_words[i - 1], design_words[j - 1])
+        if similarity >= min_similarity and score[i][j] == score[i - 1][j - 1] + similarity:
+            matches[i - 1] = j - 1
+            i, j = i - 1, j - 1
+        elif score[i][j] == score[i - 1][j]:
+            i -= 1
+        else:
+            j -= 1
+
+    if not matches:
+        return [("\n\n".join(copy_blocks), "\n\n".join(design_blocks))]
+
+    # Blocks of each pair: the matched ones and the unpaired ones up to the next match
+    matched = sorted(matches.items())
+    pairs = []
+    for position, (copy_index, design_index) in enumerate(matched):
+        first = position == 0
+        last = position + 1 == len(matched)
+        copy_end, design_end = (n, m) if last else matched[position + 1]
+        pairs.append((
+            "\n\n".join(copy_blocks[0 if first else copy_index:copy_end]),
+            "\n\n".join(design_blocks[0 if first else design_index:design_end]),
+        ))
+    return pairs
+
+
+def pair_key(copy_block: str, design_block: str, salt: str = "") -> str:
+    """SHA-256 of a block pair (and of the prompt / model it was validated with)."""
+    digest = hashlib.sha256(salt.encode())
+    for block in (copy_block, design_block):
+        digest.update(b'\x00' + block.encode())
+    return digest.hexdigest()
+
+
+def _status_ranks() -> Dict[str, Dict[str, int]]:
+    """Severity of each commercial check status, from the schema enums (valid first)."""
+    checks = CommercialComparisonPrompt().get_schema()['properties']['commercial_validation']['properties']
+    return {name: {status: rank for rank, status in enumerate(checks[name]['properties']['status']['enum'])}
+            for name in COMMERCIAL_CHECKS}
+
+
+STATUS_RANKS = _status_ranks()
+
+
+def merge_reports(reports: List[Tuple[dict, int]]) -> dict:
+    """
+    One CommercialComparisonPrompt report from the reports of the block pairs.
+
+    Content blocks are concatenated in document order, each commercial check keeps the
+    worst status of the blocks and all their findings, and the similarity score is the
+    mean of the block scores weighted by the size of the blocks.
+
+    Args:
+        reports (List[Tuple[dict, int]]): (report, weight) of each block pair, in order.
+    """
+    content_blocks = []
+    checks = {name: {'status': None, 'findings': []} for name in COMMERCIAL_CHECKS}
+    weighted_score, total_weight = 0.0, 0
+
+    for report, weight in reports:
+        content_blocks.extend(report.get('content_blocks') or [])
+
+        for name, check in (report.get('commercial_validation') or {}).items():
+            if name not in checks or not isinstance(check, dict):
+                continue
+            merged = checks[name]
+            ranks = STATUS_RANKS[name]
+            status = check.get('status')
+            if status in ranks and (merged['status'] is None or ranks[status] > ranks[merged['status']]):
+                merged['status'] = status
+            for finding in check.get('findings') or []:
+                if finding not in merged['findings']:
+                    merged['findings'].append(finding)
+
+        score = report.get('similarity_score')
+        if isinstance(score, (int, float)):
+            weighted_score += score * weight
+            total_weight += weight
+
+    for name, merged in checks.items():
+        if merged['status'] is None:
+            merged['status'] = next(iter(STATUS_RANKS[name]))  # nothing reported: valid
+
+    return {
+        'content_blocks': content_blocks,
+        'commercial_validation': checks,
+        'similarity_score': round(weighted_score / total_weight) if total_weight else 0,
+    }
+
+
+class RevalidationStore:
+    """
+    Block-level comparison results of the last revision of each campaign.
+
+    Results are stored anonymized (placeholders are deterministic, so an unchanged
+    block has the same anonymized text in every revision) and keyed by the content
+    hash of the block pair. Saving a revision replaces the campaign's results, so the
+    store only holds what the next revision can reuse. Campaigns expire `ttl` seconds
+    after their last revision.
+
+    Kept in memory by default; with `db_path` the results live in SQLite, shared by
+    every worker process and kept across restarts.
+    """
+
+    def __init__(self, ttl: int = 30 * 24 * 3600, db_path: Optional[str] = None):
+        self.ttl = ttl
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._memory: Dict[str, tuple] = {}  # campaign -> (expires_at, {pair key: report})
+        self._last_sweep = time.time()
+
+        if db_path:
+            os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+            with closing(self._connect()) as conn:
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS block_results (
+                        campaign TEXT NOT NULL,
+                        pair_key TEXT NOT NULL,
+                        report TEXT NOT NULL,
+                        expires_at REAL NOT NULL,
+                        PRIMARY KEY (campaign, pair_key)
+                    )
+                """)
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+
+    def get_many(self, campaign: str, keys: List[str]) -> Dict[str, dict]:
+        """Stored reports of the block pairs of a campaign (the unknown keys are left out)."""
+        now = time.time()
+
+        if not self.db_path:
+            with self._lock:
+                entry = self._memory.get(campaign)
+                if entry is None or entry[0] < now:
+                    return {}
+                return {key: entry[1][key] for key in keys if key in entry[1]}
+
+        found = {}
+        with closing(self._connect()) as conn:
+            for start in range(0, len(keys), 500):  # SQLite host parameter limit
+                chunk = keys[start:start + 500]
+                rows = conn.execute(
+                    f"SELECT pair_key, report FROM block_results WHERE campaign = ? AND expires_at >= ? "
+                    f"AND pair_key IN ({', '.join('?' * len(chunk))})",
+                    (campaign, now, *chunk)
+                ).fetchall()
+                found.update((key, json.loads(report)) for key, report in rows)
+        return found
+
+    def replace(self, campaign: str, results: Dict[str, dict]):
+        """Store the block results of a campaign's new revision (the previous ones are dropped)."""
+        now = time.time()
+        self._sweep(now)
+
+        if not self.db_path:
+            with self._lock:
+                self._memory[campaign] = (now + self.ttl, dict(results))
+            return
+
+        with closing(self._connect()) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute("DELETE FROM block_results WHERE campaign = ?", (campaign,))
+                conn.executemany(
+                    "INSERT INTO block_results (campaign, pair_key, report, expires_at) VALUES (?, ?, ?, ?)",
+                    [(campaign, key, json.dumps(report, ensure_ascii=False), now + self.ttl)
+                     for key, report in results.items()]
+                )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+    def delete(self, campaign: str):
+        if not self.db_path:
+            with self._lock:
+                self._memory.pop(campaign, None)
+            return
+        with closing(self._connect()) as conn:
+            conn.execute("DELETE FROM block_results WHERE campaign = ?", (campaign,))
+
+    def _sweep(self, now: float):
+        """Drop the expired campaigns (at most once a minute)."""
+        if now - self._last_sweep < 60:
+            return
+        self._last_sweep = now
+        if not self.db_path:
+            with self._lock:
+                for campaign in [c for c, (expires_at, _) in self._memory.items() if expires_at < now]:
+                    del self._memory[campaign]
+            return
+        with closing(self._connect()) as conn:
+            conn.execute("DELETE FROM block_results WHERE expires_at < ?", (now,))
@@ -0,0 +1,179 @@
+import contextvars
+import functools
+import inspect
+import json
+import threading
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+from flask import Flask, g, request
+
+
+_current_trace: contextvars.ContextVar = contextvars.ContextVar('trace', default=None)
+_span_stack: contextvars.ContextVar = contextvars.ContextVar('span_stack', default=())  # open spans of this context
+
+
+class Trace:
+    """Spans recorded during one request (name, start offset and duration in ms)."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.start = time.perf_counter()
+        self.wall_start = time.time()
+        self.spans = []
+        self.memory = None  # RequestMemory when memory tracking is enabled (services.memory)
+        self._lock = threading.Lock()
+
+    def add(self, name: str, start: float, duration: float, attrs: dict):
+        with self._lock:
+            self.spans.append({
+                'name': name,
+                'start_ms': round((start - self.start) * 1000, 2),
+                'dur_ms': round(duration * 1000, 2),
+                **attrs
+            })
+
+    def totals(self) -> dict:
+        """Total duration and count of the spans, by name."""
+        totals = {}
+        for s in self.spans:
+            total = totals.setdefault(s['name'], {'dur_ms': 0.0, 'count': 0})
+            total['dur_ms'] += s['dur_ms']
+            total['count'] += 1
+        return totals
+
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+
+def submit_in_context(pool, fn, *args, **kwargs):
+    """
+    pool.submit running `fn` in a copy of the caller's context: its spans reach the
+    request's trace (and its Gemini calls keep the request's priority class). Each
+    submission gets its own copy, so the tasks can run concurrently.
+    """
+    return pool.submit(contextvars.copy_context().run, fn, *args, **kwargs)
+
+
+@contextmanager
+def span(name: str, **attrs):
+    """
+    Time a stage of the current request. No-op outside a traced request, and nested
+    spans with the same name (recursive calls) are only recorded once. The open spans
+    are tracked per context, so spans of pool threads (see submit_in_context) running
+    concurrently are all recorded.
+    """
+    trace = _current_trace.get()
+    stack = _span_stack.get()
+    if trace is None or (stack and stack[-1] == name):
+        yield
+        return
+
+    memory = trace.memory
+    token = _span_stack.set(stack + (name,))
+    frame = memory.enter() if memory is not None else None
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        duration = time.perf_counter() - start
+        try:
+            _span_stack.reset(token)
+        except ValueError:  # generator resumed in another context
+            _span_stack.set(stack)
+        if memory is not None:
+            attrs = {**attrs, 'peak_kb': round(memory.exit(name, frame) / 1024, 1)}
+        trace.add(name, start, duration, attrs)
+
+
+def traced(name: str):
+    """Decorator recording each call of a function (sync or async) as a span."""
+    def decorator(fn):
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with span(name):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if _current_trace.get() is None:
+                return fn(*args, **kwargs)
+            with span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class TraceFileExporter:
+    """Append one JSON line per traced request to a local file, for offline analysis."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def export(self, record: dict):
+        line = json.dumps(record, ensure_ascii=False)
+        with self._lock, open(self.path, 'a', encoding='utf-8') as f:
+            f.write(line + "\n")
+
+
+def server_timing_header(trace: Trace, total_ms: float) -> str:
+    metrics = []
+    for name, total in trace.totals().items():
+        desc = f';desc="x{total["count"]}"' if total['count'] > 1 else ''
+        metrics.append(f"{name}{desc};dur={total['dur_ms']:.1f}")
+    metrics.append(f"total;dur={total_ms:.1f}")
+    return ", ".join(metrics)
+
+
+def init_tracing(app: Flask):
+    """
+    Trace every API request: stage timings are sent back as a Server-Timing header,
+    printed as one structured (JSON) log line (TRACE_LOG) and optionally appended to
+    a local trace file (TRACE_FILE).
+    """
+    exporter = TraceFileExporter(app.config['TRACE_FILE']) if app.config.get('TRACE_FILE') else None
+    log_enabled = app.config.get('TRACE_LOG', True)
+
+    @app.before_request
+    def start_trace():
+        if request.endpoint == 'static':
+            return
+        g.trace_token = _current_trace.set(Trace(request.endpoint or request.path))
+
+    @app.after_request
+    def finish_trace(response):
+        trace = _current_trace.get()
+        if trace is None:
+            return response
+
+        total_ms = (time.perf_counter() - trace.start) * 1000
+        response.headers['Server-Timing'] = server_timing_header(trace, total_ms)
+
+        record = {
+            'event': 'request_trace',
+            'endpoint': trace.name,
+            'method': request.method,
+            'status': response.status_code,
+            'timestamp': trace.wall_start,
+            'total_ms': round(total_ms, 2),
+            'stages': {name: round(total['dur_ms'], 2) for name, total in trace.totals().items()},
+        }
+        if trace.memory is not None and trace.memory.peak is not None:
+            record['peak_kb'] = round(trace.memory.peak / 1024, 1)
+            record['stage_peaks_kb'] = {name: round(peak / 1024, 1) for name, peak in trace.memory.stages.items()}
+        if log_enabled:
+            print(json.dumps(record, ensure_ascii=False), flush=True)
+        if exporter is not None:
+            exporter.export({**record, 'spans': trace.spans})
+        return response
+
+    @app.teardown_request
+    def reset_trace(exc):
+        token = g.pop('trace_token', None)
+        if token is not None:
+            _current_trace.reset(token)
@@ -0,0 +1,182 @@
+import io
+import mmap
+import os
+from tempfile import SpooledTemporaryFile
+from typing import Optional
+
+from flask import Request, current_app
+from werkzeug.exceptions import RequestEntityTooLarge, UnsupportedMediaType
+
+
+# Magic bytes expected at the start of each declared content type
+SIGNATURES = {
+    'application/pdf': (b'%PDF',),
+    'image/png': (b'\x89PNG\r\n\x1a\n',),
+    'image/jpeg': (b'\xff\xd8\xff',),
+    'image/jpg': (b'\xff\xd8\xff',),
+    'application/vnd.openxmlformats-officedocument.wordprocessingml.document': (b'PK\x03\x04',),
+    'application/zip': (b'PK\x03\x04', b'PK\x05\x06'),
+}
+HTML_TYPES = {'text/html', 'application/html'}
+
+# Binary formats refused when declared as HTML (HTML itself may start with anything:
+# a BOM, a comment, a doctype or plain text)
+BINARY_SIGNATURES = tuple({signature for signatures in SIGNATURES.values() for signature in signatures})
+
+SNIFF_SIZE = 16
+
+
+def signature_error(content_type: Optional[str], head: bytes) -> Optional[str]:
+    """
+    Check the first bytes of a file against its declared content type.
+
+    Returns:
+        Optional[str]: Error message, or None when the content matches (or the type is not checked).
+    """
+    if content_type in SIGNATURES:
+        if not head.startswith(SIGNATURES[content_type]):
+            return f'File content does not match its type {content_type}'
+    elif content_type in HTML_TYPES:
+        if head.startswith(BINARY_SIGNATURES):
+            return f'File content does not match its type {content_type}'
+    return None
+
+
+def has_valid_signature(file) -> bool:
+    """Peek at the first bytes of a FileStorage and check them against its content type."""
+    head = bytes(shared_buffer(file)[:SNIFF_SIZE])
+    return signature_error(file.content_type, head) is None
+
+
+class UploadSpool(SpooledTemporaryFile):
+    """
+    Upload stream kept in memory up to a threshold and spooled to disk above it.
+
+    The multipart parser writes into it chunk by chunk, so oversized files and
+    payloads whose magic bytes do not match the declared type are rejected as soon
+    as they are detected, before the whole upload is buffered.
+    """
+
+    def __init__(self, content_type: Optional[str], max_size: int, max_file_size: int, dir: Optional[str] = None):
+        super().__init__(max_size=max_size, mode='w+b', dir=dir)
+        self.content_type = content_type
+        self.max_file_size = max_file_size
+        self.rolled = False  # True once the content moved to a file on disk
+        self._written = 0
+        self._head = b''
+
+    def rollover(self):
+        super().rollover()
+        self.rolled = True
+
+    def write(self, data) -> int:
+        self._written += len(data)
+        if self._written > self.max_file_size:
+            raise RequestEntityTooLarge(f'File exceeds the maximum size of {self.max_file_size} bytes')
+
+        if len(self._head) < SNIFF_SIZE:
+            self._head += bytes(data[:SNIFF_SIZE - len(self._head)])
+            if len(self._head) >= SNIFF_SIZE:
+                error = signature_error(self.content_type, self._head)
+                if error:
+                    raise UnsupportedMediaType(error)
+
+        return super().write(data)
+
+
+class UploadRequest(Request):
+    """Flask request whose file uploads go through UploadSpool (see config.py UPLOAD_*)."""
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        config = current_app.config
+        max_file_size = config.get('UPLOAD_MAX_FILE_SIZE') or config.get('MAX_CONTENT_LENGTH') or float('inf')
+
+        # Rejected from the part headers when the client announces the size
+        if content_length and content_length > max_file_size:
+            raise RequestEntityTooLarge(f'File exceeds the maximum size of {max_file_size} bytes')
+
+        return UploadSpool(
+            content_type,
+            max_size=config.get('UPLOAD_SPOOL_THRESHOLD', 1024 * 1024),
+            max_file_size=max_file_size,
+            dir=config.get('UPLOAD_SPOOL_DIR')
+        )
+
+
+class BufferReader(io.RawIOBase):
+    """Read-only seekable file object over a shared buffer, with its own position."""
+
+    def __init__(self, view: memoryview, name: Optional[str] = None):
+        self._view = view
+        self._pos = 0
+        self.name = name
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._pos
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_SET:
+            self._pos = offset
+        elif whence == io.SEEK_CUR:
+            self._pos += offset
+        else:
+            self._pos = len(self._view) + offset
+        self._pos = max(self._pos, 0)
+        return self._pos
+
+    def read(self, size: int = -1) -> bytes:
+        end = len(self._view) if size is None or size < 0 else min(self._pos + size, len(self._view))
+        data = bytes(self._view[self._pos:end])
+        self._pos = max(self._pos, end)
+        return data
+
+    def readinto(self, buffer) -> int:
+        data = self.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+
+def shared_buffer(file) -> memoryview:
+    """
+    Read-only view of an uploaded file's content, created once per FileStorage.
+
+    Files on disk (spooled uploads, job inputs) are memory-mapped; in-memory streams
+    (small uploads, example templates) are read once. Every parser reads the same buffer.
+    """
+    view = getattr(file, '_shared_view', None)
+    if view is not None:
+        return view
+
+    stream = file.stream
+    if isinstance(stream, io.BytesIO):
+        view = memoryview(stream.getvalue())
+    elif isinstance(stream, SpooledTemporaryFile) and not getattr(stream, 'rolled', False):
+        # Still in memory (fileno() would write it to disk), or another spool: read it
+        stream.seek(0)
+        view = memoryview(stream.read())
+        stream.seek(0)  # callers may still save() the upload
+    else:
+        try:
+            if hasattr(stream, 'writable') and stream.writable():
+                stream.flush()
+            fileno = stream.fileno()
+            size = os.fstat(fileno).st_size
+            view = memoryview(mmap.mmap(fileno, 0, access=mmap.ACCESS_READ)) if size else memoryview(b'')
+        except (AttributeError, OSError, io.UnsupportedOperation, ValueError):
+            stream.seek(0)
+            view = memoryview(stream.read())
+            stream.seek(0)
+
+    file._shared_view = view.toreadonly()
+    return file._shared_view
+
+
+def open_buffer(file) -> BufferReader:
+    """New independent reader over the shared buffer of a FileStorage."""
+    return BufferReader(shared_buffer(file), name=file.filename)
@@ -411,16 +411,11 @@ function generateDesignFromCopy(copyText) {
     const selectedTemplate = document.getElementById('designTemplate') ? 
         document.getElementById('designTemplate').value : 'modern';
 
-    fetch('/api/generate_design', {
-        method: 'POST',
-        headers: {
-            'Content-Type': 'application/json',
-        },
-        body: JSON.stringify({
-            copy: copyText,
-            template: selectedTemplate
-        })
-    })
+    const formData = new FormData();
+    formData.append('copy', copyAsFile(copyText));
+    formData.append('template', selectedTemplate);
+
+    runJob('generate_design', formData)
     .then(response => {
         if (!response.ok) {
             throw new Error(`Erreur HTTP! status: ${response.status}`);
@@ -448,6 +443,11 @@ function generateDesignFromCopy(copyText) {
     });
 }
 
+function copyAsFile(copyText) {
+    // L'API attend la copy comme fichier (champ "copy"), comme un upload depuis la page d'accueil
+    return new File([copyText], 'copy.html', { type: 'text/html' });
+}
+
 function displayDesignPreview(htmlContent) {
     const previewSection = document.getElementById('designPreviewSection');
     const previewContent = document.getElementById('designPreviewContent');
@@ -581,17 +581,12 @@ function handleGenerateLanguage(language) {
     
     setDesignLoadingState(true);
     
-    fetch('/api/generate_design', {
-        method: 'POST',
-        headers: {
-            'Content-Type': 'application/json',
-        },
-        body: JSON.stringify({
-            copy: currentCopyText,
-            template: document.getElementById('designTemplate')?.value || 'modern',
-            language: language
-        })
-    })
+    const formData = new FormData();
+    formData.append('copy', copyAsFile(currentCopyText));
+    formData.append('template', document.getElementById('designTemplate')?.value || 'modern');
+    formData.append('language', language);
+
+    runJob('generate_design', formData)
     .then(response => {
         if (!response.ok) {
             throw new Error(`Erreur HTTP! status: ${response.status}`);
@@ -0,0 +1,105 @@
+/**
+ * Background jobs helpers
+ * Submit long-running tasks (LLM generation, comparison, conversion) as jobs,
+ * then poll (or subscribe with Server-Sent Events) until they finish instead of
+ * holding the HTTP connection open for the whole run.
+ */
+
+// ========================================================================
+// JOB SUBMISSION
+// ========================================================================
+
+function submitJob(kind, formData) {
+    return fetch(`/api/jobs/${kind}`, {
+        method: 'POST',
+        body: formData
+    })
+    .then(response => {
+        return response.json().then(data => {
+            if (!response.ok) {
+                throw new Error(data.error || `HTTP error! status: ${response.status}`);
+            }
+            return data;
+        });
+    });
+}
+
+// ========================================================================
+// STATUS: SUBSCRIBE OR POLL
+// ========================================================================
+
+function isJobFinished(status) {
+    return ['succeeded', 'failed', 'cancelled'].includes(status.status);
+}
+
+function subscribeJob(job, onUpdate) {
+    return new Promise((resolve, reject) => {
+        const source = new EventSource(job.events_url);
+
+        source.onmessage = event => {
+            const status = JSON.parse(event.data);
+            if (onUpdate) {
+                onUpdate(status);
+            }
+            if (isJobFinished(status)) {
+                source.close();
+                resolve(status);
+            }
+        };
+
+        source.onerror = () => {
+            // The server ends each stream after a short window: EventSource reconnects
+            if (source.readyState === EventSource.CLOSED) {
+                reject(new Error('Job event stream interrupted'));
+            }
+        };
+    });
+}
+
+function pollJob(job, onUpdate, interval = 1000) {
+    return new Promise((resolve, reject) => {
+        const poll = () => {
+            fetch(job.status_url)
+                .then(response => response.json())
+                .then(status => {
+                    if (onUpdate) {
+                        onUpdate(status);
+                    }
+                    if (isJobFinished(status)) {
+                        resolve(status);
+                    } else {
+                        setTimeout(poll, interval);
+                    }
+                })
+                .catch(reject);
+        };
+        poll();
+    });
+}
+
+function waitForJob(job, onUpdate, { stream = false } = {}) {
+    // Polling by default: each status check is a short request, no server thread
+    // waits on the job. stream=true uses the (time-boxed) event stream instead.
+    if (stream && window.EventSource) {
+        // Fall back on polling if the event stream is cut (proxy, timeout...)
+        return subscribeJob(job, onUpdate).catch(() => pollJob(job, onUpdate));
+    }
+    return pollJob(job, onUpdate);
+}
+
+function cancelJob(job) {
+    return fetch(`${job.status_url}/cancel`, { method: 'POST' });
+}
+
+// ========================================================================
+// SUBMIT AND WAIT
+// ========================================================================
+
+/**
+ * Run a task as a background job and resolve with the fetch Response of its
+ * result, so callers can keep their usual `response.ok` / `response.json()` handling.
+ */
+function runJob(kind, formData, onUpdate) {
+    return submitJob(kind, formData)
+        .then(job => waitForJob(job, onUpdate).then(() => fetch(job.result_url)));
+}
@@ -232,10 +232,7 @@ function generateCopyFromFile(file) {
     const formData = new FormData();
     formData.append('doc1', file);
 
-    fetch('/api/generate_copy', {
-        method: 'POST',
-        body: formData
-    })
+    runJob('generate_copy', formData)
     .then(response => {
         console.log('📡 API Response status:', response.status);
         if (!response.ok) {
@@ -487,24 +484,45 @@ function handleNextPage() {
     generateAndShowDocxPreview(copyText);
 }
 
-function generateAndShowDocxPreview(copyText) {
-    // Afficher le loading
-    showDocxLoadingState(true);
-    
-    fetch('/api/generate_docx_preview', {
+// Dernier DOCX reçu : renvoyé par le serveur en 304 si la copy n'a pas changé
+let lastDocx = { etag: null, blob: null };
+
+function fetchDocx(copyText) {
+    const headers = {
+        'Content-Type': 'application/json',
+    };
+    if (lastDocx.etag) {
+        headers['If-None-Match'] = lastDocx.etag;
+    }
+
+    return fetch('/api/generate_docx_preview', {
         method: 'POST',
-        headers: {
-            'Content-Type': 'application/json',
-        },
+        headers: headers,
         body: JSON.stringify({
             copy: copyText
         })
     })
     .then(response => {
+        if (response.status === 304 && lastDocx.blob) {
+            return lastDocx.blob;
+        }
         if (!response.ok) {
-            throw new Error('Failed to generate DOCX preview');
+            throw new Error(`HTTP error! status: ${response.status}`);
         }
-        return response.blob();
+        return response.blob().then(blob => {
+            lastDocx = { etag: response.headers.get('ETag'), blob: blob };
+            return blob;
+        });
+    });
+}
+
+function generateAndShowDocxPreview(copyText) {
+    // Afficher le loading
+    showDocxLoadingState(true);
+    
+    fetchDocx(copyText)
+    .catch(() => {
+        throw new Error('Failed to generate DOCX preview');
     })
     .then(blob => {
         // Convertir le blob en ArrayBuffer pour Mammoth
@@ -713,20 +731,9 @@ function downloadStoredDocx() {
     downloadBtn.disabled = true;
     downloadBtn.textContent = '📥 Downloading...';
     
-    fetch('/api/generate_docx_preview', {
-        method: 'POST',
-        headers: {
-            'Content-Type': 'application/json',
-        },
-        body: JSON.stringify({
-            copy: copyText
-        })
-    })
-    .then(response => {
-        if (!response.ok) {
-            throw new Error('Download failed');
-        }
-        return response.blob();
+    fetchDocx(copyText)
+    .catch(() => {
+        throw new Error('Download failed');
     })
     .then(blob => {
         const url = window.URL.createObjectURL(blob);
@@ -787,10 +794,7 @@ function calculateAndDisplayMetrics(briefing, copy) {
     
     console.log('📤 Sending text data');
     
-    fetch('/api/compare', {
-        method: 'POST',
-        body: formData
-    })
+    runJob('compare', formData)
     .then(response => {
         console.log('📡 API Response status:', response.status);
         if (!response.ok) {
@@ -0,0 +1,74 @@
+"""
+Test application: the real services with the fake Gemini backend (benchmarks/fake_llm.py),
+every store (jobs, mappings, render cache) in a temporary folder.
+"""
+import io
+import os
+import sys
+import zipfile
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)  # model_templates/ and static/ are read relative to the repo
+os.environ.setdefault('GEMINI_API_KEY', 'test')
+
+from benchmarks import fake_llm  # noqa: E402
+from config import Config  # noqa: E402
+
+
+@pytest.fixture(scope='session')
+def app(tmp_path_factory):
+    fake_llm.install(latency_ms=0)
+    import app as app_module
+
+    tmp = tmp_path_factory.mktemp('app')
+
+    class TestConfig(Config):
+        TESTING = True
+        TRACE_LOG = False
+        COMPRESS_STATIC = False
+        JOBS_DB_PATH = str(tmp / 'jobs.db')
+        JOBS_SPOOL_DIR = str(tmp / 'spool')
+        MAPPING_DB_PATH = str(tmp / 'mappings.db')
+        REVALIDATION_DB_PATH = str(tmp / 'revalidation.db')
+        CONVERT_CACHE_DIR = str(tmp / 'pdf')
+
+    flask_app = app_module.create_app(TestConfig)
+    yield flask_app
+    app_module.job_service.shutdown()
+    convertor = app_module.registry.built('convertor')
+    if convertor is not None:
+        convertor.shutdown()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def registry(app):
+    import app as app_module
+    return app_module.registry
+
+
+def make_zip(files: dict) -> bytes:
+    """ZIP archive of {name: content} (the upload of /api/convert)."""
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as z:
+        for name, content in files.items():
+            z.writestr(name, content)
+    return buffer.getvalue()
+
+
+def chromium_available() -> bool:
+    """Whether Playwright can launch Chromium here (the browser is downloaded separately)."""
+    try:
+        from playwright.sync_api import sync_playwright
+        with sync_playwright() as p:
+            p.chromium.launch().close()
+        return True
+    except Exception:
+        return False
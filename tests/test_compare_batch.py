@@ -0,0 +1,39 @@
+import json
+
+import pytest
+
+COPY = "Go Plus à 25€ par mois, appels illimités."
+
+
+def post_batch(client, pairs, **fields):
+    return client.post('/api/compare_batch', data={'pairs': json.dumps(pairs), **fields},
+                       content_type='multipart/form-data')
+
+
+def test_each_pair_gets_a_line(client):
+    response = post_batch(client, [{'id': 'a', 'text1': COPY, 'text2': COPY}, {'text1': COPY, 'text2': COPY}])
+    assert response.status_code == 200
+
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert sorted(str(line['id']) for line in lines) == ['1', 'a']
+    assert all(line['success'] for line in lines), lines
+
+
+@pytest.mark.parametrize('pairs', [[{'text1': COPY, 'text2': COPY}, "doc1.docx"], [None], [[COPY, COPY]]])
+def test_pairs_that_are_not_objects_are_rejected(client, pairs):
+    response = post_batch(client, pairs)
+    assert response.status_code == 400
+    assert 'JSON objects' in response.get_json()['error']
+
+
+def test_words_to_anonymize_must_be_a_list(client):
+    response = post_batch(client, [{'text1': COPY, 'text2': COPY}], words_to_anonymize='"Go Plus"')
+    assert response.status_code == 400
+
+
+def test_service_reports_a_bad_pair_without_ending_the_stream(registry):
+    results = list(registry.batch_comparator.compare([{'text1': COPY, 'text2': COPY}, 'not a pair'], {}))
+
+    by_index = {result['index']: result for result in results}
+    assert by_index[0]['success']
+    assert by_index[1] == {'id': 1, 'index': 1, 'success': False, 'error': 'Pair 1 must be a JSON object'}
@@ -0,0 +1,130 @@
+import zipfile
+
+import pytest
+
+from services.convertor_service import ConvertorService
+from tests.conftest import chromium_available, make_zip
+
+PAGE = "<html><body><h1>{title}</h1><img src='img/logo.png'></body></html>"
+
+
+class SavedZipConvertor(ConvertorService):
+    """Convertor checking the ZIP saved by convert_task instead of rendering it."""
+
+    def __init__(self):
+        super().__init__(max_concurrency=1)
+        self.names = []
+
+    def html_to_pdf(self, zip_path, output_pdf, options=None):
+        with zipfile.ZipFile(zip_path) as z:
+            self.names = sorted(z.namelist())
+        with open(output_pdf, 'wb') as f:
+            f.write(b'%PDF-1.4\n%%EOF\n')
+
+
+def post_zip(client, data: bytes):
+    from io import BytesIO
+    return client.post('/api/convert', data={'doc': (BytesIO(data), 'page.zip', 'application/zip')},
+                       content_type='multipart/form-data')
+
+
+def test_small_zip_is_saved_intact_after_hashing(app, client, registry, monkeypatch):
+    # Under UPLOAD_SPOOL_THRESHOLD: the upload stays in memory, hashed for the render cache then saved
+    data = make_zip({'page.html': PAGE.format(title='saved'), 'img/logo.png': b'\x89PNG\r\n\x1a\n'})
+    assert len(data) < app.config['UPLOAD_SPOOL_THRESHOLD']
+    convertor = SavedZipConvertor()
+    monkeypatch.setitem(registry._instances, 'convertor', convertor)
+
+    response = post_zip(client, data)
+
+    assert response.status_code == 200, response.get_data(as_text=True)
+    assert response.headers['X-Convert-Cache'] == 'miss'
+    assert convertor.names == ['img/logo.png', 'page.html']
+
+
+@pytest.mark.skipif(not chromium_available(), reason="Chromium is not installed (playwright install chromium)")
+def test_small_zip_converts_to_pdf(client):
+    data = make_zip({'page.html': PAGE.format(title='rendered'), 'img/logo.png': b'\x89PNG\r\n\x1a\n'})
+
+    response = post_zip(client, data)
+
+    assert response.status_code == 200, response.get_data(as_text=True)
+    assert response.data.startswith(b'%PDF')
+
+
+class FakeRoute:
+    """page.route() callback argument: records whether the request was let through."""
+
+    def __init__(self, url: str):
+        self.request = type('Request', (), {'url': url})()
+        self.outcome = None
+
+    async def continue_(self):
+        self.outcome = 'continued'
+
+    async def abort(self, error_code=None):
+        self.outcome = 'aborted'
+
+
+def route_outcome(convertor: ConvertorService, url: str) -> str:
+    import asyncio
+    route = FakeRoute(url)
+    asyncio.run(convertor._serve_asset(route, assets=None))
+    return route.outcome
+
+
+@pytest.mark.parametrize('url', [
+    'https://cdn.example.com/logo.png', 'http://169.254.169.254/latest/meta-data/',
+    'http://localhost:5000/api/jobs', 'ftp://cdn.example.com/logo.png',
+])
+def test_external_requests_are_blocked_by_default(url):
+    assert route_outcome(ConvertorService(), url) == 'aborted'
+
+
+@pytest.mark.parametrize('url, outcome', [
+    ('https://cdn.example.com/logo.png', 'continued'),
+    ('https://img.cdn.example.com/logo.png', 'continued'),
+    ('https://cdn.example.com.evil.test/logo.png', 'aborted'),
+    ('https://example.com/logo.png', 'aborted'),
+    ('file:///etc/passwd', 'aborted'),
+])
+def test_allowed_hosts_and_subdomains_load(url, outcome):
+    convertor = ConvertorService(allowed_hosts=['CDN.example.com'])
+    assert route_outcome(convertor, url) == outcome
+
+
+@pytest.fixture
+def asset_server():
+    """Local HTTP server counting the requests of the page (the 'CDN' of the browser tests)."""
+    import threading
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    hits = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            hits.append(self.path)
+            self.send_response(404)
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}", hits
+    server.shutdown()
+
+
+@pytest.mark.skipif(not chromium_available(), reason="Chromium is not installed (playwright install chromium)")
+@pytest.mark.parametrize('allowed_hosts, fetched', [((), False), (('127.0.0.1',), True)])
+def test_browser_fetches_only_allowed_hosts(asset_server, allowed_hosts, fetched):
+    origin, hits = asset_server
+    convertor = ConvertorService(max_concurrency=1, allowed_hosts=allowed_hosts)
+    try:
+        pdf = convertor.html_string_to_pdf(f"<html><body><img src='{origin}/logo.png'></body></html>")
+    finally:
+        convertor.shutdown()
+
+    assert pdf.startswith(b'%PDF')
+    assert (hits == ['/logo.png']) is fetched
@@ -0,0 +1,24 @@
+import pytest
+
+COPY = {'copy': "Offre spéciale\n\nGo Plus à 25€/mois jusqu'au 31/12."}
+
+
+@pytest.mark.parametrize('path', ['/api/generate_docx_preview', '/api/download-copy'])
+def test_unchanged_copy_is_not_modified(client, path):
+    first = client.post(path, json=COPY)
+    assert first.status_code == 200
+    etag = first.headers['ETag']
+
+    for header in (etag, 'W/' + etag, f'"other", {etag}'):
+        again = client.post(path, json=COPY, headers={'If-None-Match': header})
+        assert again.status_code == 304, header
+        assert again.data == b''
+        assert again.headers['ETag'] == etag
+        assert again.headers['Cache-Control'] == first.headers['Cache-Control']
+
+
+@pytest.mark.parametrize('header', ['*', '"other"'])
+def test_other_validators_get_the_document(client, header):
+    response = client.post('/api/generate_docx_preview', json=COPY, headers={'If-None-Match': header})
+    assert response.status_code == 200
+    assert response.data.startswith(b'PK')
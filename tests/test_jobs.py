@@ -0,0 +1,27 @@
+import time
+from io import BytesIO
+
+
+def wait_for(client, job: dict, timeout: float = 10) -> dict:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        status = client.get(job['status_url']).get_json()
+        if status['status'] in ('succeeded', 'failed', 'cancelled'):
+            return status
+        time.sleep(0.05)
+    raise AssertionError(f"job {job['id']} still {status['status']}")
+
+
+def test_generate_design_job_from_copy_text(client):
+    # What the copy page sends: the edited copy as an HTML file, then polls the job
+    response = client.post('/api/jobs/generate_design', data={
+        'copy': (BytesIO("Offre spéciale Go Plus 25€/mois".encode()), 'copy.html', 'text/html'),
+        'template': 'modern', 'language': 'NL'
+    }, content_type='multipart/form-data')
+    assert response.status_code == 202
+    job = response.get_json()
+
+    assert wait_for(client, job)['status'] == 'succeeded'
+    result = client.get(job['result_url'])
+    assert result.status_code == 200
+    assert '<html' in result.get_json()['output']
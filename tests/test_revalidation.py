@@ -0,0 +1,30 @@
+import pytest
+
+from services.comparator_service import ComparatorService
+from services.revalidation import RevalidationStore
+
+DISCLAIMER = "Offre soumise à conditions, valable jusqu'au 31/12/2025 pour tout nouvel abonnement Go Plus. " * 4
+PRICE = "Go Plus à 25€ par mois pendant un an, puis 35€ par mois, appels et SMS illimités en Belgique. " * 4
+ROAMING = "Roaming inclus dans toute l'Union européenne, 10 Go de données mobiles utilisables à l'étranger. " * 4
+
+
+@pytest.fixture
+def comparator(app):
+    return ComparatorService(api_key='test', revalidation_store=RevalidationStore())
+
+
+def document(*blocks) -> str:
+    return "\n\n".join(blocks)
+
+
+def test_repeated_blocks_are_counted_per_block(comparator):
+    copy = document(DISCLAIMER, PRICE, DISCLAIMER)
+
+    first = comparator.revalidate(copy, copy, {}, 'campaign-1')
+    assert first['success'], first
+    assert first['revalidation'] == {'campaign': 'campaign-1', 'blocks': 3, 'compared': 3, 'reused': 0}
+
+    # Only the middle block changes
+    revised = document(DISCLAIMER, ROAMING, DISCLAIMER)
+    second = comparator.revalidate(revised, revised, {}, 'campaign-1')
+    assert second['revalidation'] == {'campaign': 'campaign-1', 'blocks': 3, 'compared': 1, 'reused': 2}
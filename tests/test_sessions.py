@@ -0,0 +1,77 @@
+import json
+from io import BytesIO
+
+import pytest
+
+from services.mapping_store import MappingStore, SessionExpired, SessionNotFound
+
+MAPPING = {'[MOTCLE_1]': 'Go Plus', '[NUMERO_1]': '25'}
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def store(request, tmp_path):
+    return MappingStore(ttl=60, db_path=str(tmp_path / 'mappings.db') if request.param == 'sqlite' else None)
+
+
+def expire(store: MappingStore, handle: str):
+    """Move a session past its TTL (but not past the sweep)."""
+    if store.db_path:
+        from contextlib import closing
+        with closing(store._connect()) as conn:
+            conn.execute("UPDATE mappings SET expires_at = 0 WHERE handle = ?", (handle,))
+    else:
+        store._memory[handle] = (0, store._memory[handle][1])
+
+
+def test_get_and_deanonymize_use_the_session_mapping(store):
+    handle, _ = store.merge(None, MAPPING)
+    store.merge(handle, {'[NUMERO_2]': '30'})
+
+    assert store.get(handle) == {**MAPPING, '[NUMERO_2]': '30'}
+    assert store.deanonymize(handle, {'docs': ['[MOTCLE_1] à [NUMERO_1]€', '[NUMERO_2]€'], 'score': 87}) == \
+        {'docs': ['Go Plus à 25€', '30€'], 'score': 87}
+
+
+def test_unknown_and_expired_handles_are_rejected(store):
+    with pytest.raises(SessionNotFound):
+        store.get('missing')
+
+    handle, _ = store.merge(None, MAPPING)
+    expire(store, handle)
+    with pytest.raises(SessionExpired):
+        store.deanonymize(handle, '[MOTCLE_1]')
+
+
+def test_delete_drops_the_session(store):
+    handle, _ = store.merge(None, MAPPING)
+
+    assert store.delete(handle)
+    assert not store.delete(handle)
+    with pytest.raises(SessionNotFound):
+        store.get(handle)
+
+
+def extract(client) -> dict:
+    response = client.post('/api/extract', data={
+        'doc1': (BytesIO(b'<p>Go Plus 25 euros</p>'), 'copy.html', 'text/html'),
+        'doc2': (BytesIO(b'<p>Go Plus 30 euros</p>'), 'design.html', 'text/html'),
+        'words_to_anonymize': json.dumps(['Go Plus'])
+    }, content_type='multipart/form-data')
+    assert response.status_code == 200
+    return response.get_json()
+
+
+def test_session_routes(client):
+    extracted = extract(client)
+    session = extracted['session']
+    assert 'Go Plus' not in json.dumps(extracted['docs'])
+
+    restored = client.post(f'/api/sessions/{session}/deanonymize', json={'data': extracted['docs']})
+    assert restored.status_code == 200
+    assert restored.get_json()['data'] == ['Go Plus 25 euros', 'Go Plus 30 euros']
+
+    assert client.post(f'/api/sessions/{session}/deanonymize', json={'docs': []}).status_code == 400
+
+    assert client.delete(f'/api/sessions/{session}').status_code == 204
+    assert client.delete(f'/api/sessions/{session}').status_code == 404
+    assert client.post(f'/api/sessions/{session}/deanonymize', json={'data': 'x'}).status_code == 404